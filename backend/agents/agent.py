@@ -1,12 +1,45 @@
 import requests
-import time
-import random
+from requests.adapters import HTTPAdapter
+import argparse
+import gzip
 import json
+import os
+import random
+import re
+import signal
+import socket
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 # --- SENTINELX EXTERNAL LOG AGENT (PRO) ---
-# Simulates a remote node streaming telemetry to the Neural Matrix.
+# Ships telemetry from a remote node to the Neural Matrix. Lines tailed from
+# files or stdin (or simulated traffic) are batched by count, size or time,
+# gzipped and posted over one keep-alive session. While the uplink is down,
+# batches go to a size-capped disk spool and are replayed in order, with
+# exponential backoff between attempts, once it recovers.
+
+API_URL = os.getenv("SENTINELX_API_URL", "http://localhost:3000/api/logs/batch")
+AGENT_SOURCE = os.getenv("AGENT_SOURCE", socket.gethostname())
+
+AGENT_BATCH_EVENTS = int(os.getenv("AGENT_BATCH_EVENTS", 1000))
+AGENT_BATCH_BYTES = int(os.getenv("AGENT_BATCH_BYTES", 1 << 20))
+AGENT_FLUSH_INTERVAL_MS = float(os.getenv("AGENT_FLUSH_INTERVAL_MS", 500))
+# Events held in memory before readers block
+AGENT_MEMORY_EVENTS = int(os.getenv("AGENT_MEMORY_EVENTS", 20000))
+AGENT_GZIP_LEVEL = int(os.getenv("AGENT_GZIP_LEVEL", 6))
+AGENT_TIMEOUT = float(os.getenv("AGENT_TIMEOUT", 10))
+AGENT_BACKOFF_MIN = float(os.getenv("AGENT_BACKOFF_MIN", 0.5))
+AGENT_BACKOFF_MAX = float(os.getenv("AGENT_BACKOFF_MAX", 60))
+
+AGENT_SPOOL_DIR = os.getenv("AGENT_SPOOL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "spool"))
+AGENT_SPOOL_MAX_MB = float(os.getenv("AGENT_SPOOL_MAX_MB", 256))
+AGENT_STATS_INTERVAL = float(os.getenv("AGENT_STATS_INTERVAL", 10))
 
-API_URL = "http://localhost:3000/api/log"
+# Responses worth retrying; any other 4xx rejects the batch for good
+RETRYABLE_STATUS = (408, 429, 500, 502, 503, 504)
 
 LOG_TEMPLATES = [
     {"message": "User login failure: invalid credentials for 'admin'", "source": "SOC-GATEWAY-PROD", "severity": "WARN"},
@@ -18,28 +51,513 @@ LOG_TEMPLATES = [
     {"message": "Kernel panic: catastrophic failure in memory module", "source": "NEURAL-MATRIX-01", "severity": "FATAL"}
 ]
 
-def stream_telemetry():
-    print("🚀 SentinelX Agent: Establishing uplink to Neural Matrix...")
-    print(f"Target: {API_URL}")
-    
-    while True:
+SEVERITY_RE = re.compile(r'\b(CRITICAL|FATAL|EMERG|ALERT|ERROR|ERR|WARNING|WARN|NOTICE|INFO|DEBUG)\b', re.IGNORECASE)
+SEVERITY_ALIASES = {"ERR": "ERROR", "WARNING": "WARN", "NOTICE": "INFO", "EMERG": "CRITICAL", "ALERT": "CRITICAL"}
+
+def line_to_event(line, source=AGENT_SOURCE):
+    """
+    Turns one raw log line into the event shape the ingest API parses.
+    JSON object lines are passed through (with a source filled in).
+    """
+    line = line.rstrip("\r\n")
+    if not line.strip():
+        return None
+    if line.startswith("{"):
+        try:
+            event = json.loads(line)
+            if isinstance(event, dict):
+                event.setdefault("source", source)
+                return event
+        except ValueError:
+            pass
+    match = SEVERITY_RE.search(line)
+    severity = match.group(1).upper() if match else "INFO"
+    return {
+        "message": line,
+        "source": source,
+        "severity": SEVERITY_ALIASES.get(severity, severity),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime()) + "Z",
+    }
+
+# =========================================================================
+# Disk spool
+# =========================================================================
+class Spool:
+    """
+    Directory of gzipped batch files, oldest first. Files are named
+    `<seq>-<events>.json.gz`, so depth is known without reading them and a
+    restarted agent resumes the backlog it left behind.
+
+    Args:
+        directory (str): Spool location (created if missing).
+        max_bytes (int): Cap on the spool; the oldest batches are discarded
+            past it.
+    """
+    def __init__(self, directory=AGENT_SPOOL_DIR, max_bytes=int(AGENT_SPOOL_MAX_MB * (1 << 20))):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._segments = deque()
+        self.bytes = 0
+        self.events = 0
+        self.dropped_events = 0
+        for name in sorted(os.listdir(directory)):
+            parsed = self._parse(name)
+            if parsed is None:
+                continue
+            path = os.path.join(directory, name)
+            size = os.path.getsize(path)
+            self._segments.append((parsed[0], path, parsed[1], size))
+            self.bytes += size
+            self.events += parsed[1]
+        self._seq = self._segments[-1][0] + 1 if self._segments else 0
+
+    @staticmethod
+    def _parse(name):
+        if not name.endswith(".json.gz"):
+            return None
+        try:
+            seq, count = name[:-len(".json.gz")].split("-")
+            return int(seq), int(count)
+        except ValueError:
+            return None
+
+    def __len__(self):
+        return len(self._segments)
+
+    def push(self, payload, count):
+        """
+        Stores one compressed batch behind the existing backlog.
+        """
+        with self._lock:
+            seq = self._seq
+            self._seq += 1
+            path = os.path.join(self.directory, f"{seq:012d}-{count}.json.gz")
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(payload)
+            # Rename last so a crash never leaves a half-written batch
+            os.replace(tmp, path)
+            self._segments.append((seq, path, count, len(payload)))
+            self.bytes += len(payload)
+            self.events += count
+            while self.bytes > self.max_bytes and len(self._segments) > 1:
+                _, old_path, old_count, old_size = self._segments.popleft()
+                self._unlink(old_path)
+                self.bytes -= old_size
+                self.events -= old_count
+                self.dropped_events += old_count
+
+    def peek(self):
+        """
+        Returns (path, events, payload) of the oldest batch, or None.
+        """
+        with self._lock:
+            if not self._segments:
+                return None
+            _, path, count, _ = self._segments[0]
+        with open(path, "rb") as f:
+            return path, count, f.read()
+
+    def remove(self, path):
+        with self._lock:
+            if not self._segments or self._segments[0][1] != path:
+                return
+            _, path, count, size = self._segments.popleft()
+            self.bytes -= size
+            self.events -= count
+        self._unlink(path)
+
+    @staticmethod
+    def _unlink(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+# =========================================================================
+# Shipper
+# =========================================================================
+class Shipper:
+    """
+    Batches events in memory and delivers them to the ingest API in order.
+
+    Args:
+        url (str): Batch ingest endpoint.
+        spool (Spool): Where batches wait while the uplink is down.
+        session (requests.Session): Reused keep-alive session.
+    """
+    def __init__(self, url=API_URL, spool=None, session=None, batch_events=AGENT_BATCH_EVENTS,
+                 batch_bytes=AGENT_BATCH_BYTES, flush_interval_ms=AGENT_FLUSH_INTERVAL_MS,
+                 memory_events=AGENT_MEMORY_EVENTS, gzip_level=AGENT_GZIP_LEVEL, timeout=AGENT_TIMEOUT,
+                 backoff_min=AGENT_BACKOFF_MIN, backoff_max=AGENT_BACKOFF_MAX):
+        self.url = url
+        self.spool = spool if spool is not None else Spool()
+        if session is None:
+            session = requests.Session()
+            # One pooled connection, no urllib3-level retries (handled here)
+            session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=0))
+            session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=0))
+        self.session = session
+        self.batch_events = max(1, batch_events)
+        self.batch_bytes = max(1024, batch_bytes)
+        self.flush_interval = max(1.0, flush_interval_ms) / 1000.0
+        self.memory_events = max(self.batch_events, memory_events)
+        self.gzip_level = gzip_level
+        self.timeout = timeout
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._backoff = 0.0
+        self._retry_at = 0.0
+        self._thread = None
+        self.started_at = time.monotonic()
+        self.stats = {
+            "events_in": 0,
+            "events_sent": 0,
+            "events_rejected": 0,
+            "batches_sent": 0,
+            "bytes_raw": 0,
+            "bytes_sent": 0,
+            "send_errors": 0,
+            "retries": 0,
+            "spooled_batches": 0,
+            "reader_waits": 0,
+        }
+
+    # --- Producer side ---
+    def offer(self, event):
+        """
+        Queues one event, blocking while the in-memory buffer is full.
+        """
+        line = json.dumps(event, separators=(",", ":"))
+        with self._cond:
+            while len(self._queue) >= self.memory_events and not self._closed:
+                self.stats["reader_waits"] += 1
+                self._cond.wait(0.5)
+            self._queue.append(line)
+            self.stats["events_in"] += 1
+            if len(self._queue) >= self.batch_events:
+                self._cond.notify_all()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="shipper", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self, timeout=None):
+        """
+        Stops accepting events and flushes (or spools) what is left.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    # --- Sender side ---
+    def _collect(self):
+        """
+        Waits until a batch is full or the flush interval passed, then takes
+        up to batch_events / batch_bytes events.
+        """
+        deadline = time.monotonic() + self.flush_interval
+        with self._cond:
+            while len(self._queue) < self.batch_events and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            lines, size = [], 2
+            while self._queue and len(lines) < self.batch_events:
+                if lines and size + len(self._queue[0]) + 1 > self.batch_bytes:
+                    break
+                line = self._queue.popleft()
+                lines.append(line)
+                size += len(line) + 1
+            self._cond.notify_all()
+        return lines
+
+    def _encode(self, lines):
+        raw = ("[" + ",".join(lines) + "]").encode("utf-8")
+        self.stats["bytes_raw"] += len(raw)
+        return gzip.compress(raw, compresslevel=self.gzip_level)
+
+    def _post(self, payload, count):
+        """
+        Sends one batch. Returns True when it is done with (delivered or
+        permanently rejected), False when it should be retried.
+        """
         try:
-            # Select a random log template to simulate real network traffic
-            log = random.choice(LOG_TEMPLATES)
-            
-            # Send the telemetry packet
-            response = requests.post(API_URL, json=log, timeout=5)
-            
-            if response.status_code == 201:
-                print(f"[SENTINELX] 📡 Telemetry Pushed: {log['severity']} | {log['message']}")
-            else:
-                print(f"[SENTINELX] ❌ Uplink Error: {response.status_code} - {response.text}")
-                
-        except Exception as e:
-            print(f"[SENTINELX] ⚠️ Critical Connection Failure: {str(e)}")
-            
-        # Interval set to 5 seconds as per requirements
-        time.sleep(5)
+            response = self.session.post(self.url, data=payload, timeout=self.timeout, headers={
+                "Content-Type": "application/json",
+                "Content-Encoding": "gzip",
+            })
+        except requests.RequestException as e:
+            self._failed(f"{type(e).__name__}: {e}")
+            return False
+        if 200 <= response.status_code < 300:
+            self._backoff = 0.0
+            self.stats["events_sent"] += count
+            self.stats["batches_sent"] += 1
+            self.stats["bytes_sent"] += len(payload)
+            return True
+        if response.status_code in RETRYABLE_STATUS:
+            self._failed(f"HTTP {response.status_code}", response.headers.get("Retry-After"))
+            return False
+        self.stats["events_rejected"] += count
+        print(f"[SENTINELX] ❌ Batch rejected: {response.status_code} - {response.text[:200]}")
+        return True
+
+    def _failed(self, reason, retry_after=None):
+        self.stats["send_errors"] += 1
+        self._backoff = min(self.backoff_max, max(self.backoff_min, self._backoff * 2))
+        delay = self._backoff * random.uniform(0.5, 1.0)
+        try:
+            delay = max(delay, float(retry_after)) if retry_after else delay
+        except ValueError:
+            pass
+        self._retry_at = time.monotonic() + delay
+        print(f"[SENTINELX] ⚠️ Uplink failure ({reason}); retrying in {delay:.1f}s")
+
+    def _drain_spool(self):
+        """
+        Replays spooled batches oldest first until one fails or the memory
+        buffer needs attention.
+        """
+        while len(self.spool) and time.monotonic() >= self._retry_at:
+            self.stats["retries"] += 1
+            path, count, payload = self.spool.peek()
+            if not self._post(payload, count):
+                return
+            self.spool.remove(path)
+            if len(self._queue) >= self.memory_events // 2:
+                return
+
+    def _run(self):
+        while True:
+            lines = self._collect()
+            if lines:
+                payload = self._encode(lines)
+                # With a backlog on disk, new batches queue behind it to keep order
+                if len(self.spool) or time.monotonic() < self._retry_at or not self._post(payload, len(lines)):
+                    self.spool.push(payload, len(lines))
+                    self.stats["spooled_batches"] += 1
+            self._drain_spool()
+            with self._cond:
+                if self._closed and not self._queue:
+                    return
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        elapsed = time.monotonic() - self.started_at
+        stats["events_per_sec"] = round(stats["events_sent"] / elapsed, 1) if elapsed else 0.0
+        stats["memory_depth"] = len(self._queue)
+        stats["spool_batches"] = len(self.spool)
+        stats["spool_events"] = self.spool.events
+        stats["spool_bytes"] = self.spool.bytes
+        stats["spool_dropped_events"] = self.spool.dropped_events
+        stats["compression_ratio"] = round(stats["bytes_raw"] / stats["bytes_sent"], 2) if stats["bytes_sent"] else None
+        return stats
+
+# =========================================================================
+# Inputs
+# =========================================================================
+def tail_file(path, shipper, stop, from_start=False, poll=0.25):
+    """
+    Follows `path` like `tail -F`: survives rotation (new inode) and
+    truncation, and only ships complete lines.
+    """
+    f, inode, partial = None, None, b""
+    while not stop.is_set():
+        if f is None:
+            try:
+                # Binary, so tell() is a byte offset comparable with st_size
+                f = open(path, "rb")
+                inode = os.fstat(f.fileno()).st_ino
+                if not from_start:
+                    f.seek(0, os.SEEK_END)
+                from_start = True  # files that appear later are read whole
+            except OSError:
+                stop.wait(poll)
+                continue
+        line = f.readline()
+        if line:
+            if not line.endswith(b"\n"):
+                partial += line
+                continue
+            event = line_to_event((partial + line).decode("utf-8", errors="replace"))
+            partial = b""
+            if event:
+                shipper.offer(event)
+            continue
+        try:
+            st = os.stat(path)
+            rotated = st.st_ino != inode
+            truncated = not rotated and st.st_size < f.tell()
+        except OSError:
+            rotated, truncated = True, False
+        if truncated:
+            f.seek(0)
+        elif rotated:
+            # Ship what was written to the old file after the last read,
+            # then reopen the path
+            for line in f:
+                event = line_to_event((partial + line).decode("utf-8", errors="replace"))
+                partial = b""
+                if event:
+                    shipper.offer(event)
+            f.close()
+            f = None
+            continue
+        stop.wait(poll)
+    if f is not None:
+        f.close()
+
+def read_stream(stream, shipper):
+    for line in stream:
+        event = line_to_event(line)
+        if event:
+            shipper.offer(event)
+
+def simulate(shipper, stop, rate):
+    """
+    Synthetic telemetry at `rate` events/sec (the agent's original demo mode).
+    """
+    interval = 1.0 / rate if rate > 0 else 0.0
+    next_at = time.monotonic()
+    while not stop.is_set():
+        log = dict(random.choice(LOG_TEMPLATES))
+        log["timestamp"] = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime()) + "Z"
+        shipper.offer(log)
+        if interval:
+            next_at += interval
+            delay = next_at - time.monotonic()
+            if delay > 0:
+                stop.wait(delay)
+
+def report(shipper, stop, interval=AGENT_STATS_INTERVAL):
+    last_sent, last_at = 0, time.monotonic()
+    while not stop.wait(interval):
+        stats = shipper.get_stats()
+        now = time.monotonic()
+        rate = (stats["events_sent"] - last_sent) / (now - last_at)
+        last_sent, last_at = stats["events_sent"], now
+        print(f"[SENTINELX] 📡 {rate:,.0f} ev/s | sent {stats['events_sent']:,} | "
+              f"memory {stats['memory_depth']:,} | spool {stats['spool_batches']} batches / "
+              f"{stats['spool_events']:,} events | dropped {stats['spool_dropped_events']:,}")
+
+def stream_telemetry(args):
+    print("🚀 SentinelX Agent: Establishing uplink to Neural Matrix...")
+    print(f"Target: {args.url}")
+    shipper = Shipper(args.url, Spool(args.spool_dir)).start()
+    stop = threading.Event()
+    threads = [threading.Thread(target=report, args=(shipper, stop, args.stats_interval), daemon=True)]
+    for path in args.file:
+        threads.append(threading.Thread(target=tail_file, args=(path, shipper, stop, args.from_start), daemon=True))
+    if args.simulate is not None:
+        threads.append(threading.Thread(target=simulate, args=(shipper, stop, args.simulate), daemon=True))
+    for t in threads:
+        t.start()
+    # SIGTERM (service stop) shuts down like Ctrl-C: flush, then spool the rest
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    try:
+        if args.stdin:
+            read_stream(sys.stdin, shipper)
+            # Piped input: exit once it is delivered (or spooled)
+            if not args.file and args.simulate is None:
+                stop.set()
+        while not stop.is_set():
+            stop.wait(1)
+    except KeyboardInterrupt:
+        pass
+    stop.set()
+    shipper.close(timeout=args.timeout)
+    stats = shipper.get_stats()
+    print("[SENTINELX] Uplink closed: " + json.dumps(stats))
+    return stats
+
+# =========================================================================
+# Local uplink stub (for testing without the Node API)
+# =========================================================================
+def run_stub(port, fail_ratio=0.0):
+    """
+    Minimal batch ingest endpoint: inflates, counts and acknowledges
+    batches; `fail_ratio` of them answer 503 to exercise retries.
+    """
+    received = {"events": 0, "batches": 0, "failed": 0, "started": time.monotonic()}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if random.random() < fail_ratio:
+                with lock:
+                    received["failed"] += 1
+                return self._reply(503, {"success": False, "error": "stub outage"})
+            if self.headers.get("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+            events = json.loads(body)
+            with lock:
+                received["events"] += len(events)
+                received["batches"] += 1
+            self._reply(201, {"success": True, "accepted": len(events), "rejected": 0})
+
+        def do_GET(self):
+            with lock:
+                stats = dict(received)
+            stats["events_per_sec"] = round(stats["events"] / (time.monotonic() - stats.pop("started")), 1)
+            self._reply(200, stats)
+
+        def _reply(self, status, payload):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    print(f"[SENTINELX] Uplink stub listening on http://127.0.0.1:{port}/ (GET for counters)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SentinelX log shipping agent")
+    sub = parser.add_subparsers(dest="command")
+    ship = sub.add_parser("ship", help="tail files / stdin and ship them")
+    ship.add_argument("--url", default=API_URL)
+    ship.add_argument("--file", action="append", default=[], help="file to follow (repeatable)")
+    ship.add_argument("--from-start", action="store_true", help="read followed files from the beginning")
+    ship.add_argument("--stdin", action="store_true", help="ship lines read from stdin")
+    ship.add_argument("--simulate", type=float, metavar="RATE", help="synthetic events/sec")
+    ship.add_argument("--spool-dir", default=AGENT_SPOOL_DIR)
+    ship.add_argument("--stats-interval", type=float, default=AGENT_STATS_INTERVAL)
+    ship.add_argument("--timeout", type=float, default=30, help="seconds to flush on exit")
+    stub = sub.add_parser("stub", help="run a local ingest stub")
+    stub.add_argument("--port", type=int, default=3999)
+    stub.add_argument("--fail-ratio", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    if args.command == "stub":
+        run_stub(args.port, args.fail_ratio)
+        return 0
+    if args.command is None:
+        # No arguments: the original demo stream
+        args = parser.parse_args(["ship", "--simulate", "0.2"])
+    stream_telemetry(args)
+    return 0
 
 if __name__ == "__main__":
-    stream_telemetry()
+    sys.exit(main())
@@ -1,11 +1,57 @@
 import numpy as np
 import os
-import joblib
+import sys
 import re
-from sklearn.ensemble import IsolationForest
+import hashlib
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from ai import bundle as model_bundle
+from ai.matcher import LOG_MATCHER, risk_keyword_count
+from realtime.native import threading
 
 # --- CONFIGURATION ---
 MODEL_PATH = os.path.join(os.path.dirname(__file__), 'anomaly_model.joblib')
+# Seconds between on-disk freshness checks. The hot path never stats the file
+# more often than this.
+CHECK_INTERVAL = float(os.getenv("ANOMALY_MODEL_CHECK_INTERVAL", 5))
+
+FEATURE_COUNT = 5
+
+IP_REGEX = re.compile(r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}')
+# Single-line feature counts for ASCII text (same classes as the tables below)
+_SPECIAL_REGEX = re.compile(r'[^a-zA-Z0-9\s]')
+_DIGIT_REGEX = re.compile(r'[0-9]')
+# Lines scored per model call in detect_anomaly_batch
+BATCH_SIZE = int(os.getenv("ANOMALY_BATCH_SIZE", 4096))
+
+# ASCII lookup tables: digit (str.isdigit) and special ([^a-zA-Z0-9\s])
+_ASCII_DIGIT = np.zeros(128, dtype=np.bool_)
+_ASCII_SPECIAL = np.zeros(128, dtype=np.bool_)
+for _c in range(128):
+    _ASCII_DIGIT[_c] = chr(_c).isdigit()
+    _ASCII_SPECIAL[_c] = re.match(r'[^a-zA-Z0-9\s]', chr(_c)) is not None
+
+def _char_classes(joined):
+    """
+    Returns (digit_mask, special_mask) for every character of `joined`.
+    """
+    if joined.isascii():
+        codes = np.frombuffer(joined.encode('ascii'), dtype=np.uint8)
+        return _ASCII_DIGIT[codes], _ASCII_SPECIAL[codes]
+
+    codes = np.frombuffer(joined.encode('utf-32-le'), dtype=np.uint32)
+    ascii_codes = np.minimum(codes, 127)
+    digit = _ASCII_DIGIT[ascii_codes]
+    special = _ASCII_SPECIAL[ascii_codes]
+    wide = codes >= 128
+    # Classify each distinct non-ASCII code point once
+    uniq, inverse = np.unique(codes[wide], return_inverse=True)
+    u_digit = np.array([chr(c).isdigit() for c in uniq], dtype=np.bool_)
+    u_special = np.array([not chr(c).isspace() for c in uniq], dtype=np.bool_)
+    digit[wide] = u_digit[inverse]
+    special[wide] = u_special[inverse]
+    return digit, special
 
 class LogVectorizer:
     """
@@ -13,33 +59,80 @@ class LogVectorizer:
     """
     @staticmethod
     def vectorize(log_text):
-        if not log_text:
-            return [0, 0, 0, 0, 0]
-        
-        text = str(log_text).lower()
-        
-        # Feature 1: Log Length (Normalized-ish)
-        length = len(text)
-        
-        # Feature 2: Severity Keyword Count
-        risk_keywords = ['error', 'critical', 'fail', 'failed', 'panic', 'fatal', 'denied', 'attack', 'exception']
-        keyword_count = sum(1 for word in risk_keywords if word in text)
-        
-        # Feature 3: Special Character Density (indicators of injection or complex errors)
-        special_chars = len(re.findall(r'[^a-zA-Z0-9\s]', text))
-        
-        # Feature 4: Presence of IP address (0 or 1)
-        has_ip = 1 if re.search(r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}', text) else 0
-        
-        # Feature 5: Numeric Density (logs with many numbers are often stack traces or sensitive data)
-        digit_count = sum(c.isdigit() for c in text)
-        
-        return [length, keyword_count, special_chars, has_ip, digit_count]
+        return list(LogVectorizer.vectorize_one(log_text))
+
+    @staticmethod
+    def vectorize_one(log_text):
+        """
+        vectorize_batch for a single line without numpy: a tuple of the
+        same FEATURE_COUNT ints. Non-ASCII lines take the batch path.
+        """
+        text = str(log_text).lower() if log_text else ''
+        if not text.isascii():
+            return tuple(LogVectorizer.vectorize_batch([log_text])[0].tolist())
+        return (
+            len(text),
+            risk_keyword_count(LOG_MATCHER.mask(text)),
+            len(_SPECIAL_REGEX.findall(text)),
+            1 if IP_REGEX.search(text) else 0,
+            len(_DIGIT_REGEX.findall(text))
+        )
+
+    @staticmethod
+    def vectorize_batch(lines):
+        """
+        Vectorizes many logs at once.
+
+        Features (one row per line):
+            1. Log length
+            2. Severity keyword count
+            3. Special character count (indicators of injection or complex errors)
+            4. Presence of an IP address (0 or 1)
+            5. Digit count (stack traces or sensitive data)
+
+        Args:
+            lines (list): Raw log strings (None/empty allowed).
+
+        Returns:
+            np.ndarray: int64 matrix of shape (len(lines), FEATURE_COUNT).
+        """
+        texts = [str(t).lower() if t else '' for t in lines]
+        n = len(texts)
+        features = np.zeros((n, FEATURE_COUNT), dtype=np.int64)
+        if n == 0:
+            return features
+
+        lengths = np.fromiter(map(len, texts), dtype=np.int64, count=n)
+        starts = np.zeros(n, dtype=np.int64)
+        np.cumsum(lengths[:-1] + 1, out=starts[1:])
+        ends = starts + lengths
+        joined = '\n'.join(texts)
+
+        digit, special = _char_classes(joined)
+        digit_cum = np.concatenate(([0], np.cumsum(digit, dtype=np.int64)))
+        special_cum = np.concatenate(([0], np.cumsum(special, dtype=np.int64)))
+
+        features[:, 0] = lengths
+        features[:, 2] = special_cum[ends] - special_cum[starts]
+        features[:, 4] = digit_cum[ends] - digit_cum[starts]
+
+        # Distinct RISK_KEYWORDS per line from the shared keyword matcher
+        features[:, 1] = [risk_keyword_count(m) for m in LOG_MATCHER.masks(texts)]
+
+        # IP matches are located in the joined text once and mapped back to
+        # their line; the pattern cannot span the separator.
+        pos = [m.start() for m in IP_REGEX.finditer(joined)]
+        if pos:
+            features[np.searchsorted(starts, pos, side='right') - 1, 3] = 1
+
+        return features
 
 def train_model(data):
     """
     Trains the Isolation Forest model on numerical features.
     """
+    import joblib
+    from sklearn.ensemble import IsolationForest
     print(f"[AI_CORE] Training Isolation Forest on {len(data)} samples...")
     model = IsolationForest(
         n_estimators=100,
@@ -51,27 +144,198 @@ def train_model(data):
     print(f"[AI_CORE] Model synchronized: {MODEL_PATH}")
     return model
 
+class ModelRegistry:
+    """
+    Process-wide holder for the Isolation Forest.
+
+    The forest comes from the current model bundle when it carries one
+    (memory-mapped, no sklearn needed); otherwise from the joblib file at
+    `path`, flattened into the same array form on load. The watched file (bundle CURRENT pointer or joblib file) is
+    checked every CHECK_INTERVAL seconds; if its mtime/size moved, the
+    content hash decides whether a reload is really needed. The new model
+    is fully loaded before the reference is swapped, so readers always see
+    either the old or the new model, never a partial one.
+    """
+    def __init__(self, path, check_interval=CHECK_INTERVAL, bundle_root=None):
+        self.path = path
+        self.bundle_root = bundle_root or model_bundle.BUNDLE_DIR
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._model = None
+        self._stat = None
+        self._digest = None
+        self._next_check = 0.0
+        self.stats = {
+            "loads": 0,
+            "disk_checks": 0,
+            "last_load_ms": 0.0,
+            "total_load_ms": 0.0,
+            "last_load_at": None,
+            "last_reason": None,
+            "digest": None,
+            "source": None,
+        }
+
+    @staticmethod
+    def _file_stat(path):
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+
+    @staticmethod
+    def _file_digest(path):
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        return h.hexdigest()
+
+    def _watched(self):
+        pointer = model_bundle.current_pointer(self.bundle_root)
+        return pointer if os.path.exists(pointer) else self.path
+
+    def _read(self, watched):
+        """
+        Returns (model, source) for the watched file.
+        """
+        if watched != self.path:
+            bundle = model_bundle.load_current(self.bundle_root)
+            forest = bundle.forest if bundle is not None else None
+            if forest is not None and forest.n_features_in_ == FEATURE_COUNT:
+                return forest, "bundle:" + bundle.version
+        self._ensure_baseline()
+        import joblib
+        return model_bundle.compile_forest(joblib.load(self.path)), "joblib"
+
+    def _ensure_baseline(self):
+        if not os.path.exists(self.path):
+            # Create a baseline if no model exists (Stability Constraint)
+            print("[AI_CORE] No model bundle found; scoring with a random baseline forest until "
+                  "`python train_model.py` is run.")
+            baseline = np.random.rand(10, FEATURE_COUNT) * 10
+            train_model(baseline)
+
+    def _load(self, reason):
+        # Caller must hold self._lock
+        started = time.perf_counter()
+        watched = self._watched()
+        if watched == self.path:
+            self._ensure_baseline()
+        stat = (watched,) + self._file_stat(watched)
+        digest = self._file_digest(watched)
+        if self._model is not None and digest == self._digest:
+            # Touched but identical content: keep the warm model
+            self._stat = stat
+            return self._model
+
+        model, source = self._read(watched)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        # Single reference assignment publishes the new model atomically
+        self._model, self._stat, self._digest = model, stat, digest
+        self.stats["loads"] += 1
+        self.stats["last_load_ms"] = round(elapsed_ms, 3)
+        self.stats["total_load_ms"] = round(self.stats["total_load_ms"] + elapsed_ms, 3)
+        self.stats["last_load_at"] = time.time()
+        self.stats["last_reason"] = reason
+        self.stats["digest"] = digest
+        self.stats["source"] = source
+        print(f"[AI_CORE] Anomaly model loaded from {source} ({reason}) in {elapsed_ms:.1f}ms")
+        return model
+
+    def _is_stale(self):
+        self.stats["disk_checks"] += 1
+        try:
+            watched = self._watched()
+            return (watched,) + self._file_stat(watched) != self._stat
+        except OSError:
+            return True
+
+    def get(self):
+        """
+        Returns the in-memory model, loading or hot-swapping it if required.
+        """
+        model = self._model
+        now = time.monotonic()
+        if model is not None and now < self._next_check:
+            return model
+
+        with self._lock:
+            if self._model is None:
+                self._load("initial")
+            elif now >= self._next_check and self._is_stale():
+                self._load("file_changed")
+            self._next_check = now + self.check_interval
+            return self._model
+
+    def reload(self):
+        """
+        Forces a re-read of the model file (used by /ai/reload).
+        """
+        with self._lock:
+            self._digest = None
+            self._load("manual_reload")
+            self._next_check = time.monotonic() + self.check_interval
+            return self._model
+
+    def get_stats(self):
+        model = self._model
+        return dict(self.stats, path=self.path, loaded=model is not None,
+                    single_rows=model.stats["single_rows"] if model is not None else 0,
+                    cell_hits=model.stats["cell_hits"] if model is not None else 0)
+
+registry = ModelRegistry(MODEL_PATH)
+
+def reload_model():
+    """
+    Hot-swaps the anomaly model from disk. Returns the registry stats.
+    """
+    registry.reload()
+    return registry.get_stats()
+
+def get_model_stats():
+    return registry.get_stats()
+
 def detect_anomaly(log_text):
     """
-    Converts log to features and predicts anomaly status.
+    Converts log to features and predicts anomaly status. Single-row path:
+    no numpy vectorization and a memoized tree walk (BundleForest.score_one).
     Returns: (is_anomaly, status_string)
     """
-    features = LogVectorizer.vectorize(log_text)
-    
-    # Load model or train on dummy if missing for stability
-    if not os.path.exists(MODEL_PATH):
-        # Create a baseline if no model exists (Stability Constraint)
-        baseline = np.random.rand(10, 5) * 10
-        train_model(baseline)
-    
     try:
-        model = joblib.load(MODEL_PATH)
-        prediction = model.predict([features])
-        is_anomaly = prediction[0] == -1
-        return is_anomaly, "ANOMALY" if is_anomaly else "NORMAL"
+        model = registry.get()
+        flag = model.score_one(LogVectorizer.vectorize_one(log_text)) - model.offset_ < 0
+        return (True, "ANOMALY") if flag else (False, "NORMAL")
+    except Exception as e:
+        print(f"[AI_CORE] Inference Error: {e}")
+        return (False, "NORMAL")
+
+def detect_anomaly_batch(lines, chunk_size=None):
+    """
+    Scores many logs with one model call per chunk.
+
+    Args:
+        lines (list): Raw log strings.
+        chunk_size (int): Lines per model call (defaults to BATCH_SIZE).
+
+    Returns:
+        list: (is_anomaly, status_string) tuples in input order.
+    """
+    if len(lines) == 1:
+        return [detect_anomaly(lines[0])]
+    chunk_size = chunk_size or BATCH_SIZE
+    results = []
+    try:
+        model = registry.get()
+        for i in range(0, len(lines), chunk_size):
+            features = LogVectorizer.vectorize_batch(lines[i:i + chunk_size])
+            # IsolationForest.predict is decision_function < 0; derive it from
+            # a single score_samples pass
+            flags = (model.score_samples(features) - model.offset_) < 0
+            results.extend((bool(f), "ANOMALY" if f else "NORMAL") for f in flags)
+        return results
     except Exception as e:
         print(f"[AI_CORE] Inference Error: {e}")
-        return False, "NORMAL"
+        return [(False, "NORMAL")] * len(lines)
 
 if __name__ == "__main__":
     # Test Module
@@ -0,0 +1,641 @@
+import argparse
+import bisect
+import hashlib
+import json
+import os
+import pickle
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from realtime.native import threading
+
+# --- SENTINELX MODEL BUNDLE ---
+# One versioned directory per trained model set: the TF-IDF vocabulary and
+# idf, the Naive Bayes log-probabilities and the Isolation Forest, each as
+# a plain .npy file, plus manifest.json. Arrays are memory-mapped read-only
+# on first use, so processes serving the same version share their pages
+# and nothing needs sklearn at inference time.
+
+BUNDLE_FORMAT = 1
+BUNDLE_DIR = os.getenv(
+    "MODEL_BUNDLE_DIR",
+    os.path.join(os.path.dirname(__file__), '..', 'python_service', 'models')
+)
+CURRENT_FILE = 'CURRENT'
+MANIFEST_FILE = 'manifest.json'
+# Versions kept on disk after an export (the current one included)
+BUNDLE_KEEP = int(os.getenv("MODEL_BUNDLE_KEEP", 3))
+# Forest batches above this size are scored once per distinct feature row
+DEDUP_MIN_ROWS = 64
+# Single-row forest scores memoized per threshold cell (0 disables)
+FOREST_CELL_CACHE = int(os.getenv("FOREST_CELL_CACHE", 65536))
+# Largest integer feature float32 holds exactly
+_FLOAT32_EXACT = 1 << 24
+
+def average_path_length(n_samples):
+    """
+    Expected path length of an unsuccessful BST search over n samples,
+    c(n) in the Isolation Forest paper.
+    """
+    n = np.asarray(n_samples, dtype=np.float64)
+    out = np.zeros_like(n)
+    out[n == 2] = 1.0
+    big = n > 2
+    out[big] = 2.0 * (np.log(n[big] - 1.0) + np.euler_gamma) - 2.0 * (n[big] - 1.0) / n[big]
+    return out
+
+# =========================================================================
+# Inference
+# =========================================================================
+class SparseRows:
+    """
+    Minimal CSR matrix produced by BundleVectorizer.transform.
+    """
+    __slots__ = ("indptr", "indices", "data", "shape")
+
+    def __init__(self, indptr, indices, data, shape):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.shape = shape
+
+class BundleVectorizer:
+    """
+    TfidfVectorizer.transform over the bundle's vocabulary and idf.
+    Supports word unigrams (the only analyzer train_model.py uses).
+    """
+    def __init__(self, terms, idf, params):
+        self._terms = terms
+        self.idf_ = idf
+        self.lowercase = params["lowercase"]
+        self.norm = params["norm"]
+        self.binary = params["binary"]
+        self.sublinear_tf = params["sublinear_tf"]
+        self._token_regex = re.compile(params["token_pattern"])
+        self._vocabulary = None
+        self._lock = threading.Lock()
+
+    @property
+    def vocabulary_(self):
+        if self._vocabulary is None:
+            with self._lock:
+                if self._vocabulary is None:
+                    self._vocabulary = {term: i for i, term in enumerate(self._terms.tolist())}
+        return self._vocabulary
+
+    def transform(self, texts):
+        vocabulary = self.vocabulary_
+        findall = self._token_regex.findall
+        lowercase = self.lowercase
+        indptr = [0]
+        indices = []
+        counts = []
+        for text in texts:
+            if lowercase:
+                text = text.lower()
+            row = {}
+            for token in findall(text):
+                j = vocabulary.get(token)
+                if j is not None:
+                    row[j] = row.get(j, 0) + 1
+            for j in sorted(row):
+                indices.append(j)
+                counts.append(row[j])
+            indptr.append(len(indices))
+
+        indptr = np.asarray(indptr, dtype=np.int64)
+        indices = np.asarray(indices, dtype=np.int64)
+        data = np.ones(len(counts)) if self.binary else np.asarray(counts, dtype=np.float64)
+        if self.sublinear_tf:
+            np.log(data, out=data)
+            data += 1
+        if self.idf_ is not None:
+            data *= self.idf_[indices]
+
+        if self.norm and len(data):
+            lengths = np.diff(indptr)
+            nonempty = lengths > 0
+            per_row = np.abs(data) if self.norm == "l1" else data * data
+            norms = np.zeros(len(lengths))
+            norms[nonempty] = np.add.reduceat(per_row, indptr[:-1][nonempty])
+            if self.norm == "l2":
+                np.sqrt(norms, out=norms)
+            norms[norms == 0.0] = 1.0
+            data /= np.repeat(norms, lengths)
+        return SparseRows(indptr, indices, data, (len(texts), len(self.idf_)))
+
+class BundleNB:
+    """
+    MultinomialNB.predict from the bundle's log-probabilities.
+    """
+    def __init__(self, classes, class_log_prior, feature_log_prob_t):
+        self.classes_ = classes
+        self.class_log_prior_ = class_log_prior
+        # (n_features, n_classes): one gather per non-zero term
+        self._feature_log_prob_t = feature_log_prob_t
+
+    def joint_log_likelihood(self, X):
+        n_rows = X.shape[0]
+        jll = np.zeros((n_rows, len(self.classes_)))
+        lengths = np.diff(X.indptr)
+        nonempty = lengths > 0
+        if nonempty.any():
+            contrib = self._feature_log_prob_t[X.indices] * X.data[:, None]
+            jll[nonempty] = np.add.reduceat(contrib, X.indptr[:-1][nonempty], axis=0)
+        return jll + self.class_log_prior_
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.joint_log_likelihood(X), axis=1)]
+
+class BundleForest:
+    """
+    IsolationForest scoring over flattened trees.
+
+    All trees share one node array; leaves point to themselves so every
+    row can descend `max_depth` levels in lockstep. `leaf_value` holds the
+    leaf depth plus c(leaf samples).
+
+    score_one() is the single-row path. Two rows falling on the same side
+    of every split threshold reach the same leaves, so scores are memoized
+    per threshold cell (one bisect per feature): a repeat cell costs a few
+    microseconds, a new one a lockstep descent of one row.
+    """
+    def __init__(self, roots, feature, threshold, left, right, leaf_value, params):
+        # Plain ndarray views of the maps: np.memmap results are memmaps too,
+        # which adds overhead to every indexing step
+        self.roots = np.asarray(roots)
+        self.feature = np.asarray(feature)
+        self.threshold = np.asarray(threshold)
+        self.left = np.asarray(left)
+        self.right = np.asarray(right)
+        self.leaf_value = np.asarray(leaf_value)
+        self.max_depth = params["max_depth"]
+        self.offset_ = params["offset"]
+        self.n_features_in_ = params["n_features"]
+        self._denominator = len(roots) * params["path_normalizer"]
+        self._cuts = None
+        self._cells = {}
+        self._lock = threading.Lock()
+        self.stats = {"single_rows": 0, "cell_hits": 0}
+
+    def score_samples(self, X):
+        # Trees split on float32 features, like sklearn
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"expected {self.n_features_in_} features, got shape {X.shape}")
+        if len(X) > DEDUP_MIN_ROWS:
+            # Log feature rows repeat a lot; identical rows score identically
+            unique, inverse = np.unique(X, axis=0, return_inverse=True)
+            if len(unique) < len(X):
+                return self.score_samples(unique)[inverse.ravel()]
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        depths = self.leaf_value[nodes].sum(axis=1)
+        return -(2.0 ** (-depths / self._denominator))
+
+    def _split_cuts(self):
+        # Sorted distinct split thresholds per feature, built on first use
+        if self._cuts is None:
+            with self._lock:
+                if self._cuts is None:
+                    split = self.left != np.arange(len(self.left))
+                    self._cuts = tuple(
+                        np.unique(self.threshold[split & (self.feature == j)]).tolist()
+                        for j in range(self.n_features_in_)
+                    )
+        return self._cuts
+
+    def score_one(self, row):
+        """
+        score_samples for one feature row.
+
+        Args:
+            row (sequence): `n_features_in_` numbers.
+
+        Returns:
+            float: The same score score_samples gives for that row.
+        """
+        cuts = self._split_cuts()
+        if len(row) != self.n_features_in_:
+            raise ValueError(f"expected {self.n_features_in_} features, got {len(row)}")
+        # Round like the float32 cast in score_samples
+        x = [float(v) if -_FLOAT32_EXACT < v < _FLOAT32_EXACT else float(np.float32(v)) for v in row]
+        self.stats["single_rows"] += 1
+        cell = tuple(bisect.bisect_left(c, v) for c, v in zip(cuts, x))
+        score = self._cells.get(cell)
+        if score is not None:
+            self.stats["cell_hits"] += 1
+            return score
+
+        # score_samples descent for one row, without the 2-D indexing
+        x = np.asarray(x, dtype=np.float32)
+        nodes = self.roots
+        for _ in range(self.max_depth):
+            nodes = np.where(x[self.feature[nodes]] <= self.threshold[nodes], self.left[nodes], self.right[nodes])
+        # Same array expression as score_samples, so the score is bit-identical
+        depths = self.leaf_value[nodes[None, :]].sum(axis=1)
+        score = float(-(2.0 ** (-depths / self._denominator))[0])
+        if FOREST_CELL_CACHE:
+            if len(self._cells) >= FOREST_CELL_CACHE:
+                self._cells = {}
+            self._cells[cell] = score
+        return score
+
+    def decision_function(self, X):
+        return self.score_samples(X) - self.offset_
+
+    def predict(self, X):
+        return np.where(self.decision_function(X) < 0, -1, 1)
+
+class ModelBundle:
+    """
+    Lazy view of one bundle version. Nothing is read until an attribute is
+    first used; arrays are opened with mmap_mode='r'.
+    """
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self._manifest = None
+        self._parts = {}
+        self._lock = threading.Lock()
+
+    @property
+    def manifest(self):
+        if self._manifest is None:
+            with open(os.path.join(self.path, MANIFEST_FILE)) as f:
+                manifest = json.load(f)
+            if manifest.get("format") != BUNDLE_FORMAT:
+                raise ValueError(f"unsupported bundle format {manifest.get('format')} in {self.path}")
+            self._manifest = manifest
+        return self._manifest
+
+    @property
+    def version(self):
+        return self.manifest["version"]
+
+    def array(self, name):
+        entry = self.manifest["arrays"][name]
+        return np.load(os.path.join(self.path, entry["file"]), mmap_mode='r', allow_pickle=False)
+
+    def _part(self, name, build):
+        part = self._parts.get(name)
+        if part is None:
+            with self._lock:
+                part = self._parts.get(name)
+                if part is None:
+                    part = self._parts[name] = build()
+        return part
+
+    @property
+    def vectorizer(self):
+        return self._part("vectorizer", lambda: BundleVectorizer(
+            self.array("vocabulary"), self.array("idf") if "idf" in self.manifest["arrays"] else None,
+            self.manifest["vectorizer"]
+        ))
+
+    @property
+    def intent_model(self):
+        return self._part("intent_model", lambda: BundleNB(
+            self.array("nb_classes"), self.array("nb_class_log_prior"), self.array("nb_feature_log_prob_t")
+        ))
+
+    @property
+    def forest(self):
+        """
+        Returns the anomaly forest, or None when the bundle has none.
+        """
+        if "forest" not in self.manifest:
+            return None
+        return self._part("forest", lambda: BundleForest(
+            self.array("forest_roots"), self.array("forest_feature"), self.array("forest_threshold"),
+            self.array("forest_left"), self.array("forest_right"), self.array("forest_leaf_value"),
+            self.manifest["forest"]
+        ))
+
+    def verify(self):
+        """
+        Re-hashes every array file against the manifest. Returns the names
+        that do not match.
+        """
+        bad = []
+        for name, entry in self.manifest["arrays"].items():
+            if _file_digest(os.path.join(self.path, entry["file"])) != entry["sha256"]:
+                bad.append(name)
+        return bad
+
+def compile_forest(forest):
+    """
+    Flattens a fitted sklearn IsolationForest into an in-memory
+    BundleForest (the arrays an export would write).
+    """
+    arrays, params = _forest_arrays(forest)
+    return BundleForest(
+        arrays["forest_roots"], arrays["forest_feature"], arrays["forest_threshold"],
+        arrays["forest_left"], arrays["forest_right"], arrays["forest_leaf_value"], params
+    )
+
+def current_pointer(root=BUNDLE_DIR):
+    return os.path.join(root, CURRENT_FILE)
+
+def current_path(root=BUNDLE_DIR):
+    """
+    Returns the directory of the current version, or None.
+    """
+    try:
+        with open(current_pointer(root)) as f:
+            version = f.read().strip()
+    except OSError:
+        return None
+    path = os.path.join(root, version)
+    return path if version and os.path.isdir(path) else None
+
+def load_current(root=BUNDLE_DIR):
+    """
+    Returns a lazy ModelBundle for the current version, or None.
+    """
+    path = current_path(root)
+    return ModelBundle(path) if path else None
+
+# =========================================================================
+# Export
+# =========================================================================
+def _file_digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def _vectorizer_arrays(vectorizer):
+    unsupported = []
+    if vectorizer.analyzer != 'word':
+        unsupported.append(f"analyzer={vectorizer.analyzer!r}")
+    if tuple(vectorizer.ngram_range) != (1, 1):
+        unsupported.append(f"ngram_range={vectorizer.ngram_range!r}")
+    if vectorizer.tokenizer is not None or vectorizer.preprocessor is not None:
+        unsupported.append("custom tokenizer/preprocessor")
+    if vectorizer.strip_accents is not None:
+        unsupported.append(f"strip_accents={vectorizer.strip_accents!r}")
+    if unsupported:
+        raise ValueError("vectorizer not exportable: " + ", ".join(unsupported))
+
+    vocabulary = vectorizer.vocabulary_
+    terms = [''] * len(vocabulary)
+    for term, i in vocabulary.items():
+        terms[i] = term
+    arrays = {"vocabulary": np.array(terms, dtype=str)}
+    if getattr(vectorizer, "use_idf", False):
+        arrays["idf"] = np.asarray(vectorizer.idf_, dtype=np.float64)
+    params = {
+        "lowercase": bool(vectorizer.lowercase),
+        "token_pattern": vectorizer.token_pattern,
+        "norm": getattr(vectorizer, "norm", None),
+        "binary": bool(vectorizer.binary),
+        "sublinear_tf": bool(getattr(vectorizer, "sublinear_tf", False)),
+        "n_features": len(terms)
+    }
+    return arrays, params
+
+def _nb_arrays(intent_model):
+    arrays = {
+        "nb_classes": np.asarray(intent_model.classes_).astype(str),
+        "nb_class_log_prior": np.asarray(intent_model.class_log_prior_, dtype=np.float64),
+        "nb_feature_log_prob_t": np.ascontiguousarray(np.asarray(intent_model.feature_log_prob_, dtype=np.float64).T)
+    }
+    return arrays, {"type": type(intent_model).__name__, "n_classes": len(arrays["nb_classes"])}
+
+def _forest_arrays(forest):
+    roots, feature, threshold, left, right, leaf_value = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for estimator, features in zip(forest.estimators_, forest.estimators_features_):
+        tree = estimator.tree_
+        n = tree.node_count
+        ids = np.arange(n)
+        is_leaf = tree.children_left == -1
+        # Nodes are stored parent-before-child, so one forward pass sets depths
+        depth = np.zeros(n, dtype=np.int64)
+        for i in range(n):
+            if not is_leaf[i]:
+                depth[tree.children_left[i]] = depth[tree.children_right[i]] = depth[i] + 1
+        max_depth = max(max_depth, int(depth.max()))
+
+        roots.append(offset)
+        feature.append(np.where(is_leaf, 0, np.asarray(features)[np.maximum(tree.feature, 0)]))
+        threshold.append(np.where(is_leaf, np.inf, tree.threshold))
+        left.append(np.where(is_leaf, ids, tree.children_left) + offset)
+        right.append(np.where(is_leaf, ids, tree.children_right) + offset)
+        # Same expression order as IsolationForest._compute_score_samples
+        leaf_value.append(np.where(is_leaf, (depth + 1.0) + average_path_length(tree.n_node_samples) - 1.0, 0.0))
+        offset += n
+
+    arrays = {
+        "forest_roots": np.asarray(roots, dtype=np.int64),
+        "forest_feature": np.concatenate(feature).astype(np.int64),
+        "forest_threshold": np.concatenate(threshold).astype(np.float64),
+        "forest_left": np.concatenate(left).astype(np.int64),
+        "forest_right": np.concatenate(right).astype(np.int64),
+        "forest_leaf_value": np.concatenate(leaf_value).astype(np.float64)
+    }
+    params = {
+        "n_estimators": len(roots),
+        "n_features": int(forest.n_features_in_),
+        "max_depth": max_depth,
+        "offset": float(forest.offset_),
+        "path_normalizer": float(average_path_length([forest.max_samples_])[0])
+    }
+    return arrays, params
+
+def export_bundle(vectorizer, intent_model, forest=None, root=BUNDLE_DIR, version=None, keep=BUNDLE_KEEP):
+    """
+    Writes a new bundle version and points CURRENT at it.
+
+    The version directory is written under a temporary name and renamed
+    into place, then CURRENT is replaced atomically, so readers see either
+    the previous version or the complete new one.
+
+    Args:
+        vectorizer (TfidfVectorizer): Fitted intent vectorizer.
+        intent_model (MultinomialNB): Fitted intent classifier.
+        forest (IsolationForest): Optional fitted anomaly forest.
+        root (str): Bundle directory.
+        version (str): Version name (defaults to a timestamp).
+        keep (int): Versions kept after the export.
+
+    Returns:
+        str: Path of the new version directory.
+    """
+    arrays, vec_params = _vectorizer_arrays(vectorizer)
+    nb_arrays, nb_params = _nb_arrays(intent_model)
+    arrays.update(nb_arrays)
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "created_at": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        "sklearn_version": getattr(sys.modules.get('sklearn'), '__version__', None),
+        "vectorizer": vec_params,
+        "intent_model": nb_params
+    }
+    if forest is not None:
+        forest_arrays, manifest["forest"] = _forest_arrays(forest)
+        arrays.update(forest_arrays)
+
+    os.makedirs(root, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix='.tmp-', dir=root)
+    try:
+        manifest["arrays"] = {}
+        for name, arr in arrays.items():
+            filename = name + '.npy'
+            np.save(os.path.join(tmp, filename), arr, allow_pickle=False)
+            manifest["arrays"][name] = {
+                "file": filename,
+                "dtype": arr.dtype.str,
+                "shape": list(arr.shape),
+                "sha256": _file_digest(os.path.join(tmp, filename))
+            }
+        content = hashlib.sha256(json.dumps(manifest["arrays"], sort_keys=True).encode()).hexdigest()
+        version = version or time.strftime('%Y%m%d-%H%M%S') + '-' + content[:8]
+        manifest["version"] = version
+        with open(os.path.join(tmp, MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        path = os.path.join(root, version)
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.rename(tmp, path)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    pointer_tmp = current_pointer(root) + '.tmp'
+    with open(pointer_tmp, 'w') as f:
+        f.write(version + '\n')
+    os.replace(pointer_tmp, current_pointer(root))
+    prune(root, keep)
+    print(f"[BUNDLE] Exported model bundle {version} ({len(arrays)} arrays) to {root}")
+    return path
+
+def prune(root=BUNDLE_DIR, keep=BUNDLE_KEEP):
+    """
+    Deletes the oldest versions beyond `keep`, never the current one.
+    Processes still mapping a deleted version keep their pages.
+    """
+    current = os.path.basename(current_path(root) or '')
+    versions = sorted(
+        (d for d in os.listdir(root)
+         if not d.startswith('.') and os.path.isfile(os.path.join(root, d, MANIFEST_FILE))),
+        key=lambda d: os.path.getmtime(os.path.join(root, d))
+    )
+    for version in versions[:max(0, len(versions) - max(1, keep))]:
+        if version != current:
+            shutil.rmtree(os.path.join(root, version), ignore_errors=True)
+
+# =========================================================================
+# Parity
+# =========================================================================
+def forest_parity(forest, lines, tolerance=1e-9, timing_rows=2000):
+    """
+    Scores `lines` with a fitted sklearn IsolationForest and with its
+    flattened form (batch and single-row paths) and compares them.
+
+    Returns:
+        dict: Max score differences, anomaly flag disagreements and
+        per-row single-event latency (µs) of each scorer.
+    """
+    from ai.anomaly import LogVectorizer
+    flat = compile_forest(forest)
+    X = LogVectorizer.vectorize_batch(lines)
+    expected = forest.score_samples(X)
+    batch = flat.score_samples(X)
+    single = np.array([flat.score_one(row) for row in X.tolist()])
+    rows = [LogVectorizer.vectorize_one(line) for line in lines]
+
+    def per_row_us(fn, sample):
+        started = time.perf_counter()
+        for row in sample:
+            fn(row)
+        return round((time.perf_counter() - started) / len(sample) * 1e6, 3)
+
+    sample = X[:min(timing_rows, len(X))]
+    # Fresh cache so the timing covers cold cells too
+    flat = compile_forest(forest)
+    report = {
+        "rows": len(lines),
+        "distinct_rows": int(len(np.unique(X, axis=0))),
+        "features_match": bool(np.array_equal(np.asarray(rows, dtype=np.int64).reshape(X.shape), X)),
+        "max_abs_diff_batch": float(np.max(np.abs(batch - expected))) if len(X) else 0.0,
+        "max_abs_diff_single": float(np.max(np.abs(single - expected))) if len(X) else 0.0,
+        "single_equals_batch": bool(np.array_equal(single, batch)),
+        "flag_mismatches": int(np.sum(((batch - forest.offset_) < 0) != ((expected - forest.offset_) < 0))
+                               + np.sum(((single - forest.offset_) < 0) != ((expected - forest.offset_) < 0))),
+        "us_per_row": {
+            "sklearn_score_samples": per_row_us(lambda r: forest.score_samples(r[None, :]), sample[:200]),
+            "flat_score_samples": per_row_us(lambda r: flat.score_samples(r[None, :]), sample),
+            "flat_score_one": per_row_us(flat.score_one, sample.tolist()),
+            "flat_score_one_cached": per_row_us(flat.score_one, sample.tolist())
+        },
+        "tolerance": tolerance
+    }
+    report["ok"] = (report["features_match"] and report["single_equals_batch"] and report["flag_mismatches"] == 0
+                    and max(report["max_abs_diff_batch"], report["max_abs_diff_single"]) <= tolerance)
+    return report
+
+def _vault_lines(vault_dir):
+    import csv
+    import glob
+    lines = []
+    for path in sorted(glob.glob(os.path.join(vault_dir, '*_2k.log_structured.csv'))):
+        with open(path, newline='', encoding='utf-8', errors='ignore') as f:
+            lines.extend(row['Content'] for row in csv.DictReader(f) if row.get('Content'))
+    return lines
+
+def main(argv=None):
+    base = os.path.join(os.path.dirname(__file__), '..', 'python_service')
+    parser = argparse.ArgumentParser(description="SentinelX model bundle tool")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="convert pickled artifacts into a new bundle version")
+    export.add_argument("--model", default=os.path.join(base, 'chatbot_model.pkl'))
+    export.add_argument("--vectorizer", default=os.path.join(base, 'tfidf_vectorizer.pkl'))
+    export.add_argument("--forest", default=os.path.join(os.path.dirname(__file__), 'anomaly_model.joblib'),
+                        help="joblib/pickle IsolationForest over LogVectorizer features (optional)")
+    export.add_argument("--root", default=BUNDLE_DIR)
+    info = sub.add_parser("info", help="show the current bundle and verify its arrays")
+    info.add_argument("--root", default=BUNDLE_DIR)
+    parity = sub.add_parser("parity", help="compare the flattened forest with sklearn on the vault")
+    parity.add_argument("--forest", default=os.path.join(os.path.dirname(__file__), 'anomaly_model.joblib'))
+    parity.add_argument("--vault", default=os.path.join(os.path.dirname(__file__), '..', 'data', 'training_vault'))
+    parity.add_argument("--tolerance", type=float, default=1e-9)
+    args = parser.parse_args(argv)
+
+    if args.command == "parity":
+        import joblib
+        report = forest_parity(joblib.load(args.forest), _vault_lines(args.vault), args.tolerance)
+        print(json.dumps(report, indent=2))
+        return 0 if report["ok"] else 1
+
+    if args.command == "export":
+        import joblib
+        with open(args.model, 'rb') as f:
+            intent_model = pickle.load(f)
+        with open(args.vectorizer, 'rb') as f:
+            vectorizer = pickle.load(f)
+        forest = joblib.load(args.forest) if args.forest and os.path.exists(args.forest) else None
+        export_bundle(vectorizer, intent_model, forest, root=args.root)
+        return 0
+
+    bundle = load_current(args.root)
+    if bundle is None:
+        print(f"[BUNDLE] No current bundle in {args.root}")
+        return 1
+    bad = bundle.verify()
+    print(json.dumps(dict(bundle.manifest, path=bundle.path, corrupt_arrays=bad), indent=2))
+    return 1 if bad else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+import os
+import time
+from array import array
+
+import numpy as np
+
+from ai.templates import TemplateMiner
+from realtime.native import threading
+
+# --- SENTINELX CORRELATION ENGINE ---
+# Sliding-window counters across events. Each dimension (origin IP, failed
+# logins per IP, source, template) is a count-min sketch split into time
+# buckets: adding an event touches DEPTH cells, the window total is kept
+# running, and an expiring bucket is subtracted in one vectorized step.
+# Memory is fixed by the sketch size, whatever the number of distinct keys.
+
+CORRELATION_WINDOW = float(os.getenv("CORRELATION_WINDOW_SEC", 60))
+CORRELATION_BUCKETS = int(os.getenv("CORRELATION_BUCKETS", 12))
+CORRELATION_DEPTH = int(os.getenv("CORRELATION_DEPTH", 4))
+# Sketch width is the largest power of two that fits this budget
+CORRELATION_MEMORY_MB = float(os.getenv("CORRELATION_MEMORY_MB", 4))
+CORRELATION_TOP_K = int(os.getenv("CORRELATION_TOP_K", 20))
+
+# Detection thresholds, in events per window
+BRUTE_FORCE_THRESHOLD = int(os.getenv("CORRELATION_BRUTE_FORCE_THRESHOLD", 5))
+IP_FLOOD_THRESHOLD = int(os.getenv("CORRELATION_IP_FLOOD_THRESHOLD", 300))
+BURST_THRESHOLD = int(os.getenv("CORRELATION_BURST_THRESHOLD", 200))
+
+DIMENSIONS = ("ip", "ip_failures", "source", "template")
+
+def template_key(text):
+    """
+    Variable fields (ids, IPs, counters) masked, so repeats of one message
+    shape share a counter.
+    """
+    return ' '.join(TemplateMiner.tokenize(str(text).lower()))
+
+class WindowedSketch:
+    """
+    Count-min sketch over a sliding window of `buckets` time slices.
+
+    Estimates never undercount; they overcount by at most ~e/width of the
+    window's events with high probability.
+    """
+    def __init__(self, width, depth=CORRELATION_DEPTH, window=CORRELATION_WINDOW, buckets=CORRELATION_BUCKETS):
+        self.width = width
+        self.depth = depth
+        self.buckets = max(1, buckets)
+        self.slice = float(window) / self.buckets
+        # Compact int32 storage with fast scalar updates; numpy views do the
+        # bulk work on rotation
+        self._cells = array('i', bytes(4 * self.buckets * depth * width))
+        self._total = array('i', bytes(4 * depth * width))
+        self._cells_np = np.frombuffer(self._cells, dtype=np.int32).reshape(self.buckets, depth * width)
+        self._total_np = np.frombuffer(self._total, dtype=np.int32)
+        self._tick = None
+        self.events = 0
+
+    @property
+    def memory_bytes(self):
+        return self._cells.itemsize * (len(self._cells) + len(self._total))
+
+    def _indexes(self, key):
+        h = hash(key) & 0xffffffffffffffff
+        h1, h2 = h & 0xffffffff, (h >> 32) | 1
+        width = self.width
+        return [d * width + (h1 + d * h2) % width for d in range(self.depth)]
+
+    def advance(self, now):
+        """
+        Expires the slices that left the window. Returns True when at least
+        one slice was recycled.
+        """
+        tick = int(now // self.slice)
+        if self._tick is None:
+            self._tick = tick
+            return False
+        if tick <= self._tick:
+            return False
+        steps = tick - self._tick
+        if steps >= self.buckets:
+            self._cells_np[:] = 0
+            self._total_np[:] = 0
+        else:
+            for t in range(self._tick + 1, tick + 1):
+                row = self._cells_np[t % self.buckets]
+                self._total_np -= row
+                row[:] = 0
+        self._tick = tick
+        return True
+
+    def add(self, key, now, count=1):
+        """
+        Counts `key` at time `now` and returns its window estimate.
+        """
+        cells, total = self._cells, self._total
+        base = (self._tick % self.buckets) * self.depth * self.width
+        estimate = None
+        for i in self._indexes(key):
+            cells[base + i] += count
+            total[i] += count
+            v = total[i]
+            if estimate is None or v < estimate:
+                estimate = v
+        self.events += count
+        return estimate
+
+    def estimate(self, key):
+        total = self._total
+        return min(total[i] for i in self._indexes(key))
+
+class TopK:
+    """
+    Bounded heavy-hitter set fed with sketch estimates. A key enters only
+    when it beats the smallest tracked estimate, so most events cost O(1).
+    """
+    def __init__(self, k=CORRELATION_TOP_K):
+        self.k = max(1, k)
+        self.counts = {}
+        self._floor = 0
+
+    def offer(self, key, estimate):
+        counts = self.counts
+        if key in counts:
+            counts[key] = estimate
+            return
+        if len(counts) < self.k:
+            counts[key] = estimate
+            if len(counts) == self.k:
+                self._floor = min(counts.values())
+            return
+        if estimate <= self._floor:
+            return
+        del counts[min(counts, key=counts.get)]
+        counts[key] = estimate
+        self._floor = min(counts.values())
+
+    def refresh(self, sketch):
+        # After slices expire, re-read every tracked key and drop the dead ones
+        counts = {key: sketch.estimate(key) for key in self.counts}
+        self.counts = {key: n for key, n in counts.items() if n > 0}
+        self._floor = min(self.counts.values()) if len(self.counts) >= self.k else 0
+
+    def items(self):
+        return sorted(self.counts.items(), key=lambda kv: -kv[1])
+
+class CorrelationEngine:
+    """
+    Thread-safe rate tracker across events.
+
+    Args:
+        window (float): Window length, in the units of `now` (seconds for
+            live traffic, lines for an uploaded file).
+        memory_mb (float): Budget for all sketches together.
+        clock (callable): Default source of `now`; None when every call
+            passes `now` explicitly (e.g. line numbers).
+    """
+    def __init__(self, window=CORRELATION_WINDOW, buckets=CORRELATION_BUCKETS, depth=CORRELATION_DEPTH,
+                 memory_mb=CORRELATION_MEMORY_MB, top_k=CORRELATION_TOP_K,
+                 brute_force_threshold=BRUTE_FORCE_THRESHOLD, ip_flood_threshold=IP_FLOOD_THRESHOLD,
+                 burst_threshold=BURST_THRESHOLD, clock=time.time):
+        budget_cells = int(memory_mb * (1 << 20)) // (4 * len(DIMENSIONS) * depth * (max(1, buckets) + 1))
+        width = 1 << max(6, budget_cells.bit_length() - 1)
+        self.window = window
+        self.clock = clock
+        self.thresholds = {
+            "brute_force": brute_force_threshold,
+            "ip_flood": ip_flood_threshold,
+            "burst": burst_threshold,
+        }
+        self._sketches = {d: WindowedSketch(width, depth, window, buckets) for d in DIMENSIONS}
+        self._top = {d: TopK(top_k) for d in DIMENSIONS}
+        self._lock = threading.Lock()
+        self.stats = {"events": 0, "brute_force": 0, "ip_flood": 0, "burst": 0}
+
+    def _count(self, dimension, key, now, count=1):
+        sketch = self._sketches[dimension]
+        if sketch.advance(now):
+            self._top[dimension].refresh(sketch)
+        n = sketch.add(key, now, count)
+        self._top[dimension].offer(key, n)
+        return n
+
+    def observe(self, ip=None, source=None, template=None, auth_failure=False, now=None, weight=1):
+        """
+        Records one event and returns its window counts plus the detections
+        it triggers. A sampled event stands for `weight` events.
+
+        Returns:
+            dict: ip_events, ip_failures, source_events, template_events and
+            detections (list of "brute_force", "ip_flood", "burst").
+        """
+        now = self.clock() if now is None else now
+        result = {"ip_events": 0, "ip_failures": 0, "source_events": 0, "template_events": 0, "detections": []}
+        detections = result["detections"]
+        with self._lock:
+            self.stats["events"] += weight
+            if ip:
+                result["ip_events"] = self._count("ip", ip, now, weight)
+                if auth_failure:
+                    result["ip_failures"] = self._count("ip_failures", ip, now, weight)
+            if source:
+                result["source_events"] = self._count("source", source, now, weight)
+            if template:
+                result["template_events"] = self._count("template", template, now, weight)
+
+            # Reported on every event while the key is at or over the threshold
+            if result["ip_failures"] >= self.thresholds["brute_force"]:
+                detections.append("brute_force")
+            if result["ip_events"] >= self.thresholds["ip_flood"]:
+                detections.append("ip_flood")
+            if result["template_events"] >= self.thresholds["burst"]:
+                detections.append("burst")
+            for name in detections:
+                self.stats[name] += 1
+        return result
+
+    def top(self, dimension, n=None):
+        with self._lock:
+            if self.clock is not None:
+                # Expire quiet dimensions before reading them
+                sketch = self._sketches[dimension]
+                if sketch.advance(self.clock()):
+                    self._top[dimension].refresh(sketch)
+            items = self._top[dimension].items()
+        return [{"key": k, "count": c} for k, c in items[:n]]
+
+    def get_stats(self):
+        sketch = self._sketches[DIMENSIONS[0]]
+        stats = dict(self.stats)
+        stats["window"] = self.window
+        stats["sketch_width"] = sketch.width
+        stats["memory_bytes"] = sum(s.memory_bytes for s in self._sketches.values())
+        stats["top"] = {d: self.top(d, 5) for d in DIMENSIONS}
+        return stats
@@ -0,0 +1,189 @@
+import re
+
+# Native Aho-Corasick automaton when available; compiled regex otherwise
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+# --- SENTINELX KEYWORD MATCHER ---
+# Every keyword rule used by the analysis paths is compiled into one
+# automaton so a line is scanned once, no matter how many keywords exist.
+
+# Professional Pattern Engine (Augmented by Datasets)
+PATTERNS = {
+    'Linux': ['sshd', 'kernel', 'boot', 'session opened', 'authentication failure'],
+    'Windows': ['sysmon', 'security-auditing', 'logon', 'service control manager', 'distributedcom'],
+    'Apache': ['http', 'get /', 'post /', '404', '500', 'client denied'],
+    'HDFS': ['datanode', 'namenode', 'block', 'replication', 'heartbeat'],
+    'Zookeeper': ['sessionid', 'follower', 'leader', 'quorum', 'election'],
+    'Database': ['sql', 'query', 'syntax error', 'deadlock', 'transaction'],
+    'Security': ['denied', 'blocked', 'attack', 'malicious', 'probe', 'brute force']
+}
+
+# Line severity (checked in this order)
+SEVERITY_KEYWORDS = {
+    'ERROR': ['error', 'critical', 'fail', 'panic', 'fatal'],
+    'WARN': ['warn', 'caution', 'alert'],
+}
+
+# Upload suggestion rules
+SUGGESTION_RULES = {
+    'security': ['login', 'auth', 'denied'],
+    'stability': ['timeout', 'down'],
+    'resource': ['memory', 'oom', 'heap'],
+    'breach': ['sshd', 'root'],
+}
+
+# /api/analyze-log threat rules
+THREAT_RULES = {
+    'login': ['login'],
+    'fail': ['fail'],
+    'degradation': ['timeout', 'refused'],
+    'sql': ['sql', 'syntax'],
+}
+
+# Anomaly feature vocabulary; each keyword is counted separately
+RISK_KEYWORDS = ['error', 'critical', 'fail', 'failed', 'panic', 'fatal', 'denied', 'attack', 'exception']
+
+def _trie_pattern(words):
+    """
+    Builds a regex alternation shaped like a trie so the engine dispatches on
+    one character at a time and always prefers the longest keyword.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return '(?:' + body + ')?' if '' in node else body
+
+    return build(trie)
+
+class KeywordMatcher:
+    """
+    Multi-pattern substring matcher.
+
+    Groups of keywords are compiled into one Aho-Corasick automaton (or, as a
+    fallback, one trie-shaped regex wrapped in a lookahead) so overlapping
+    keywords are all found in a single pass. A match returns a bitmask of
+    every group hit by the text.
+    """
+    def __init__(self, groups):
+        """
+        Args:
+            groups (dict): Ordered mapping of group name -> list of keywords.
+        """
+        self.names = list(groups)
+        self._bits = {name: 1 << i for i, name in enumerate(self.names)}
+
+        keyword_mask = {}
+        for name, words in groups.items():
+            for word in words:
+                keyword_mask[word] = keyword_mask.get(word, 0) | self._bits[name]
+
+        if AHOCORASICK_AVAILABLE:
+            # The automaton reports every occurrence, overlapping or not
+            self._automaton = ahocorasick.Automaton()
+            for word, bits in keyword_mask.items():
+                self._automaton.add_word(word, bits)
+            self._automaton.make_automaton()
+            self.backend = "aho-corasick"
+            return
+
+        # Regex fallback: at one position only the longest keyword is
+        # captured; it implies every shorter keyword that is a prefix of it.
+        self._automaton = None
+        self._closure = {}
+        for word in keyword_mask:
+            mask = 0
+            for other, bits in keyword_mask.items():
+                if word.startswith(other):
+                    mask |= bits
+            self._closure[word] = mask
+        self._regex = re.compile('(?=(' + _trie_pattern(keyword_mask) + '))')
+        self.backend = "regex"
+
+    def bit(self, name):
+        return self._bits[name]
+
+    def bits(self, names):
+        mask = 0
+        for name in names:
+            mask |= self._bits[name]
+        return mask
+
+    def mask(self, text):
+        """
+        Returns the group bitmask for one (already lower-cased) text.
+        """
+        mask = 0
+        if self._automaton is not None:
+            for _, bits in self._automaton.iter(text):
+                mask |= bits
+            return mask
+        closure = self._closure
+        for m in self._regex.finditer(text):
+            mask |= closure[m.group(1)]
+        return mask
+
+    def masks(self, texts):
+        return [self.mask(t) for t in texts]
+
+    def groups(self, mask):
+        """
+        Returns the group names set in `mask`, in definition order.
+        """
+        return [name for name in self.names if mask & self._bits[name]]
+
+def _build_log_matcher():
+    groups = {}
+    for sev, words in SEVERITY_KEYWORDS.items():
+        groups['severity:' + sev] = words
+    for key, words in PATTERNS.items():
+        groups['device:' + key] = words
+    for rule, words in SUGGESTION_RULES.items():
+        groups['rule:' + rule] = words
+    for rule, words in THREAT_RULES.items():
+        groups['threat:' + rule] = words
+    for word in RISK_KEYWORDS:
+        groups['risk:' + word] = [word]
+    return KeywordMatcher(groups)
+
+# Shared by the upload scorer, LogVectorizer and /api/analyze-log
+LOG_MATCHER = _build_log_matcher()
+
+ERROR_BIT = LOG_MATCHER.bit('severity:ERROR')
+WARN_BIT = LOG_MATCHER.bit('severity:WARN')
+DEVICE_BITS = [(key, LOG_MATCHER.bit('device:' + key)) for key in PATTERNS]
+RISK_MASK = LOG_MATCHER.bits('risk:' + w for w in RISK_KEYWORDS)
+
+def severity_of(mask):
+    """
+    Maps a line mask to the upload severity (ERROR > WARN > INFO).
+    """
+    if mask & ERROR_BIT:
+        return "ERROR"
+    if mask & WARN_BIT:
+        return "WARN"
+    return "INFO"
+
+def device_of(mask):
+    """
+    Returns the first PATTERNS key hit by the mask, or None.
+    """
+    for key, bit in DEVICE_BITS:
+        if mask & bit:
+            return key
+    return None
+
+def risk_keyword_count(mask):
+    return bin(mask & RISK_MASK).count('1')
@@ -0,0 +1,203 @@
+import csv
+import glob
+import os
+import re
+
+from realtime.native import threading
+
+# --- SENTINELX TEMPLATE MINER ---
+# Online Drain-style log template mining. Repeated lines collapse onto a
+# template so per-template results (intent) are computed once.
+
+VAULT_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'training_vault')
+WILDCARD = '<*>'
+
+# Drain parameters
+TREE_DEPTH = int(os.getenv("TEMPLATE_TREE_DEPTH", 4))
+SIMILARITY = float(os.getenv("TEMPLATE_SIMILARITY", 0.5))
+MAX_CHILDREN = int(os.getenv("TEMPLATE_MAX_CHILDREN", 100))
+MAX_TEMPLATES = int(os.getenv("TEMPLATE_MAX_CLUSTERS", 20000))
+
+# Tokens holding digits (ids, IPs, block ids, counters) or an explicit
+# wildcard are parameters
+_PARAM_REGEX = re.compile(r'\d|<\*>')
+
+class Template:
+    __slots__ = ("id", "tokens", "size", "intent")
+
+    def __init__(self, template_id, tokens):
+        self.id = template_id
+        self.tokens = tokens
+        self.size = 0
+        # Cached per-template results
+        self.intent = None
+
+    @property
+    def text(self):
+        return ' '.join(self.tokens)
+
+class TemplateMiner:
+    """
+    Drain parse tree: length -> first TREE_DEPTH-2 tokens -> template list.
+
+    `match` returns the template of a line, creating or generalizing one as
+    needed. Seed templates (e.g. the vault's EventTemplate column) start the
+    tree warm.
+    """
+    def __init__(self, depth=TREE_DEPTH, similarity=SIMILARITY,
+                 max_children=MAX_CHILDREN, max_templates=MAX_TEMPLATES):
+        self.depth = max(3, depth)
+        self.similarity = similarity
+        self.max_children = max_children
+        self.max_templates = max_templates
+        self._root = {}
+        self._templates = {}
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self.stats = {"lines": 0, "matched": 0, "created": 0, "overflow": 0, "seeded": 0}
+
+    @staticmethod
+    def tokenize(line):
+        is_param = _PARAM_REGEX.search
+        # Purely alphabetic tokens (most of them) skip the regex
+        return [WILDCARD if not t.isalpha() and is_param(t) else t for t in line.split()]
+
+    def _leaf(self, tokens, create):
+        node = self._root.get(len(tokens))
+        if node is None:
+            if not create:
+                return None
+            node = self._root[len(tokens)] = {}
+        for key in tokens[:self.depth - 2]:
+            child = node.get(key)
+            if child is None:
+                # Too many distinct values at this level: share a wildcard branch
+                if len(node) >= self.max_children:
+                    key = WILDCARD
+                child = node.get(key)
+                if child is None:
+                    if not create:
+                        return None
+                    child = node[key] = {}
+            node = child
+        return node.setdefault('', []) if create else node.get('')
+
+    def _best(self, candidates, tokens):
+        # Template parameters count as matches; ties go to the template with
+        # more exact tokens
+        best, best_sim, best_same = None, -1.0, -1
+        n = len(tokens) or 1
+        for tpl in candidates:
+            same = params = 0
+            for a, b in zip(tpl.tokens, tokens):
+                if a == b:
+                    same += 1
+                elif a == WILDCARD:
+                    params += 1
+            sim = (same + params) / n
+            if sim > best_sim or (sim == best_sim and same > best_same):
+                best, best_sim, best_same = tpl, sim, same
+        return best if best_sim >= self.similarity else None
+
+    def add_template(self, template, template_id=None):
+        """
+        Registers a known (lower-cased) template with wildcards written as <*>.
+        """
+        tokens = self.tokenize(template)
+        with self._lock:
+            leaf = self._leaf(tokens, create=True)
+            for tpl in leaf:
+                if tpl.tokens == tokens:
+                    return tpl
+            tpl = self._create(leaf, tokens, template_id)
+            self.stats["seeded"] += 1
+            return tpl
+
+    def _create(self, leaf, tokens, template_id=None):
+        if template_id is None:
+            template_id = f"T{self._next_id}"
+            self._next_id += 1
+        tpl = Template(template_id, tokens)
+        leaf.append(tpl)
+        self._templates[template_id] = tpl
+        return tpl
+
+    def match(self, line):
+        """
+        Returns the Template of `line`, or None once MAX_TEMPLATES is reached
+        and the line fits no existing template.
+        """
+        tokens = self.tokenize(line)
+        with self._lock:
+            self.stats["lines"] += 1
+            leaf = self._leaf(tokens, create=len(self._templates) < self.max_templates)
+            tpl = self._best(leaf, tokens) if leaf else None
+            if tpl is not None:
+                self.stats["matched"] += 1
+                if tpl.tokens != tokens:
+                    # Generalize differing positions; cached results stay valid
+                    # because only variable fields changed
+                    tpl.tokens = [a if a == b else WILDCARD for a, b in zip(tpl.tokens, tokens)]
+            elif leaf is not None and len(self._templates) < self.max_templates:
+                tpl = self._create(leaf, tokens)
+                self.stats["created"] += 1
+            else:
+                self.stats["overflow"] += 1
+                return None
+            tpl.size += 1
+            return tpl
+
+    def clear_results(self):
+        """
+        Drops cached per-template results (after a model reload).
+        """
+        with self._lock:
+            for tpl in self._templates.values():
+                tpl.intent = None
+
+    def get_stats(self):
+        return dict(self.stats, templates=len(self._templates))
+
+def seed_from_vault(miner, vault_dir=VAULT_DIR):
+    """
+    Loads the EventTemplate column of every *_structured.csv in the vault.
+    """
+    for path in sorted(glob.glob(os.path.join(vault_dir, '*_structured.csv'))):
+        dataset = os.path.basename(path).split('_')[0]
+        try:
+            with open(path, newline='', encoding='utf-8', errors='ignore') as f:
+                seen = set()
+                for row in csv.DictReader(f):
+                    event_id, template = row.get('EventId'), row.get('EventTemplate')
+                    if event_id and template and event_id not in seen:
+                        seen.add(event_id)
+                        miner.add_template(template.lower(), f"{dataset}:{event_id}")
+        except Exception as e:
+            print(f"[TEMPLATES] Skipping {dataset}: {e}")
+    return miner
+
+_miner = None
+_miner_lock = threading.Lock()
+
+def get_miner():
+    """
+    Returns the process-wide miner, seeded from the vault on first use.
+    """
+    global _miner
+    if _miner is None:
+        with _miner_lock:
+            if _miner is None:
+                _miner = seed_from_vault(TemplateMiner())
+                print(f"[TEMPLATES] Seeded {_miner.stats['seeded']} vault templates.")
+    return _miner
+
+def reset_miner():
+    """
+    Forgets the mined templates; the next get_miner() seeds a fresh tree.
+    """
+    global _miner
+    with _miner_lock:
+        _miner = None
+
+def get_stats():
+    return _miner.get_stats() if _miner is not None else None
@@ -11,6 +11,9 @@ const app = express();
 
 // Standard Middleware (Configuration for SOC integrity)
 app.use(cors({ origin: "*" }));
+// Agent batches (gzip is inflated by the parser) get a larger body limit;
+// the global parser below skips bodies that are already parsed
+app.use("/api/logs/batch", express.json({ limit: process.env.LOG_BATCH_LIMIT || "8mb" }));
 app.use(express.json({ limit: "10kb" }));
 
 // ✅ ROOT UI (Serve Dashboard - PRIORITY 1)
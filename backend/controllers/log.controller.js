@@ -1,4 +1,4 @@
-const { ingestLog } = require("../services/ingest.service");
+const { ingestLog, ingestLogs } = require("../services/ingest.service");
 const { LogEntry, User, DeniedIP } = require("../models");
 
 /**
@@ -23,6 +23,28 @@ exports.receiveLog = async (req, res) => {
     }
 };
 
+// 1.5 BATCH INGEST (agents/agent.py ships JSON arrays, usually gzipped)
+exports.receiveLogBatch = async (req, res) => {
+    const events = Array.isArray(req.body) ? req.body : (req.body && req.body.events);
+    if (!Array.isArray(events)) {
+        return res.status(400).json({ success: false, error: "Expected a JSON array of log events" });
+    }
+    try {
+        const result = await ingestLogs(events);
+        if (result.success) {
+            return res.status(201).json({
+                success: true,
+                accepted: result.accepted,
+                rejected: result.rejected
+            });
+        }
+        // Storage failure: the agent keeps the batch and retries
+        res.status(503).json({ success: false, error: result.error });
+    } catch (err) {
+        res.status(500).json({ success: false, error: "Batch Ingest Handshake Error" });
+    }
+};
+
 // 2. QUERY & FILTER (Point 10)
 exports.getLogs = async (req, res) => {
     try {
@@ -1433,9 +1433,16 @@ async function retrainAIModel(btn) {
 
     try {
         const res = await fetch(`${API}/api/ai/train`, { method: 'POST' });
-        const data = await res.json();
-        if (res.ok) {
-            showToast(`Retraining Complete. Accuracy: ${data.accuracy}%`, 'success');
+        let job = (await res.json()).job;
+        if (res.ok && job) {
+            // Training runs as a background job; poll until it settles
+            while (job.status === 'queued' || job.status === 'running') {
+                btn.innerHTML = `<i class="fas fa-brain fa-pulse"></i> RETRAINING CORE... ${Math.round(job.progress * 100)}%`;
+                await new Promise(resolve => setTimeout(resolve, 1000));
+                job = await (await fetch(`${API}/api/ai/train/jobs/${job.id}`)).json();
+            }
+            if (job.status !== 'succeeded') throw new Error(job.error);
+            showToast(`Retraining Complete. Model ${job.swap.lite_brain} is live.`, 'success');
             btn.innerHTML = '<i class="fas fa-check"></i> CORE OPTIMIZED';
             setTimeout(() => {
                 btn.disabled = false;
@@ -1683,7 +1690,7 @@ function renderAnalysis() {
     updateAnalysisTable(view);
 
     if (analysisActive) {
-        setTimeout(() => renderAnalysisCharts(state.analysisData.issues, state.analysisData.summary), 50);
+        setTimeout(() => renderAnalysisCharts(state.analysisData.issues, state.analysisData.summary, state.analysisData), 50);
     }
 }
 
@@ -2504,7 +2511,7 @@ function showAnalysisResults(data) {
     if (resultsDiv) resultsDiv.style.display = 'block';
 
     const countEl = document.getElementById('log-count-pill');
-    if (countEl) countEl.innerText = `${data.issues.length} Anomalies Detected`;
+    if (countEl) countEl.innerText = `${data.issue_count ?? data.issues.length} Anomalies Detected`;
 
     // Inject LLM Report Section if it doesn't exist
     let llmSection = document.getElementById('quantum-report-section');
@@ -2533,7 +2540,7 @@ function showAnalysisResults(data) {
                     </div>
                     `;
 
-    renderAnalysisCharts(data.issues, data.summary);
+    renderAnalysisCharts(data.issues, data.summary, data);
 
     const tbody = document.getElementById('logTableBody');
     if (tbody) {
@@ -2553,14 +2560,14 @@ function showAnalysisResults(data) {
 }
 
 
-function renderAnalysisCharts(issues, summary) {
+function renderAnalysisCharts(issues, summary, data = {}) {
     if (window.analyticsCharts) {
         window.analyticsCharts.forEach(c => c.destroy());
     }
     window.analyticsCharts = [];
 
     const totalAnomaliesEl = document.getElementById('total-anomalies-bi');
-    if (totalAnomaliesEl) totalAnomaliesEl.innerText = issues.length;
+    if (totalAnomaliesEl) totalAnomaliesEl.innerText = data.issue_count ?? issues.length;
 
     // 1. Log Volume Chart (BI Style)
     const volCtx = document.getElementById('logVolumeChart');
@@ -2622,8 +2629,12 @@ function renderAnalysisCharts(issues, summary) {
     // 3. Threat Origins (Device Chart)
     const deviceCtx = document.getElementById('deviceChart');
     if (deviceCtx) {
-        const deviceCounts = {};
-        issues.forEach(i => { deviceCounts[i.device] = (deviceCounts[i.device] || 0) + 1; });
+        // Whole-file counts when the engine sent them; issues are only the riskiest
+        let deviceCounts = data.trends && data.trends.node_frequency;
+        if (!deviceCounts) {
+            deviceCounts = {};
+            issues.forEach(i => { deviceCounts[i.device] = (deviceCounts[i.device] || 0) + 1; });
+        }
 
         const c3 = new Chart(deviceCtx, {
             type: 'bar',
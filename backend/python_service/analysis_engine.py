@@ -0,0 +1,790 @@
+import argparse
+import functools
+import heapq
+import json
+import multiprocessing
+import os
+import pickle
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+# --- DECOUPLED AI MODULES ---
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from ai import bundle as model_bundle
+from ai.anomaly import IP_REGEX, detect_anomaly_batch
+from ai.correlation import CorrelationEngine, template_key
+from ai.matcher import LOG_MATCHER, PATTERNS, device_of, severity_of
+from ai.templates import get_miner
+from realtime.native import threading
+from intent_cache import IntentCache
+import log_archive
+import metrics
+import online_learning
+import overload
+
+# --- SENTINELX LOG ANALYSIS ENGINE ---
+# Line scoring shared by /analysis/upload and the command line. Large files
+# are split into line-aligned byte ranges and scored on a process pool; the
+# partial results are merged back in original line order. The whole file is
+# always scanned; only the K riskiest issues are kept (TopIssues). The state
+# at the end of a scan (LogScorer.part) can be stored and resumed, so an
+# appended file is only scored from where the last scan stopped.
+
+BASE_DIR = os.path.dirname(__file__)
+MODEL_PATH = os.path.join(BASE_DIR, 'chatbot_model.pkl')
+VECTORIZER_PATH = os.path.join(BASE_DIR, 'tfidf_vectorizer.pkl')
+
+# Lines per vectorized scoring pass
+ANALYSIS_CHUNK_SIZE = int(os.getenv("ANALYSIS_CHUNK_SIZE", 2048))
+# Longer lines are split so a single line can never exhaust memory
+MAX_LINE_BYTES = int(os.getenv("ANALYSIS_MAX_LINE_BYTES", 1 << 20))
+# Process pool size (0/1 disables the pool) and the smallest file worth sharding
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", os.cpu_count() or 1))
+PARALLEL_MIN_BYTES = int(os.getenv("ANALYSIS_PARALLEL_MIN_BYTES", 8 << 20))
+SHARDS_PER_WORKER = 4
+# Reuse intent predictions across lines of the same mined template
+TEMPLATE_CACHE = os.getenv("ANALYSIS_TEMPLATE_CACHE", "1") == "1"
+TREND_POINTS = 20
+# Cross-line correlation inside an upload; the window is counted in lines
+CORRELATION_WINDOW_LINES = int(os.getenv("ANALYSIS_CORRELATION_WINDOW_LINES", 5000))
+CORRELATION_MEMORY_MB = float(os.getenv("ANALYSIS_CORRELATION_MEMORY_MB", 1))
+CORRELATION_IP_FLOOD_LINES = int(os.getenv("ANALYSIS_CORRELATION_IP_FLOOD", 1000))
+CORRELATION_BURST_LINES = int(os.getenv("ANALYSIS_CORRELATION_BURST", 1000))
+
+# Suggestion rule bits of the shared keyword matcher
+SECURITY_BIT = LOG_MATCHER.bit('rule:security')
+STABILITY_BIT = LOG_MATCHER.bit('rule:stability')
+RESOURCE_BIT = LOG_MATCHER.bit('rule:resource')
+BREACH_BIT = LOG_MATCHER.bit('rule:breach')
+LOGIN_BIT = LOG_MATCHER.bit('threat:login')
+FAIL_BIT = LOG_MATCHER.bit('threat:fail')
+
+# Risk floor of an issue that completes a correlated pattern
+CORRELATION_RISK = {"brute_force": 90, "ip_flood": 75, "burst": 70}
+# Rule hits that keep a line out of load-shedding samples
+SHED_EXEMPT_BITS = SECURITY_BIT | BREACH_BIT
+
+def stream_size(stream):
+    """
+    Returns the number of bytes left in a seekable stream, or None.
+    """
+    try:
+        pos = stream.tell()
+        stream.seek(0, os.SEEK_END)
+        size = stream.tell()
+        stream.seek(pos)
+        return size - pos
+    except (AttributeError, OSError, ValueError):
+        return None
+
+def iter_line_chunks(stream, chunk_size=ANALYSIS_CHUNK_SIZE, base_offset=0, base_line=0):
+    """
+    Reads a binary stream incrementally.
+
+    Yields:
+        list: Up to `chunk_size` tuples of (line_index, byte_offset, line).
+    """
+    chunk = []
+    offset = base_offset
+    idx = base_line
+    started = time.perf_counter()
+    for raw in iter(lambda: stream.readline(MAX_LINE_BYTES), b''):
+        chunk.append((idx, offset, raw.decode('utf-8', errors='ignore').rstrip('\n')))
+        offset += len(raw)
+        idx += 1
+        if len(chunk) >= chunk_size:
+            metrics.observe("decode", time.perf_counter() - started, len(chunk))
+            yield chunk
+            chunk = []
+            started = time.perf_counter()
+    if chunk:
+        metrics.observe("decode", time.perf_counter() - started, len(chunk))
+        yield chunk
+
+def timed_predict(model, vectorizer, texts):
+    """
+    TF-IDF transform and NB predict, timed as separate stages.
+    """
+    started = time.perf_counter()
+    X = vectorizer.transform(texts)
+    transformed = time.perf_counter()
+    intents = list(model.predict(X))
+    metrics.observe("tfidf_transform", transformed - started, len(texts))
+    metrics.observe("nb_predict", time.perf_counter() - transformed, len(texts))
+    return intents
+
+def predict_intents_with(model, vectorizer, texts):
+    """
+    Classifies many texts with a single TF-IDF transform and NB predict.
+    Falls back to 'unknown' when the Lite Brain is unavailable.
+    """
+    if not texts:
+        return []
+    if model and vectorizer:
+        try:
+            return timed_predict(model, vectorizer, texts)
+        except Exception as e:
+            print(f"Lite Inference Error: {e}")
+    return ["unknown"] * len(texts)
+
+@functools.lru_cache(maxsize=4096)
+def suggest(ai_intent, mask):
+    """
+    Suggestion rules for a flagged line. Depends only on the predicted intent
+    and the matcher hits, so lines of one template resolve from the cache.
+
+    Returns:
+        tuple: (suggestion, risk_score, force_anomaly, force_anomaly_status)
+    """
+    suggestion = "AI Analysis: Routine pattern detected. Continue monitoring."
+    risk_score = 10
+    force_anomaly = force_status = False
+
+    if ai_intent == 'security' or mask & SECURITY_BIT:
+        suggestion = "SECURITY PROTOCOL: Origin IP marked as SUSPICIOUS. Correlation suggests multi-vector probe. Check for credential stuffing."
+        risk_score = 85
+        force_anomaly = force_status = True
+    elif ai_intent == 'status' or mask & STABILITY_BIT:
+        suggestion = "STABILITY ACTION: Heartbeat failure detected. Attempting automated node reboot. Traffic re-routed to failsafe cluster."
+        risk_score = 65
+    elif mask & RESOURCE_BIT:
+        suggestion = "RESOURCE OPTIMIZATION: Memory threshold breached. Analyzing for leak patterns. Initiating cache cleanup protocol."
+        risk_score = 50
+    elif device_of(mask) == 'Database':
+        suggestion = "STORAGE GUARD: Transaction bottleneck detected. Review SQL execution plan. Indexing recommendation pending."
+        risk_score = 40
+    elif mask & BREACH_BIT:
+        suggestion = "SYSTEM BREACH ALERT: High-privilege access attempt. Audit UID/GID mapping. Rotate SSH keys."
+        risk_score = 95
+        force_anomaly = True
+
+    sev = severity_of(mask)
+    if sev == "CRITICAL" or sev == "FATAL":
+        risk_score = max(risk_score, 90)
+    elif sev == "ERROR":
+        risk_score = max(risk_score, 60)
+    return suggestion, risk_score, force_anomaly, force_status
+
+def trend_step(total_bytes):
+    """
+    Bytes per trend bucket: the power of two that gives at most
+    TREND_POINTS buckets. Powers of two nest, so the trend of a file can be
+    re-bucketed exactly when the file grows (rebucket()).
+    """
+    per_point = max(1, (total_bytes or TREND_POINTS << 20) // TREND_POINTS)
+    return 1 << (per_point - 1).bit_length()
+
+def context_device(filename):
+    """
+    Device every line of a file is attributed to when its name mentions
+    one (e.g. "firewall.log"), else None.
+    """
+    for k in PATTERNS.keys():
+        if k.lower() in (filename or "").lower():
+            return k + " Source"
+    return None
+
+def rebucket(part, step):
+    """
+    Re-samples the trend of a LogScorer.part() for a (larger) power-of-two
+    bucket size, keeping the first point of every new bucket.
+
+    Returns:
+        dict: A copy of `part` with severity_over_time, trend_buckets,
+        first_bucket and last_bucket for `step`.
+    """
+    scale = step // part["trend_step"]
+    points, buckets = [], []
+    for point, bucket in zip(part["trends"]["severity_over_time"], part["trend_buckets"]):
+        bucket //= scale
+        if not buckets or bucket > buckets[-1]:
+            points.append(point)
+            buckets.append(bucket)
+    edge = lambda b: b // scale if b >= 0 else b
+    trends = dict(part["trends"], severity_over_time=points)
+    return dict(part, trends=trends, trend_buckets=buckets, trend_step=step,
+                first_bucket=edge(part["first_bucket"]), last_bucket=edge(part["last_bucket"]))
+
+def result_of(part, timestamp):
+    """
+    The API result of a LogScorer.part(); issues are stamped `timestamp`.
+    """
+    return {
+        "summary": part["summary"],
+        "trends": part["trends"],
+        "issues": [record.to_dict(timestamp) for record in part["issues"]],
+        "issue_count": part["issue_count"],
+        "lines": part["lines"],
+        "load_shedding": part["load_shedding"]
+    }
+
+class IssueRecord:
+    """
+    Compact form of one flagged line. Orders by riskScore, and among equal
+    risks the earlier line ranks higher (it compares greater).
+    """
+    __slots__ = ("line", "device", "severity", "message", "suggestion", "risk", "anomaly", "status",
+                 "correlation")
+
+    def __init__(self, line, device, severity, message, suggestion, risk, anomaly, status, correlation=None):
+        self.line = line
+        self.device = device
+        self.severity = severity
+        self.message = message
+        self.suggestion = suggestion
+        self.risk = risk
+        self.anomaly = anomaly
+        self.status = status
+        self.correlation = correlation
+
+    def __lt__(self, other):
+        return self.risk < other.risk or (self.risk == other.risk and self.line > other.line)
+
+    def to_dict(self, timestamp):
+        """
+        The issue as returned by the API; `timestamp` is the analysis time.
+        """
+        issue = {
+            "device": self.device,
+            "severity": self.severity,
+            "message": self.message,
+            "suggestion": self.suggestion,
+            "riskScore": self.risk,
+            "isAnomaly": self.anomaly,
+            "status": self.status,
+            "timestamp": timestamp
+        }
+        if self.correlation:
+            issue["correlation"] = self.correlation
+        return issue
+
+class TopIssues:
+    """
+    Bounded min-heap of the `k` riskiest issues seen so far, so memory
+    stays flat however long the file is. `count` is every issue offered.
+    """
+    def __init__(self, k):
+        self.k = max(0, int(k))
+        self.count = 0
+        self._heap = []
+
+    def push(self, record):
+        self.count += 1
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, record)
+        elif self.k and self._heap[0] < record:
+            heapq.heapreplace(self._heap, record)
+
+    def extend(self, records):
+        for record in records:
+            self.push(record)
+
+    def ranked(self):
+        """
+        Kept issues, riskiest first (earlier lines first among equals).
+        """
+        return sorted(self._heap, reverse=True)
+
+class LogScorer:
+    """
+    Incremental scorer for one file (or one shard of it).
+
+    Holds the running summary and trend counters; `score_chunk` returns the
+    IssueRecords of a chunk in line order. With an `archive` writer every
+    non-blank line is also stored with its severity, device and score.
+    `shed_level` returns the overload level (overload.py) checked once per
+    chunk; sampled-away lines still count in the summary and trends.
+    """
+    def __init__(self, filename, total_bytes, intent_fn, archive=None, shed_level=None):
+        self.intent_fn = intent_fn
+        self.archive = archive
+        self.shed_level = shed_level
+        self.sampler = overload.Sampler()
+        self.intents_skipped = 0
+        self.max_level = overload.NORMAL
+        self.summary = {"INFO": 0, "WARN": 0, "ERROR": 0}
+        self.trends = {"severity_over_time": [], "node_frequency": {}}
+        self.lines = 0
+        # Stamped on every issue of this analysis
+        self.started = datetime.now().isoformat()
+        # Byte-offset buckets of the first/last non-blank line; one trend
+        # point is sampled per bucket
+        self.first_bucket = -1
+        self.last_bucket = -1
+        self.trend_buckets = []
+
+        # Contextual Device detection based on filename if possible
+        self.context_device = context_device(filename)
+
+        # Sample 10-20 trend points spread over the file by byte offset
+        self.trend_step = trend_step(total_bytes)
+
+        # Failures per IP and bursts per IP/template among flagged lines. A
+        # shard starts with empty windows, so patterns spanning two shards
+        # may be missed.
+        self.correlation = CorrelationEngine(window=CORRELATION_WINDOW_LINES, memory_mb=CORRELATION_MEMORY_MB,
+                                             ip_flood_threshold=CORRELATION_IP_FLOOD_LINES,
+                                             burst_threshold=CORRELATION_BURST_LINES, clock=None)
+
+    def _templates(self, texts):
+        """
+        Mined template of every line, or None when the template cache is off.
+        """
+        if not TEMPLATE_CACHE:
+            return None
+        miner = get_miner()
+        with metrics.timed("template_mine", len(texts)):
+            return [miner.match(t) for t in texts]
+
+    def _intents(self, texts, templates, skip=None):
+        """
+        Predicts intents, reusing the cached intent of each line's template.
+        Only lines whose template has no intent yet reach the model, once
+        per template. Lines flagged in `skip` never reach it; they get
+        their template's cached intent or None (rules only).
+        """
+        pending = {}
+        batch = []
+        for i, text in enumerate(texts):
+            tpl = templates[i] if templates is not None else None
+            if tpl is not None and tpl.intent is not None:
+                continue
+            if skip is not None and skip[i]:
+                self.intents_skipped += 1
+                continue
+            key = tpl.id if tpl is not None else i
+            if key not in pending:
+                pending[key] = len(batch)
+                batch.append(text)
+        predicted = self.intent_fn(batch) if batch else []
+
+        intents = []
+        for i in range(len(texts)):
+            tpl = templates[i] if templates is not None else None
+            if tpl is not None and tpl.intent is not None:
+                intents.append(tpl.intent)
+                continue
+            j = pending.get(tpl.id if tpl is not None else i)
+            if j is not None and tpl is not None:
+                tpl.intent = predicted[j]
+            intents.append(predicted[j] if j is not None else None)
+        return intents
+
+    def _sample(self, flagged, templates, verdicts, scores):
+        """
+        Overload level SAMPLE: keeps 1 in Sampler.every of the low-severity,
+        non-anomalous lines of each known template. A kept line stands for
+        the lines sampled away (its correlation weight); dropped lines are
+        still counted per device and archived with their rule-based risk
+        (set in `scores`).
+
+        Returns:
+            tuple: (kept indexes into `flagged`, their weights)
+        """
+        keep, weights = [], []
+        node_frequency = self.trends["node_frequency"]
+        for k, (i, line, l, sev, mask, row) in enumerate(flagged):
+            tpl = templates[k]
+            if (sev in overload.PROTECTED_SEVERITIES or verdicts[k][0] or mask & SHED_EXEMPT_BITS
+                    or (mask & LOGIN_BIT and mask & FAIL_BIT) or tpl is None
+                    or tpl.size < overload.OVERLOAD_KNOWN_TEMPLATE or tpl.intent == 'security'):
+                keep.append(k)
+                weights.append(1)
+            elif self.sampler.keep(tpl.id, sev):
+                keep.append(k)
+                weights.append(self.sampler.every)
+            else:
+                device = self.context_device or device_of(mask) or "Unknown Interface"
+                node_frequency[device] = node_frequency.get(device, 0) + 1
+                if row is not None:
+                    scores[row] = (suggest(None, mask)[1], False)
+        return keep, weights
+
+    def part(self, top):
+        """
+        Everything this scorer counted, with `top` (a TopIssues) as its
+        issues. analyze_file() merges parts; resume() continues from one.
+        Correlation windows are not included.
+        """
+        return {
+            "summary": self.summary,
+            "trends": self.trends,
+            "trend_buckets": self.trend_buckets,
+            "trend_step": self.trend_step,
+            "lines": self.lines,
+            "first_bucket": self.first_bucket,
+            "last_bucket": self.last_bucket,
+            "issues": top.ranked(),
+            "issue_count": top.count,
+            "load_shedding": self.shedding()
+        }
+
+    def resume(self, part, top):
+        """
+        Continues from the part() of a scan of the same file's first bytes;
+        its issues go into `top`. Score the rest with line indexes starting
+        at part["lines"].
+        """
+        part = rebucket(part, self.trend_step)
+        self.summary = dict(part["summary"])
+        self.trends = {"severity_over_time": list(part["trends"]["severity_over_time"]),
+                       "node_frequency": dict(part["trends"]["node_frequency"])}
+        self.trend_buckets = list(part["trend_buckets"])
+        self.lines = part["lines"]
+        self.first_bucket = part["first_bucket"]
+        self.last_bucket = part["last_bucket"]
+        top.extend(part["issues"])
+        top.count = part["issue_count"]
+
+    def shedding(self):
+        """
+        What overload control left out of this scorer's results, exactly.
+        """
+        return dict(self.sampler.to_dict(), level=overload.LEVELS[self.max_level],
+                    intents_skipped=self.intents_skipped)
+
+    def score_chunk(self, chunk):
+        # Pass 1: cheap severity scan; collect lines that need ML scoring
+        started = time.perf_counter()
+        # One matcher pass per line gives severity, device and rule hits
+        lowered = [line.lower() for _, _, line in chunk]
+        masks = [LOG_MATCHER.mask(l) for l in lowered]
+        matched = time.perf_counter()
+        metrics.observe("pattern_match", matched - started, len(chunk))
+
+        flagged = []
+        archived = [] if self.archive is not None else None
+        for (i, offset, line), l, mask in zip(chunk, lowered, masks):
+            self.lines += 1
+            if not line.strip(): continue
+
+            sev = severity_of(mask)
+            self.summary[sev] += 1
+
+            # Track trends
+            bucket = offset // self.trend_step
+            if self.first_bucket < 0:
+                self.first_bucket = bucket
+            if bucket > self.last_bucket:
+                self.trends["severity_over_time"].append({"idx": i, "sev": sev})
+                self.trend_buckets.append(bucket)
+            self.last_bucket = bucket
+
+            if archived is not None:
+                archived.append((line.strip(), sev, self.context_device or device_of(mask) or "Unknown Interface"))
+            if sev != "INFO":
+                flagged.append((i, line, l, sev, mask, len(archived) - 1 if archived is not None else None))
+
+        metrics.observe("severity_scan", time.perf_counter() - matched, len(chunk))
+        if not flagged:
+            self._archive(archived, {})
+            return []
+
+        # Pass 2: one vectorized anomaly + intent call for the whole chunk
+        level = self.shed_level() if self.shed_level is not None else overload.NORMAL
+        self.max_level = max(self.max_level, level)
+        texts = [f[2] for f in flagged]
+        templates = self._templates(texts)
+        with metrics.timed("anomaly_predict", len(texts)):
+            verdicts = detect_anomaly_batch(texts)
+
+        weights = None
+        scores = {}
+        if level >= overload.SAMPLE and templates is not None:
+            keep, weights = self._sample(flagged, templates, verdicts, scores)
+            flagged = [flagged[k] for k in keep]
+            texts = [texts[k] for k in keep]
+            templates = [templates[k] for k in keep]
+            verdicts = [verdicts[k] for k in keep]
+        skip = None
+        if level >= overload.SKIP_INTENT:
+            skip = [f[3] not in overload.PROTECTED_SEVERITIES for f in flagged]
+        intents = self._intents(texts, templates, skip)
+
+        issues = []
+        for k, ((i, line, l, sev, mask, row), ai_intent, (is_anomaly, status)) in enumerate(zip(flagged, intents, verdicts)):
+            # Device Detection (Augmented by Pattern Engine)
+            device = self.context_device or device_of(mask) or "Unknown Interface"
+
+            node_frequency = self.trends["node_frequency"]
+            node_frequency[device] = node_frequency.get(device, 0) + 1
+
+            # AI Suggestion Logic & Risk Scoring (memoized per intent/keyword hits)
+            suggestion, risk_score, flag_anomaly, flag_status = suggest(ai_intent, mask)
+            if flag_anomaly:
+                is_anomaly = True
+            if flag_status:
+                status = "ANOMALY"
+
+            # The mined template (when there is one) already masks the variable fields
+            tpl = templates[k] if templates is not None else None
+            ip = IP_REGEX.search(line)
+            detections = self.correlation.observe(
+                ip=ip.group(0) if ip else None, template=tpl.id if tpl is not None else template_key(l),
+                auth_failure=bool(mask & LOGIN_BIT and mask & FAIL_BIT), now=i,
+                weight=weights[k] if weights is not None else 1
+            )["detections"]
+            if detections:
+                risk_score = max([risk_score] + [CORRELATION_RISK[d] for d in detections])
+                if "brute_force" in detections:
+                    is_anomaly = True
+                    status = "ANOMALY"
+
+            issues.append(IssueRecord(i, device, sev, line.strip()[:200] + ("..." if len(line) > 200 else ""),
+                                      suggestion, risk_score, is_anomaly, status, detections or None))
+            if row is not None:
+                scores[row] = (risk_score, is_anomaly)
+        self._archive(archived, scores)
+        return issues
+
+    def _archive(self, archived, scores):
+        """
+        Appends the chunk's lines to the archive; `scores` maps a row to the
+        (riskScore, isAnomaly) of its issue.
+        """
+        if not archived:
+            return
+        risks = [0] * len(archived)
+        anomalies = [False] * len(archived)
+        for row, (risk, anomaly) in scores.items():
+            risks[row] = risk
+            anomalies[row] = anomaly
+        messages, levels, devices = zip(*archived)
+        self.archive.append_many(messages, levels, devices, risks, anomalies)
+
+# =========================================================================
+# Process pool
+# =========================================================================
+_worker_models = (None, None)
+_worker_intent_cache = IntentCache()
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+def _load_pickle(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+def _init_worker(bundle_path, model_path, vectorizer_path, online_checkpoint=None):
+    """
+    Runs once per worker process: loads the Lite Brain so shards only score.
+    Bundle arrays are memory-mapped, so all workers share one copy. With
+    online learning on, the last online checkpoint is used instead.
+    """
+    global _worker_models
+    try:
+        if online_checkpoint:
+            _worker_models = online_learning.load_predictor(online_checkpoint)
+        elif bundle_path:
+            bundle = model_bundle.ModelBundle(bundle_path)
+            _worker_models = (bundle.intent_model, bundle.vectorizer)
+        else:
+            _worker_models = (_load_pickle(model_path), _load_pickle(vectorizer_path))
+    except Exception as e:
+        print(f"[ENGINE] Worker {os.getpid()} running without intent model: {e}", file=sys.stderr)
+
+def _worker_intents(texts):
+    model, vectorizer = _worker_models
+    if not (model and vectorizer):
+        return predict_intents_with(None, None, texts)
+    try:
+        return _worker_intent_cache.predict(texts, lambda batch: timed_predict(model, vectorizer, batch))
+    except Exception as e:
+        print(f"Lite Inference Error: {e}")
+        return ["unknown"] * len(texts)
+
+class _RangeReader:
+    """
+    readline() view of [start, end) of a binary file.
+    """
+    def __init__(self, f, end):
+        self.f = f
+        self.end = end
+
+    def readline(self, limit=-1):
+        remaining = self.end - self.f.tell()
+        if remaining <= 0:
+            return b''
+        return self.f.readline(min(limit, remaining) if limit > 0 else remaining)
+
+def _score_shard(path, filename, start, end, total_bytes, issue_limit, archive_dir=None, shed_level=0):
+    """
+    Scores the byte range [start, end) of `path` (both on line boundaries).
+    With `archive_dir`, the shard's lines are archived by this worker.
+    `shed_level` is the service's overload level when the file was queued.
+    Returns the shard's `issue_limit` riskiest IssueRecords.
+    """
+    archive = log_archive.ArchiveWriter(archive_dir, source=filename or "upload") if archive_dir else None
+    scorer = LogScorer(filename, total_bytes, _worker_intents, archive,
+                       (lambda: shed_level) if shed_level else None)
+    top = TopIssues(issue_limit)
+    with open(path, 'rb') as f:
+        f.seek(start)
+        for chunk in iter_line_chunks(_RangeReader(f, end), base_offset=start):
+            top.extend(scorer.score_chunk(chunk))
+    if archive is not None:
+        archive.flush()
+    return scorer.part(top)
+
+def plan_shards(path, count, start=0):
+    """
+    Splits a file (from byte `start`, a line boundary) into `count` byte
+    ranges that start on line boundaries.
+    """
+    size = os.path.getsize(path)
+    bounds = [start]
+    with open(path, 'rb') as f:
+        for k in range(1, count):
+            target = max(bounds[-1], start + (size - start) * k // count)
+            if target == 0 or target >= size:
+                continue
+            f.seek(target - 1)
+            f.readline() # Advance to the start of the next line
+            pos = f.tell()
+            if bounds[-1] < pos < size:
+                bounds.append(pos)
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def get_pool(workers=None, model_path=MODEL_PATH, vectorizer_path=VECTORIZER_PATH):
+    """
+    Returns the shared process pool, creating it on first use.
+    """
+    global _pool, _pool_workers
+    workers = workers or ANALYSIS_WORKERS
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # Spawned workers do not inherit eventlet/socket state from the server
+            ctx = multiprocessing.get_context(os.getenv("ANALYSIS_MP_START", "spawn"))
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=ctx,
+                initializer=_init_worker,
+                initargs=(model_bundle.current_path(), model_path, vectorizer_path,
+                          online_learning.active_checkpoint())
+            )
+            _pool_workers = workers
+        return _pool
+
+def reset_pool():
+    """
+    Drops the pool so workers reload models on next use (after /ai/reload).
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _pool, _pool_workers = None, 0
+
+def analyze_file(path, filename=None, workers=None, issue_limit=500, archive_dir=None, shed_level=0,
+                 resume=None, start=0):
+    """
+    Scores a log file on the process pool.
+
+    Args:
+        path (str): Log file on local disk.
+        filename (str): Name used for device context (defaults to basename).
+        workers (int): Pool size (defaults to ANALYSIS_WORKERS).
+        issue_limit (int): Issues kept in the result: the riskiest over the
+            whole file, riskiest first.
+        archive_dir (str): Log archive the workers store every line in.
+        shed_level (int): Overload level (overload.py) the shards apply.
+        resume (dict): The "part" of an earlier scan of the file's first
+            `start` bytes; only the rest is scored.
+        start (int): Byte offset (a line boundary) to score from.
+
+    Returns:
+        dict: summary, trends, issues, issue_count, lines and load_shedding -
+        identical to a sequential scan of the same file - and "part", the
+        merged state to resume from (IssueRecords as issues).
+    """
+    filename = filename if filename is not None else os.path.basename(path)
+    workers = workers or ANALYSIS_WORKERS
+    total_bytes = os.path.getsize(path)
+    step = trend_step(total_bytes)
+    shards = plan_shards(path, max(1, workers * SHARDS_PER_WORKER), start) if start < total_bytes else []
+
+    pool = get_pool(workers)
+    futures = [
+        pool.submit(_score_shard, path, filename, start, end, total_bytes, issue_limit, archive_dir, shed_level)
+        for start, end in shards
+    ]
+
+    started = datetime.now().isoformat()
+    summary = {"INFO": 0, "WARN": 0, "ERROR": 0}
+    trends = {"severity_over_time": [], "node_frequency": {}}
+    buckets = []
+    top = TopIssues(issue_limit)
+    issue_count = 0
+    lines = 0
+    first_bucket = last_bucket = -1
+    shedding = overload.Sampler()
+    intents_skipped = 0
+    parts = [future.result for future in futures]
+    if resume is not None:
+        parts.insert(0, functools.partial(rebucket, resume, step))
+    # Merge strictly in shard order so the output matches a sequential scan
+    for result in parts:
+        part = result()
+        for sev, n in part["summary"].items():
+            summary[sev] += n
+        for device, n in part["trends"]["node_frequency"].items():
+            trends["node_frequency"][device] = trends["node_frequency"].get(device, 0) + n
+        points = part["trends"]["severity_over_time"]
+        # A shard always samples its first non-blank line; drop that point if
+        # the previous shard already sampled the same bucket
+        skip = 1 if points and part["first_bucket"] == last_bucket else 0
+        for point in points[skip:]:
+            trends["severity_over_time"].append({"idx": lines + point["idx"], "sev": point["sev"]})
+        buckets.extend(part["trend_buckets"][skip:])
+        # Shard line numbers become file line numbers for the tie-break
+        for record in part["issues"]:
+            record.line += lines
+        top.extend(part["issues"])
+        issue_count += part["issue_count"]
+        shedding.merge(part["load_shedding"])
+        intents_skipped += part["load_shedding"]["intents_skipped"]
+        lines += part["lines"]
+        if part["last_bucket"] >= 0:
+            if first_bucket < 0:
+                first_bucket = part["first_bucket"]
+            last_bucket = part["last_bucket"]
+
+    part = {
+        "summary": summary,
+        "trends": trends,
+        "trend_buckets": buckets,
+        "trend_step": step,
+        "lines": lines,
+        "first_bucket": first_bucket,
+        "last_bucket": last_bucket,
+        "issues": top.ranked(),
+        "issue_count": issue_count,
+        "load_shedding": dict(shedding.to_dict(), level=overload.LEVELS[shed_level], intents_skipped=intents_skipped)
+    }
+    return dict(result_of(part, started), part=part)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SentinelX parallel log analysis")
+    parser.add_argument("path", help="Log file to analyze")
+    parser.add_argument("-w", "--workers", type=int, default=ANALYSIS_WORKERS, help="Worker processes")
+    parser.add_argument("-n", "--issues", type=int, default=100, help="Issues to include in the output")
+    parser.add_argument("--archive", metavar="DIR", help="Also store every line in this log archive")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    result = analyze_file(args.path, workers=args.workers, issue_limit=args.issues, archive_dir=args.archive)
+    elapsed = time.perf_counter() - started
+    del result["part"]
+    result["engine"] = "SentinelX-Quantum-v14.5-Advanced"
+    result["elapsed_sec"] = round(elapsed, 3)
+    result["lines_per_sec"] = round(result["lines"] / elapsed, 1) if elapsed else None
+    print(json.dumps(result, indent=2))
+    reset_pool()
+
+if __name__ == "__main__":
+    main()
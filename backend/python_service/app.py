@@ -1,27 +1,38 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
+import json
+import io
+import uuid
+import shutil
+import tempfile
 import pickle
 import os
 import sys
-import sys
-import numpy as np
-import requests
-from sklearn.ensemble import IsolationForest
+import time
+from collections import namedtuple
+from datetime import datetime
 
 # --- DECOUPLED AI MODULES ---
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
-from ai.anomaly import detect_anomaly
-from realtime.socket import send_log_to_clients
-
-# --- Train ML Anomaly Model (Isolation Forest) ---
-# For real-time SOC logs, we train an initial in-memory Isolation Forest 
-# using simulated baseline features (Length, Numeric Count, Error Keyword Count).
-anomaly_model = IsolationForest(contamination=0.05, random_state=42)
-# Baseline "normal" traffic features
-dummy_normal_data = np.array([
-    [50, 2, 0], [45, 1, 0], [55, 3, 0], [48, 2, 0], [60, 4, 0], 
-    [40, 1, 0], [52, 2, 0], [47, 1, 0], [58, 3, 0], [65, 5, 0]
-])
-anomaly_model.fit(dummy_normal_data)
+from ai.anomaly import detect_anomaly_batch, reload_model as reload_anomaly_model, get_model_stats as get_anomaly_model_stats
+from ai.anomaly import registry as anomaly_registry
+from ai.matcher import LOG_MATCHER
+from ai.correlation import CorrelationEngine, template_key
+from ai import bundle as model_bundle
+from ai import templates as log_templates
+from realtime.socket import send_log_to_clients, send_log_update, send_training_event, get_broadcast_stats
+from realtime import native
+import analysis_engine
+from microbatch import MicroBatcher
+from intent_cache import IntentCache
+from explainer import ExplanationPipeline
+from training_jobs import TrainingJobManager, QueueFull
+import online_learning
+import log_archive
+import offload
+import overload
+import result_cache
+from analysis_engine import LogScorer, TopIssues, iter_line_chunks, predict_intents_with, stream_size, timed_predict
+import metrics
 
 # Import our custom Deep Learning modules
 try:
@@ -30,13 +41,44 @@ try:
 except ImportError:
     DEEP_LEARNING_AVAILABLE = False
     print("Dependencies not yet ready. Falling back to Lite NLP.")
-DEEP_LEARNING_AVAILABLE = False # Force Lite mode for instant startup
+# Lite mode by default for instant startup; PRIME_BRAIN=1 loads the
+# transformer (int8 + batched decoding on CPU, see prime_brain.py)
+DEEP_LEARNING_AVAILABLE = DEEP_LEARNING_AVAILABLE and os.getenv("PRIME_BRAIN", "0") == "1"
 
 app = Flask(__name__)
 
 # Initialize WebSocket Neural Hub
 from realtime.socket import setup_socket
-socketio = setup_socket(app)
+socketio = setup_socket(app, on_flush=lambda seconds, events: metrics.observe("socket_emit", seconds, events))
+
+# --- Event Loop Offload ---
+# Under eventlet one OS thread serves every request and socket heartbeat, so
+# scoring runs on native thread pools (offload.py) and handlers wait for it
+# cooperatively. Requests beyond workers + queue get 503 with Retry-After.
+# Uploads and single events get separate pools so a large upload never
+# queues /api/analyze-log behind it. Their queue waits drive the overload
+# controller (overload.py), which sheds low-value work in stages.
+overload_control = overload.OverloadController()
+upload_pool = offload.OffloadPool(
+    "upload", int(os.getenv("OFFLOAD_UPLOAD_WORKERS", 2)), int(os.getenv("OFFLOAD_UPLOAD_QUEUE", 4)),
+    socketio.async_mode, on_wait=overload_control.observe
+)
+event_pool = offload.OffloadPool(
+    "event", int(os.getenv("OFFLOAD_EVENT_WORKERS", 4)), int(os.getenv("OFFLOAD_EVENT_QUEUE", 64)),
+    socketio.async_mode, on_wait=overload_control.observe
+)
+loop_monitor = offload.LoopLagMonitor(socketio.start_background_task, socketio.sleep)
+
+@app.before_request
+def _start_loop_monitor():
+    loop_monitor.start()
+
+@app.errorhandler(offload.Saturated)
+def _offload_saturated(e):
+    response = jsonify({"error": str(e), "retry_after": e.retry_after})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response
 
 # --- Model Loading Strategy ---
 # 1. Advanced Brain (Transformer/Deep Learning)
@@ -51,44 +93,199 @@ if DEEP_LEARNING_AVAILABLE:
         print(f"CUDA/GPU Error: {e}")
 
 # Lite Brain Initialization
+# The model bundle (ai/bundle.py) is preferred; the pickles are the legacy
+# format read only when no bundle has been exported yet.
 MODEL_PATH = os.path.join(os.path.dirname(__file__), 'chatbot_model.pkl')
 VECTORIZER_PATH = os.path.join(os.path.dirname(__file__), 'tfidf_vectorizer.pkl')
-ANOMALY_MODEL_PATH = os.path.join(os.path.dirname(__file__), 'anomaly_model.pkl')
-
-model = None
-vectorizer = None
-
-# Professional Pattern Engine (Augmented by Datasets)
-PATTERNS = {
-    'Linux': ['sshd', 'kernel', 'boot', 'session opened', 'authentication failure'],
-    'Windows': ['sysmon', 'security-auditing', 'logon', 'service control manager', 'distributedcom'],
-    'Apache': ['http', 'get /', 'post /', '404', '500', 'client denied'],
-    'HDFS': ['datanode', 'namenode', 'block', 'replication', 'heartbeat'],
-    'Zookeeper': ['sessionid', 'follower', 'leader', 'quorum', 'election'],
-    'Database': ['sql', 'query', 'syntax error', 'deadlock', 'transaction'],
-    'Security': ['denied', 'blocked', 'attack', 'malicious', 'probe', 'brute force']
-}
-
-def load_ai_model():
-    global model, vectorizer, anomaly_model
-    if all(os.path.exists(p) for p in [MODEL_PATH, VECTORIZER_PATH, ANOMALY_MODEL_PATH]):
-        try:
+
+# The live (model, vectorizer) pair is published as one immutable record so
+# a reader never pairs a new vectorizer with an old classifier
+LiteBrain = namedtuple("LiteBrain", ["model", "vectorizer", "source", "cache_generation"])
+lite_brain = LiteBrain(None, None, None, 0)
+model_source = None
+lite_brain_load_ms = None
+# Models are loaded on first use, not at import
+_lite_brain_loaded = False
+_lite_brain_lock = native.threading.Lock()
+# Intent memo in front of the Lite Brain; emptied whenever it is reloaded
+intent_cache = IntentCache()
+
+# Threat rule bits for /api/analyze-log
+LOGIN_BIT = LOG_MATCHER.bit('threat:login')
+FAIL_BIT = LOG_MATCHER.bit('threat:fail')
+DEGRADATION_BIT = LOG_MATCHER.bit('threat:degradation')
+SQL_BIT = LOG_MATCHER.bit('threat:sql')
+
+MAX_RETURNED_ISSUES = 100   # Riskiest issues kept for the JSON response and realtime subscribers
+STREAM_FLUSH_ISSUES = 256   # Issues per NDJSON write (one offloaded step each)
+
+def load_ai_model(bundle_path=None):
+    """
+    Loads the Lite Brain (the given bundle version, else the current bundle,
+    else the legacy pickles) and publishes it in one assignment.
+
+    Args:
+        bundle_path (str): Bundle version directory to load. Its arrays are
+            mapped and exercised before the swap, so the first request after
+            a retrain does not pay for loading them.
+
+    Returns:
+        bool: True when a model was published.
+    """
+    global lite_brain, model_source, lite_brain_load_ms, _lite_brain_loaded
+    started = time.perf_counter()
+    try:
+        if bundle_path is not None:
+            bundle = model_bundle.ModelBundle(bundle_path)
+            bundle.intent_model.predict(bundle.vectorizer.transform(["service warmup"]))
+        else:
+            bundle = model_bundle.load_current()
+        if bundle is not None:
+            # Unless warmed above, only the manifest is read; arrays are mapped on first use
+            model, vectorizer = bundle.intent_model, bundle.vectorizer
+            source = "bundle:" + bundle.version
+        elif all(os.path.exists(p) for p in [MODEL_PATH, VECTORIZER_PATH]):
             with open(MODEL_PATH, 'rb') as f:
                 model = pickle.load(f)
             with open(VECTORIZER_PATH, 'rb') as f:
                 vectorizer = pickle.load(f)
-            with open(ANOMALY_MODEL_PATH, 'rb') as f:
-                anomaly_model = pickle.load(f)
-            print("PRIME_AI Quantum Models loaded successfully.", file=sys.stderr)
-        except Exception as e:
-            print(f"Error loading AI models: {e}", file=sys.stderr)
+            source = "pickle"
+        else:
+            return False
+        # Predictions still running on the old brain carry the old
+        # generation, so the cache will not store them
+        lite_brain = LiteBrain(model, vectorizer, source, intent_cache.clear())
+        model_source = source
+        lite_brain_load_ms = round((time.perf_counter() - started) * 1000, 3)
+        print(f"PRIME_AI Quantum Models loaded successfully ({model_source}).", file=sys.stderr)
+        return True
+    except Exception as e:
+        print(f"Error loading AI models: {e}", file=sys.stderr)
+        return False
+    finally:
+        _lite_brain_loaded = True
 
-load_ai_model()
+def get_lite_brain():
+    """
+    Returns the live LiteBrain record, loading it on first use.
+    """
+    if not _lite_brain_loaded:
+        with _lite_brain_lock:
+            if not _lite_brain_loaded:
+                load_ai_model()
+    return lite_brain
+
+def predict_intents(texts):
+    """
+    Classifies many texts with the currently loaded Lite Brain. Lines seen
+    before (up to ids, IPs and counters) are answered from the intent cache.
+    """
+    current = get_lite_brain()
+    if not (current.model and current.vectorizer):
+        return predict_intents_with(None, None, texts)
+    try:
+        return intent_cache.predict(
+            texts, lambda batch: timed_predict(current.model, current.vectorizer, batch),
+            current.cache_generation
+        )
+    except Exception as e:
+        print(f"Lite Inference Error: {e}")
+        return ["unknown"] * len(texts)
+
+def swap_models(bundle_path=None):
+    """
+    Moves every model consumer onto a new bundle: the Lite Brain, the
+    anomaly forest, the analysis pool and the template results.
+
+    Returns:
+        dict: The versions now live.
+    """
+    with _lite_brain_lock:
+        if not load_ai_model(bundle_path) and bundle_path is not None:
+            raise RuntimeError(f"model bundle {bundle_path} could not be loaded")
+    analysis_engine.reset_pool()
+    if log_templates.get_stats() is not None:
+        log_templates.get_miner().clear_results()
+    anomaly_stats = reload_anomaly_model()
+    if online_learner is not None and online_learner.ready:
+        # Online mode keeps serving the incrementally learned intents; a
+        # full retrain only refreshes the rest
+        online_learner.publish()
+    return {"lite_brain": model_source, "anomaly_model": anomaly_stats.get("source")}
+
+def _publish_online_model(model, vectorizer, info):
+    global lite_brain, model_source, _lite_brain_loaded
+    with _lite_brain_lock:
+        lite_brain = LiteBrain(model, vectorizer, f"online:{info['updates']}", intent_cache.clear())
+        model_source = lite_brain.source
+        _lite_brain_loaded = True
+
+# Incremental intent learning (ONLINE_LEARNING=1): a hashing-space NB fed
+# with ingested and analyst-labeled lines replaces the bundle's intents
+online_learner = None
+ONLINE_LEARN_INGEST = os.getenv("ONLINE_LEARN_INGEST", "1") == "1"
+if online_learning.ONLINE_LEARNING:
+    # Upload workers reload from each checkpoint
+    online_learner = online_learning.OnlineIntentLearner(
+        on_publish=_publish_online_model, on_checkpoint=lambda path: analysis_engine.reset_pool()
+    )
+    online_learner.start()
+
+# Columnar archive of every analyzed line (ARCHIVE_ENABLED=0 turns it off).
+# Upload and live writers seal chunks on a background thread and register
+# them with the catalog as they land.
+# Upload results are cached by content hash, resumable for appended files
+# (RESULT_CACHE_ENABLED=0 turns it off).
+log_store = None
+live_archive = None
+upload_cache = None
+
+def open_stores(archive_dir=log_archive.ARCHIVE_DIR, cache_dir=result_cache.RESULT_CACHE_DIR):
+    """
+    (Re)opens the archive catalog, the live archive writer and the result
+    cache on the given directories, flushing the previous live writer
+    first. Tests point them at scratch directories.
+    """
+    global log_store, live_archive, upload_cache
+    if live_archive is not None:
+        live_archive.flush()
+    log_store = live_archive = None
+    if log_archive.ARCHIVE_ENABLED:
+        log_store = log_archive.LogArchive(archive_dir)
+        live_archive = log_archive.ArchiveWriter(archive_dir, source="live", background=True,
+                                                 on_seal=log_store.add_chunk)
+        log_archive.start_background_flush()
+    upload_cache = result_cache.ResultCache(cache_dir) if result_cache.RESULT_CACHE_ENABLED else None
+
+open_stores()
+
+def analysis_version():
+    """
+    Versions of the models an upload result depends on; a change empties
+    the result cache.
+    """
+    anomaly_registry.get()
+    intents = get_lite_brain().source
+    # The online learner republishes after every update ("online:<n>");
+    # cached results keep the intents they were scored with instead of
+    # the cache being emptied each time
+    if intents and intents.startswith("online:"):
+        intents = "online"
+    return f"{intents}|{get_anomaly_model_stats()['digest']}"
+
+def _upload_archive(filename):
+    if log_store is None:
+        return None
+    return log_archive.ArchiveWriter(log_store.root, source=filename or "upload", background=True,
+                                     on_seal=log_store.add_chunk)
 
 @app.route('/ai/reload', methods=['POST'])
 def reload_ai():
-    load_ai_model()
-    return jsonify({"status": "AI kernels reloaded and synchronized with latest training data."})
+    swap_models()
+    return jsonify({
+        "status": "AI kernels reloaded and synchronized with latest training data.",
+        "anomaly_model": get_anomaly_model_stats()
+    })
 
 @app.route('/chat', methods=['POST'])
 def chat():
@@ -101,20 +298,24 @@ def chat():
     # CASE A: Advanced Generative Brain (ChatGPT Style)
     if brain:
         try:
-            response_text = brain.generate_response(user_message)
+            # Decoding happens on the brain's batcher thread; only wait here
+            with event_pool.admit():
+                response_text = event_pool.wait_on(brain.generate_response, user_message)
             return jsonify({
                 'response': response_text,
                 'intent': 'generative',
                 'engine': 'PRIME_AI-Transformer-Local'
             })
+        except offload.Saturated:
+            raise
         except Exception as e:
             print(f"Brain Inference Error: {e}")
 
     # CASE B: Lite Brain Fallback (Quantum Synthesis Mode)
-    if model and vectorizer:
+    current = get_lite_brain()
+    if current.model and current.vectorizer:
         try:
-            features = vectorizer.transform([user_message])
-            intent = model.predict(features)[0]
+            intent = predict_intents([user_message])[0]
             
             response_map = {
                 'greeting': "NEXUS ONLINE. Greetings, Administrator. Neural link established. I am monitoring global node stability.",
@@ -146,9 +347,133 @@ def health():
     return jsonify({
         'status': 'online', 
         'advanced_brain': brain is not None,
-        'gpu_accelerated': 'torch' in sys.modules and hasattr(sys.modules['torch'], 'cuda') and sys.modules['torch'].cuda.is_available()
+        'prime_brain': brain.get_stats() if brain else None,
+        'lite_brain': model_source,
+        'gpu_accelerated': 'torch' in sys.modules and hasattr(sys.modules['torch'], 'cuda') and sys.modules['torch'].cuda.is_available(),
+        'anomaly_model': get_anomaly_model_stats(),
+        'templates': log_templates.get_stats(),
+        'intent_cache': intent_cache.get_stats(),
+        'analyze_batching': event_batcher.get_stats() if event_batcher else None,
+        'llm_explainer': explainer.get_stats(),
+        'online_learning': online_learner.get_stats() if online_learner else None,
+        'archive': log_store.get_stats() if log_store else None,
+        'result_cache': upload_cache.get_stats() if upload_cache else None,
+        'training_jobs': training_jobs.get_stats(),
+        'offload': {'upload': upload_pool.get_stats(), 'event': event_pool.get_stats()},
+        'event_loop': loop_monitor.get_stats(),
+        'overload': overload_control.get_stats(),
+        'broadcast': get_broadcast_stats(),
+        'correlation': correlation_engine.get_stats()
     })
 
+@metrics.register_collector
+def _service_metrics():
+    """
+    Scrape-time gauges and counters from the service's components.
+    """
+    anomaly = get_anomaly_model_stats()
+    cache = intent_cache.get_stats()
+    llm = explainer.get_stats()
+    jobs = training_jobs.get_stats()
+    broadcast = get_broadcast_stats() or {}
+    correlation = correlation_engine.get_stats()
+    templates = log_templates.get_stats() or {}
+    batcher = event_batcher.get_stats() if event_batcher else {}
+    prime = brain.get_stats() if brain else {}
+    archive = log_store.get_stats() if log_store else {}
+    results = upload_cache.get_stats() if upload_cache else {}
+    pools = {"upload": upload_pool.get_stats(), "event": event_pool.get_stats()}
+    lag = loop_monitor.get_stats()
+    shed = overload_control.get_stats()
+    return [
+        ("sentinelx_model_load_seconds", "gauge", "Duration of the last model load.", [
+            ({"model": "lite_brain"}, round(lite_brain_load_ms / 1000, 6) if lite_brain_load_ms is not None else None),
+            ({"model": "anomaly"}, round(anomaly["last_load_ms"] / 1000, 6) if anomaly["loads"] else None),
+        ]),
+        ("sentinelx_model_loads_total", "counter", "Anomaly model loads since start.", [({}, anomaly["loads"])]),
+        ("sentinelx_cache_hits_total", "counter", "Cache hits.", [
+            ({"cache": "intent"}, cache["hits"]), ({"cache": "llm"}, llm["cache_hits"]),
+            ({"cache": "template"}, templates.get("matched")),
+            ({"cache": "prime_brain"}, prime.get("cache_hits")),
+            ({"cache": "result"}, results.get("hits")),
+        ]),
+        ("sentinelx_cache_misses_total", "counter", "Cache misses.", [
+            ({"cache": "intent"}, cache["misses"]), ({"cache": "llm"}, llm["cache_misses"]),
+            ({"cache": "result"}, results.get("misses")),
+        ]),
+        ("sentinelx_cache_hit_ratio", "gauge", "Hits over lookups since start.", [
+            ({"cache": "intent"}, cache["hit_rate"]), ({"cache": "result"}, results.get("hit_ratio")),
+        ]),
+        ("sentinelx_cache_entries", "gauge", "Entries held.", [
+            ({"cache": "intent"}, cache["size"]), ({"cache": "llm"}, llm["cache_size"]),
+            ({"cache": "template"}, templates.get("templates")),
+            ({"cache": "result"}, results.get("entries")),
+        ]),
+        ("sentinelx_result_cache_resumes_total", "counter", "Uploads scored from a stored prefix.", [
+            ({}, results.get("resumes")),
+        ]),
+        ("sentinelx_result_cache_bytes_total", "counter", "Upload bytes seen by the result cache.", [
+            ({"kind": "uploaded"}, results.get("bytes_uploaded")),
+            ({"kind": "skipped"}, results.get("bytes_skipped")),
+        ]),
+        ("sentinelx_queue_depth", "gauge", "Items waiting in a background queue.", [
+            ({"queue": "llm"}, llm["queue_depth"]), ({"queue": "broadcast"}, broadcast.get("queue_depth")),
+            ({"queue": "training"}, jobs["queue_depth"]),
+            ({"queue": "offload_upload"}, pools["upload"]["queued"]),
+            ({"queue": "offload_event"}, pools["event"]["queued"]),
+        ]),
+        ("sentinelx_dropped_total", "counter", "Items dropped by a bounded component.", [
+            ({"component": "llm", "reason": "queue_full"}, llm["dropped_queue_full"]),
+            ({"component": "llm", "reason": "circuit_open"}, llm["skipped_circuit_open"]),
+            ({"component": "broadcast", "reason": "queue_full"}, broadcast.get("dropped_queue_full")),
+            ({"component": "broadcast", "reason": "backpressure"}, broadcast.get("dropped_backpressure")),
+            ({"component": "training", "reason": "queue_full"}, jobs["rejected_queue_full"]),
+            ({"component": "offload_upload", "reason": "saturated"}, pools["upload"]["rejected"]),
+            ({"component": "offload_event", "reason": "saturated"}, pools["event"]["rejected"]),
+        ]),
+        ("sentinelx_offload_running", "gauge", "Calls running on an offload pool.", [
+            ({"pool": name}, stats["running"]) for name, stats in pools.items()
+        ]),
+        ("sentinelx_overload_level", "gauge", "Load shedding stage (0 normal ... 3 skip_intent).", [
+            ({}, overload.LEVELS.index(shed["level"])),
+        ]),
+        ("sentinelx_queue_delay_seconds", "gauge", "Standing queue delay seen by the overload controller.", [
+            ({}, shed["standing_delay_ms"] / 1000),
+        ]),
+        ("sentinelx_shed_total", "counter", "Work skipped by load shedding.", [
+            ({"work": "llm"}, shed["llm_skipped"]), ({"work": "intent"}, shed["intents_skipped"]),
+        ] + [
+            ({"work": "sampled", "path": path, "severity": sev}, n)
+            for path in ("live", "uploads") for sev, n in sorted(shed[path]["sampled_out"].items())
+        ]),
+        ("sentinelx_event_loop_lag_seconds", "gauge", "Event-loop wake-up delay over the recent window.", [
+            ({"quantile": "0.5"}, lag["p50_ms"] / 1000 if lag["p50_ms"] is not None else None),
+            ({"quantile": "0.99"}, lag["p99_ms"] / 1000 if lag["p99_ms"] is not None else None),
+            ({"quantile": "1"}, lag["recent_max_ms"] / 1000 if lag["recent_max_ms"] is not None else None),
+        ]),
+        ("sentinelx_llm_circuit_open", "gauge", "1 while the LLM circuit breaker is open.", [({}, llm["circuit"] == "open")]),
+        ("sentinelx_broadcast_clients", "gauge", "Connected realtime clients.", [({}, broadcast.get("clients"))]),
+        ("sentinelx_analyze_batches_total", "counter", "Coalesced /api/analyze-log batches.", [({}, batcher.get("batches"))]),
+        ("sentinelx_correlation_detections_total", "counter", "Correlated detections.", [
+            ({"detection": d}, correlation[d]) for d in ("brute_force", "ip_flood", "burst")
+        ]),
+        ("sentinelx_training_jobs_total", "counter", "Finished training jobs.", [
+            ({"status": "succeeded"}, jobs["succeeded"]), ({"status": "failed"}, jobs["failed"]),
+        ]),
+        ("sentinelx_archive_rows", "gauge", "Rows held by the log archive.", [({}, archive.get("rows"))]),
+        ("sentinelx_archive_bytes", "gauge", "On-disk size of the log archive.", [({}, archive.get("bytes"))]),
+        ("sentinelx_archive_queries_total", "counter", "Log archive queries.", [({}, archive.get("queries"))]),
+        ("sentinelx_prime_brain_tokens_total", "counter", "Tokens generated by PRIME_AI.", [({}, prime.get("tokens_generated"))]),
+        ("sentinelx_prime_brain_tokens_per_second", "gauge", "PRIME_AI decode throughput since start.", [({}, prime.get("tokens_per_sec"))]),
+        ("sentinelx_prime_brain_ttft_seconds", "gauge", "Mean PRIME_AI time to first token.", [
+            ({}, round(prime["ttft_ms_avg"] / 1000, 6) if prime else None),
+        ]),
+    ]
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/automation/audit', methods=['POST'])
 def run_automation_audit():
     # In a real enterprise scenario, this would perform deeper network/resource profiling
@@ -171,120 +496,195 @@ def run_automation_audit():
         'results': audit_results
     })
 
+def _broadcast_issue(issue):
+    send_log_to_clients({
+        "source": issue["device"],
+        "severity": issue["severity"],
+        "message": issue["message"][:100],
+        "is_anomaly": issue["isAnomaly"],
+        "status": issue["status"]
+    })
+
+def _broadcast_ranked(records, issues, first_line=0):
+    """
+    Pushes an upload's riskiest issues (`issues`, the API form of the
+    IssueRecords `records`) to realtime subscribers once it is scored. A
+    resumed scan only sends issues from line `first_line` on; the earlier
+    ones went out with the first scan.
+    """
+    for record, issue in zip(records, issues):
+        if record.line >= first_line:
+            _broadcast_issue(issue)
+
+def analyze_log_stream(stream, filename="", total_bytes=None, top=None, resume=None, start=0):
+    """
+    Scores an uploaded log chunk by chunk with bounded memory. Every line
+    is archived; the last chunk is sealed in the background. The
+    MAX_RETURNED_ISSUES riskiest issues are broadcast at the end.
+
+    Args:
+        top (TopIssues): Rank the issues into it instead of yielding them;
+            the result then carries its `issues`, riskiest first, and its
+            resumable `part`.
+        resume (dict): The part of an earlier scan of the first `start`
+            bytes (needs `top` and the full `total_bytes`); scoring starts
+            at byte `start`.
+
+    Yields:
+        ("issue", dict) for every non-INFO line, in file order (unless
+        `top` is given), then a final ("result", {"summary": ..., ...}).
+    """
+    if total_bytes is None:
+        total_bytes = stream_size(stream)
+    archive = _upload_archive(filename)
+    scorer = LogScorer(filename, total_bytes, predict_intents, archive, overload_control.level)
+    # Streamed issues go out as they come; subscribers get the riskiest
+    ranked = top if top is not None else TopIssues(MAX_RETURNED_ISSUES)
+    issue_count = 0
+    if resume is not None:
+        scorer.resume(resume, top)
+        stream.seek(start)
+    first_line = scorer.lines
+
+    for chunk in iter_line_chunks(stream, base_offset=start, base_line=scorer.lines):
+        for record in scorer.score_chunk(chunk):
+            issue_count += 1
+            ranked.push(record)
+            if top is None:
+                yield "issue", record.to_dict(scorer.started)
+
+    # Broadcast processed entries to real-time subscribers
+    records = ranked.ranked()
+    _broadcast_ranked(records, [record.to_dict(scorer.started) for record in records], first_line)
+    if archive is not None:
+        archive.flush(wait=False)
+    shedding = scorer.shedding()
+    overload_control.record(shedding=shedding)
+    if top is None:
+        yield "result", {"summary": scorer.summary, "trends": scorer.trends, "issue_count": issue_count,
+                         "load_shedding": shedding}
+    else:
+        part = scorer.part(top)
+        yield "result", dict(analysis_engine.result_of(part, scorer.started), part=part)
+
+def analyze_log_upload(stream, filename="", total_bytes=None, resume=None, start=0):
+    """
+    Scores a whole upload in one call and keeps the MAX_RETURNED_ISSUES
+    riskiest issues of the whole file. Meant to run on the upload pool.
+    """
+    top = TopIssues(MAX_RETURNED_ISSUES)
+    for kind, payload in analyze_log_stream(stream, filename, total_bytes, top, resume, start):
+        result = payload
+    return result
+
+def _ndjson_blocks(stream, filename, engine):
+    # NDJSON text in blocks of STREAM_FLUSH_ISSUES issues; each block is
+    # one step on the upload pool
+    lines = []
+    for kind, payload in analyze_log_stream(stream, filename):
+        if kind == "issue":
+            lines.append(json.dumps(dict(payload, type="issue")) + "\n")
+            if len(lines) >= STREAM_FLUSH_ISSUES:
+                yield "".join(lines)
+                lines = []
+        else:
+            lines.append(json.dumps(dict(payload, type="summary", engine=engine)) + "\n")
+    yield "".join(lines)
+
+def analyze_log_file_parallel(log_file, filename, resume=None, start=0):
+    """
+    Spools the upload to disk and scores it on the analysis process pool
+    (from byte `start` on, continuing `resume`).
+    """
+    fd, path = tempfile.mkstemp(prefix="sentinelx_upload_", suffix=".log")
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            shutil.copyfileobj(log_file.stream, out, 1 << 20)
+        result = analysis_engine.analyze_file(path, filename=filename, issue_limit=MAX_RETURNED_ISSUES,
+                                              archive_dir=log_store.root if log_store else None,
+                                              shed_level=overload_control.level(), resume=resume, start=start)
+    finally:
+        os.remove(path)
+    if log_store is not None:
+        # The workers' chunks are on disk already
+        log_store.refresh()
+    overload_control.record(shedding=result["load_shedding"])
+
+    _broadcast_ranked(result["part"]["issues"], result["issues"], resume["lines"] if resume is not None else 0)
+    return result
+
+def analyze_upload(log_file, filename):
+    """
+    Scores a whole upload: answered from the result cache when the same
+    bytes were analyzed before, scored from the stored offset when they
+    start an earlier upload (an appended file), else in full. Large files
+    go to the multi-core engine when a pool is configured.
+    """
+    stream = log_file.stream
+    size = stream_size(stream)
+    parallel = analysis_engine.ANALYSIS_WORKERS > 1 and size and size >= analysis_engine.PARALLEL_MIN_BYTES
+    lookup = None
+    if upload_cache is not None and size:
+        # Both engines keep the same riskiest issues, so they share entries
+        settings = f"{analysis_engine.context_device(filename)}|{MAX_RETURNED_ISSUES}"
+        lookup = upload_cache.lookup(stream, size, analysis_version(), settings)
+
+    resume, start = (lookup.part, lookup.offset) if lookup is not None else (None, 0)
+    if lookup is not None and lookup.hit:
+        # Already archived and broadcast when it was first analyzed
+        result = analysis_engine.result_of(resume, datetime.now().isoformat())
+    elif parallel:
+        result = analyze_log_file_parallel(log_file, filename, resume, start)
+    else:
+        result = analyze_log_upload(stream, filename, size, resume, start)
+
+    if lookup is not None and not lookup.hit and result["load_shedding"]["level"] == overload.LEVELS[overload.NORMAL]:
+        # Shed results are incomplete; only full-quality scans are stored
+        upload_cache.store(lookup, result["part"])
+    status = "off" if lookup is None else "hit" if lookup.hit else "resumed" if resume is not None else "miss"
+    result["cache"] = {"status": status, "bytes_skipped": start}
+    return result
+
 @app.route('/analysis/upload', methods=['POST'])
 def analyze_logs():
     if 'log' not in request.files:
         return jsonify({'error': 'No file uploaded'}), 400
     
     log_file = request.files['log']
-    filename = log_file.filename
-    content = log_file.read().decode('utf-8', errors='ignore')
-    lines = content.split('\n')
-    
-    issues = []
-    summary = {"INFO": 0, "WARN": 0, "ERROR": 0}
-    trends = {"severity_over_time": [], "node_frequency": {}}
-    
-    # Contextual Device detection based on filename if possible
-    context_device = None
-    for k in PATTERNS.keys():
-        if k.lower() in filename.lower():
-            context_device = k + " Source"
-            break
-
-    for i, line in enumerate(lines):
-        if not line.strip(): continue
-        
-        l = line.lower()
-        # Severity
-        sev = "INFO"
-        if any(w in l for w in ["error", "critical", "fail", "panic", "fatal"]): sev = "ERROR"
-        elif any(w in l for w in ["warn", "caution", "alert"]): sev = "WARN"
-        summary[sev] += 1
-        
-        # Track trends
-        if i % max(1, len(lines)//20) == 0:
-            trends["severity_over_time"].append({"idx": i, "sev": sev})
-        
-        if sev != "INFO":
-            # Device Detection (Augmented by Pattern Engine)
-            device = context_device or "Unknown Interface"
-            matched_key = None
-            for key, keywords in PATTERNS.items():
-                if any(w in l for w in keywords):
-                    device = key if not context_device else context_device
-                    matched_key = key
-                    break
-            
-            trends["node_frequency"][device] = trends["node_frequency"].get(device, 0) + 1
+    filename = log_file.filename or ""
+    engine = "SentinelX-Quantum-v14.5-Advanced"
 
-            # AI Suggestion Logic (Augmented by ML Predicted Intent)
-            suggestion = "AI Analysis: Routine pattern detected. Continue monitoring."
-            
-            # Use Lite AI Model to classify intent if available
-            ai_intent = "unknown"
-            if model and vectorizer:
+    # Scoring runs on the upload pool; a full pool answers 503 right here
+    ticket = upload_pool.admit()
+
+    # Optional NDJSON mode: issues are flushed to the client as they are found
+    if request.args.get('stream') or 'application/x-ndjson' in request.headers.get('Accept', ''):
+        # Take ownership of the upload: Flask closes request files as soon
+        # as the view returns, before the response body is generated.
+        stream, log_file.stream = log_file.stream, io.BytesIO()
+
+        def generate():
+            with ticket:
                 try:
-                    feat = vectorizer.transform([l])
-                    ai_intent = model.predict(feat)[0]
-                except: pass
-
-            # Deep Suggestion Engine & Risk Scoring
-            risk_score = 10
-            # Use ML features for Advanced Anomaly Detection
-            is_anomaly, status = detect_anomaly(l)
-
-            if ai_intent == 'security' or "login" in l or "auth" in l or "denied" in l:
-                suggestion = "SECURITY PROTOCOL: Origin IP marked as SUSPICIOUS. Correlation suggests multi-vector probe. Check for credential stuffing."
-                risk_score = 85
-                is_anomaly = True
-                status = "ANOMALY"
-            elif ai_intent == 'status' or "timeout" in l or "down" in l:
-                suggestion = "STABILITY ACTION: Heartbeat failure detected. Attempting automated node reboot. Traffic re-routed to failsafe cluster."
-                risk_score = 65
-            elif "memory" in l or "oom" in l or "heap" in l:
-                suggestion = "RESOURCE OPTIMIZATION: Memory threshold breached. Analyzing for leak patterns. Initiating cache cleanup protocol."
-                risk_score = 50
-            elif matched_key == 'Database':
-                suggestion = "STORAGE GUARD: Transaction bottleneck detected. Review SQL execution plan. Indexing recommendation pending."
-                risk_score = 40
-            elif "sshd" in l or "root" in l:
-                suggestion = "SYSTEM BREACH ALERT: High-privilege access attempt. Audit UID/GID mapping. Rotate SSH keys."
-                risk_score = 95
-                is_anomaly = True
-            
-            if sev == "CRITICAL" or sev == "FATAL":
-                risk_score = max(risk_score, 90)
-            elif sev == "ERROR":
-                risk_score = max(risk_score, 60)
-
-            issues.append({
-                "device": device,
-                "severity": sev,
-                "message": line.strip()[:200] + ("..." if len(line) > 200 else ""),
-                "suggestion": suggestion,
-                "riskScore": risk_score,
-                "isAnomaly": is_anomaly,
-                "status": status,
-                "timestamp": datetime.now().isoformat()
-            })
-            
-            # Broadcast each processed entry to real-time subscribers
-            send_log_to_clients({
-                "source": device,
-                "severity": sev,
-                "message": line.strip()[:100],
-                "is_anomaly": is_anomaly,
-                "status": status
-            })
-            
-            if len(issues) > 500: break # Safety cap
+                    yield from upload_pool.iterate(_ndjson_blocks(stream, filename, engine))
+                finally:
+                    stream.close()
+        response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        # The generator never runs if the client goes away first
+        response.call_on_close(ticket.release)
+        return response
+
+    with ticket:
+        result = upload_pool.run(analyze_upload, log_file, filename)
 
     return jsonify({
-        "summary": summary,
-        "issues": issues[:100], # Send top 100 to frontend for performance
-        "trends": trends,
-        "engine": "SentinelX-Quantum-v14.5-Advanced"
+        "summary": result["summary"],
+        "issues": result["issues"][:MAX_RETURNED_ISSUES],
+        "issue_count": result["issue_count"],
+        "trends": result["trends"],
+        "load_shedding": result["load_shedding"],
+        "cache": result["cache"],
+        "engine": engine
     })
 
 @app.route('/security/pulse', methods=['GET'])
@@ -305,34 +705,109 @@ def security_pulse():
         "active_vectors": random.sample(threat_vectors, 2)
     })
 
+def _training_succeeded(result):
+    # Runs on the job worker once train_model.py has exported the bundle
+    return swap_models(result.get("bundle"))
+
+# Background retraining: one run at a time, progress over 'training_progress'
+training_jobs = TrainingJobManager(on_success=_training_succeeded, on_event=send_training_event)
+
 @app.route('/ai/train', methods=['POST'])
 def ai_train():
+    """
+    Queues a retraining run and returns its job id at once (202). Poll
+    /ai/train/jobs/<id> or listen on the 'training_progress' channel.
+    """
+    params = request.get_json(silent=True) or {}
     try:
-        import subprocess
-        print("[AI_LAB] Initiating full neural reconstruction...")
-        script_path = os.path.join(os.path.dirname(__file__), 'train_model.py')
-        result = subprocess.run(['python', script_path], capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            # Re-load the brain if possible
-            load_ai_model()
-            return jsonify({
-                "status": "success",
-                "accuracy": 98.4, # Heuristic return as real accuracy requires test split
-                "loss": 0.012,
-                "epoch": 256,
-                "detail": "Neural Nexus Synchronized"
-            })
+        job = training_jobs.submit({"workers": params.get("workers")})
+    except QueueFull as e:
+        return jsonify({"status": "error", "message": str(e)}), 429
+    print(f"[AI_LAB] Neural reconstruction queued as job {job['id']}.")
+    return jsonify({
+        "status": "queued",
+        "job_id": job["id"],
+        "job": job,
+        "detail": "Neural reconstruction queued"
+    }), 202
+
+@app.route('/ai/train/jobs', methods=['GET'])
+def ai_train_jobs():
+    return jsonify({"jobs": training_jobs.list_jobs(), "stats": training_jobs.get_stats()})
+
+@app.route('/ai/train/jobs/<job_id>', methods=['GET'])
+def ai_train_job(job_id):
+    job = training_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown training job"}), 404
+    return jsonify(job)
+
+@app.route('/ai/learn', methods=['GET', 'POST'])
+def ai_learn():
+    """
+    Feeds the online intent learner. Body: {"lines": [...]} to label by
+    rule, or {"samples": [{"text": ..., "intent": ...}]} for analyst labels.
+    """
+    if online_learner is None:
+        return jsonify({"error": "Online learning is disabled (set ONLINE_LEARNING=1)"}), 409
+    if request.method == 'GET':
+        return jsonify(online_learner.get_stats())
+    params = request.get_json(silent=True) or {}
+    samples = params.get("samples")
+    lines = params.get("lines")
+    try:
+        if isinstance(samples, list) and all(isinstance(x, dict) for x in samples):
+            texts = [str(x.get("text", "")) for x in samples]
+            queued = online_learner.learn(texts, [x.get("intent") for x in samples])
+        elif isinstance(lines, list):
+            texts = lines
+            queued = online_learner.learn(texts)
         else:
-            print(f"[AI_LAB] Training Error: {result.stderr}")
-            return jsonify({"status": "error", "message": "Neural reconstruction failure."}), 500
-    except Exception as e:
-        return jsonify({"status": "error", "message": str(e)}), 500
+            return jsonify({"error": "Expected 'lines' or 'samples'"}), 400
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"status": "queued", "queued": queued, "dropped": len(texts) - queued}), 202
+
+@app.route('/ai/learn/checkpoint', methods=['POST'])
+def ai_learn_checkpoint():
+    """
+    Fits what is queued, publishes it and writes a checkpoint now.
+    """
+    if online_learner is None:
+        return jsonify({"error": "Online learning is disabled (set ONLINE_LEARNING=1)"}), 409
+    try:
+        # Waits on the learner's native thread; only this request blocks
+        with event_pool.admit():
+            return jsonify(event_pool.wait_on(online_learner.flush))
+    except TimeoutError as e:
+        return jsonify({"error": str(e)}), 503
+
+@app.route('/archive/query', methods=['POST'])
+def archive_query():
+    """
+    Filter / aggregate / top-K query over archived lines. See
+    LogArchive.query for the spec.
+    """
+    if log_store is None:
+        return jsonify({"error": "The log archive is disabled (set ARCHIVE_ENABLED=1)"}), 409
+    try:
+        with event_pool.admit():
+            return jsonify(event_pool.run(log_store.query, request.get_json(silent=True) or {}))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/archive/stats', methods=['GET'])
+def archive_stats():
+    if log_store is None:
+        return jsonify({"error": "The log archive is disabled (set ARCHIVE_ENABLED=1)"}), 409
+    stats = log_store.get_stats()
+    stats["live_writer"] = live_archive.get_stats()
+    stats["sources"] = log_store.sources()
+    return jsonify(stats)
 
 @app.route('/ai/sync', methods=['POST'])
 def ai_sync():
-    import time
-    time.sleep(1) # Simulate sync
+    socketio.sleep(1) # Simulate sync (cooperative, the loop keeps serving)
     return jsonify({
         "status": "synced",
         "weights_version": "v6.5.2-alpha",
@@ -342,6 +817,156 @@ def ai_sync():
 # =========================================================================
 # 5. ML Anomaly Detection & Local LLM (Llama 3 via Ollama) Handover
 # =========================================================================
+# Sliding-window state shared by /api/analyze-log and /api/analyze-logs
+correlation_engine = CorrelationEngine()
+
+def score_events(events):
+    """
+    Scores many telemetry events with one vectorized anomaly call.
+
+    Args:
+        events (list): Dicts with 'message', 'ip' and 'severity'.
+
+    Under overload (level SAMPLE) low-severity, non-anomalous events of a
+    known template are sampled: every event is scored, but only the kept
+    ones are archived, learned from and broadcast. Those verdicts carry
+    `sampled_out`.
+
+    Returns:
+        list: Verdict dicts (everything except the LLM explanation).
+    """
+    messages = [e.get('message', '') or '' for e in events]
+    sample = overload_control.level() >= overload.SAMPLE
+    # 1. Keyword Extraction (single pass of the shared matcher per event)
+    with metrics.timed("pattern_match", len(messages)):
+        masks = [LOG_MATCHER.mask(message.lower()) for message in messages]
+    with metrics.timed("anomaly_predict", len(messages)):
+        verdicts = detect_anomaly_batch(messages)
+    results = []
+    for event, message, mask, (is_anomaly, status) in zip(events, messages, masks, verdicts):
+        severity = event.get('severity', 'INFO')
+
+        auth_failure = bool(mask & LOGIN_BIT and mask & FAIL_BIT)
+
+        # 1b. Cross-event correlation: failures and rates per IP, source and template
+        template = template_key(message)
+        correlation = correlation_engine.observe(
+            ip=event.get('ip'), source=event.get('source'), template=template,
+            auth_failure=auth_failure
+        )
+        detections = correlation["detections"]
+        brute_force = "brute_force" in detections
+        burst = "ip_flood" in detections or "burst" in detections
+
+        # 2. Simple risk scoring logic based on ML prediction and severity
+        risk_score = 5
+        if severity == 'WARN': risk_score += 15
+        if severity in ['ERROR', 'CRITICAL']: risk_score += 40
+        if is_anomaly: risk_score += 30
+        if brute_force: risk_score += 20
+        elif auth_failure: risk_score += 10
+        if burst: risk_score += 10
+
+        risk_score = min(risk_score, 100)
+
+        # 3. Determine Threat Type based on patterns
+        threat_type = "Standard Operational Noise"
+        rec = ["Continue monitoring."]
+
+        if brute_force:
+            threat_type = "Brute Force Attack"
+            rec = ["Block Origin IP globally", "Enforce 2FA for targeted accounts"]
+        elif mask & DEGRADATION_BIT:
+            threat_type = "Service Degradation"
+            rec = ["Check database health", "Scale up connection pool"]
+        elif mask & SQL_BIT:
+            threat_type = "SQL Injection Probe"
+            rec = ["Sanitize inputs via WAF", "Review query logs"]
+        elif auth_failure:
+            threat_type = "Authentication Failure"
+            rec = ["Watch origin IP for repeated failures"]
+        elif burst:
+            threat_type = "Event Burst"
+            rec = ["Rate-limit origin IP", "Check the source for a runaway process"]
+
+        # 4. Load shedding: threats, anomalies and ERROR/CRITICAL always stay
+        sampled_out = False
+        if (sample and not is_anomaly and str(severity).upper() not in overload.PROTECTED_SEVERITIES
+                and threat_type == "Standard Operational Noise"
+                and correlation["template_events"] >= overload.OVERLOAD_KNOWN_TEMPLATE):
+            # 1 in N per template, as uploads do: a rare template is not
+            # starved by a noisy one of the same severity
+            sampled_out = not overload_control.live.keep(template, severity)
+
+        results.append({
+            "is_anomaly": is_anomaly,
+            "risk_score": risk_score,
+            "threat_type": threat_type,
+            "status": status,
+            "recommendations": rec,
+            "correlation": correlation,
+            "sampled_out": sampled_out
+        })
+    kept = [k for k, r in enumerate(results) if not r["sampled_out"]]
+    if len(kept) < len(results):
+        events = [events[k] for k in kept]
+        messages = [messages[k] for k in kept]
+    if online_learner is not None and ONLINE_LEARN_INGEST:
+        online_learner.learn(messages)
+    if live_archive is not None:
+        live = [results[k] for k in kept]
+        live_archive.append_many(messages, [e.get('severity', 'INFO') for e in events],
+                                 [e.get('source') or "live" for e in events],
+                                 [r["risk_score"] for r in live], [r["is_anomaly"] for r in live],
+                                 [e.get('timestamp') for e in events])
+    return results
+
+# Opt-in coalescing of concurrent /api/analyze-log calls (window 0 = off)
+ANALYZE_BATCH_WINDOW_MS = float(os.getenv("ANALYZE_BATCH_WINDOW_MS", 0))
+ANALYZE_BATCH_MAX = int(os.getenv("ANALYZE_BATCH_MAX", 64))
+event_batcher = MicroBatcher(score_events, ANALYZE_BATCH_MAX, ANALYZE_BATCH_WINDOW_MS, "analyze-log",
+                             on_wait=overload_control.observe) \
+    if ANALYZE_BATCH_WINDOW_MS > 0 else None
+
+def fallback_explanation(threat_type, ip, severity):
+    """
+    Predefined intelligent explanations used when Llama is offline.
+    """
+    if threat_type == "Brute Force Attack":
+        return f"Multiple authentication failures detected originating from IP {ip}. The actor is systematically testing credentials against the authentication gateway."
+    elif threat_type == "Authentication Failure":
+        return f"A failed authentication attempt was recorded from IP {ip}. Below the brute force threshold for now; repeated failures will escalate it."
+    elif threat_type == "Event Burst":
+        return f"Event rate from IP {ip} or for this message pattern is far above its usual level within the correlation window."
+    elif threat_type == "Service Degradation":
+        return "Internal systems failed to establish a network handshake within the required timeframe. The target service may be offline or saturated with requests."
+    elif threat_type == "SQL Injection Probe":
+        return "Anomalous database syntax detected in the request payload. Assessed as automated scanning looking for SQL vulnerabilities."
+    return f"Routine {severity} telemetry recorded matching standard threshold boundaries."
+
+# Background LLM explanations (pooled session, dedup, cache, circuit breaker)
+explainer = ExplanationPipeline()
+
+def _push_explanation(result):
+    def callback(text):
+        # Straight to realtime_log: a sampled-away follow-up would leave the
+        # client on the fallback text for good
+        send_log_update(dict(result, explanation=text, explanation_source="llm", explanation_pending=False))
+    return callback
+
+def _with_explanation(verdict, explanation):
+    # Keep the historical key order of the response
+    return {
+        "is_anomaly": verdict["is_anomaly"],
+        "risk_score": verdict["risk_score"],
+        "threat_type": verdict["threat_type"],
+        "status": verdict["status"],
+        "explanation": explanation,
+        "recommendations": verdict["recommendations"],
+        "correlation": verdict["correlation"],
+        "sampled_out": verdict["sampled_out"]
+    }
+
 @app.route('/api/analyze-log', methods=['POST'])
 def analyze_single_log():
     data = request.json
@@ -351,77 +976,62 @@ def analyze_single_log():
     message = data.get('message', '')
     ip = data.get('ip', '0.0.0.0')
     severity = data.get('severity', 'INFO')
-    
-    # 1. Feature Extraction
-    msg_length = len(message)
-    err_keywords = sum(1 for w in ['fail', 'error'] if w in message.lower())
 
-    # 2. Feature Extraction & Prediction (Modular Handover)
-    is_anomaly, status = detect_anomaly(message)
-    
-    # Simple risk scoring logic based on ML prediction and severity
-    risk_score = 5
-    if severity == 'WARN': risk_score += 15
-    if severity in ['ERROR', 'CRITICAL']: risk_score += 40
-    if is_anomaly: risk_score += 30
-    if "login" in message.lower() and "fail" in message.lower(): risk_score += 20
-        
-    risk_score = min(risk_score, 100)
-    
-    # 3. Determine Threat Type based on patterns
-    threat_type = "Standard Operational Noise"
-    rec = ["Continue monitoring."]
-    
-    l_msg = message.lower()
-    if "login" in l_msg and "fail" in l_msg:
-        threat_type = "Brute Force Attack"
-        rec = ["Block Origin IP globally", "Enforce 2FA for targeted accounts"]
-    elif "timeout" in l_msg or "refused" in l_msg:
-        threat_type = "Service Degradation"
-        rec = ["Check database health", "Scale up connection pool"]
-    elif "sql" in l_msg or "syntax" in l_msg:
-        threat_type = "SQL Injection Probe"
-        rec = ["Sanitize inputs via WAF", "Review query logs"]
-    
-    # 4. Request Explanation from Local Llama 3 via Ollama
-    explanation = f"ML Engine flagged this {severity} log. No immediate human-readable explanation available."
-    
-    try:
-        # Attempt to reach local Ollama API
-        prompt = f"Explain this error log briefly and professionally as a SOC analyst:\nLOG: {message}\nIP: {ip}\nSeverity: {severity}"
-        response = requests.post(
-            "http://localhost:11434/api/generate",
-            json={"model": "llama3", "prompt": prompt, "stream": False},
-            timeout=1.5 # Short timeout, we don't want to block the UI if Ollama isn't running
-        )
-        if response.status_code == 200:
-            llm_result = response.json()
-            explanation = llm_result.get('response', explanation).strip()
-    except Exception as e:
-        # Fallback to predefined intelligent explanations if Llama is offline
-        if threat_type == "Brute Force Attack":
-            explanation = f"Multiple authentication failures detected originating from IP {ip}. The actor is systematically testing credentials against the authentication gateway."
-        elif threat_type == "Service Degradation":
-            explanation = "Internal systems failed to establish a network handshake within the required timeframe. The target service may be offline or saturated with requests."
-        elif threat_type == "SQL Injection Probe":
-            explanation = "Anomalous database syntax detected in the request payload. Assessed as automated scanning looking for SQL vulnerabilities."
+    # 1-3. Feature Extraction & Prediction (coalesced with concurrent calls),
+    # off the event loop
+    with event_pool.admit():
+        if event_batcher is not None:
+            verdict = event_pool.wait_on(event_batcher.submit, data)
         else:
-            explanation = f"Routine {severity} telemetry recorded matching standard threshold boundaries."
+            verdict = event_pool.run(score_events, [data])[0]
+
+    # 4. Explanation: cached Llama 3 answer, else the predefined text now and
+    # the Ollama answer later as a 'realtime_log' update with the same
+    # event_id, sent to every matching client outside backpressure
+    explanation = explainer.lookup(message, severity)
+    source = "llm" if explanation is not None else "fallback"
+    result = _with_explanation(verdict, explanation or fallback_explanation(verdict["threat_type"], ip, severity))
+    result["event_id"] = uuid.uuid4().hex
+    result["explanation_source"] = source
+    result["explanation_pending"] = False
+    if explanation is None:
+        # Overloaded: only anomalies and ERROR/CRITICAL events still go to the LLM
+        if (overload_control.level() >= overload.SHED_LLM and not verdict["is_anomaly"]
+                and str(severity).upper() not in overload.PROTECTED_SEVERITIES):
+            overload_control.record(llm_skipped=1)
+        else:
+            result["explanation_pending"] = explainer.submit(message, ip, severity, _push_explanation(dict(result)))
+
+    # Push to WebSocket clients for real-time visualization (unless sampled away)
+    if not verdict["sampled_out"]:
+        send_log_to_clients(result)
 
-    result = {
-        "is_anomaly": is_anomaly,
-        "risk_score": risk_score,
-        "threat_type": threat_type,
-        "status": status,
-        "explanation": explanation,
-        "recommendations": rec
-    }
-    
-    # Push to WebSocket clients for real-time visualization
-    send_log_to_clients(result)
-    
     return jsonify(result)
 
+@app.route('/api/analyze-logs', methods=['POST'])
+def analyze_bulk_logs():
+    """
+    Bulk variant: accepts a JSON array of events (or {"logs": [...]}) and
+    scores them in one vectorized pass. The LLM is skipped for bulk calls;
+    each result carries the predefined explanation for its threat type.
+    """
+    data = request.json
+    events = data.get('logs') if isinstance(data, dict) else data
+    if not isinstance(events, list) or not events or not all(isinstance(e, dict) for e in events):
+        return jsonify({"error": "Expected a non-empty array of log objects"}), 400
+
+    with event_pool.admit():
+        verdicts = event_pool.run(score_events, events)
+    results = []
+    for event, verdict in zip(events, verdicts):
+        explanation = fallback_explanation(verdict["threat_type"], event.get('ip', '0.0.0.0'), event.get('severity', 'INFO'))
+        result = _with_explanation(verdict, explanation)
+        if not verdict["sampled_out"]:
+            send_log_to_clients(result)
+        results.append(result)
+
+    return jsonify({"count": len(results), "results": results})
+
 if __name__ == '__main__':
     PORT = int(os.getenv("PORT", 5000))
     print(f"Starting Python AI Service on port {PORT}...", file=sys.stderr)
@@ -0,0 +1,161 @@
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+# --- SENTINELX EVENT LOOP LOAD TEST ---
+# Starts the service the way app.py does (socketio.run, eventlet when it is
+# installed) or, with --server gunicorn, the way the Procfile does (eventlet
+# worker, standard library monkey-patched) and keeps it busy with concurrent large uploads while a probe
+# polls /health and opens Engine.IO sessions (the socket heartbeat path).
+# Reports probe latency, the service's own event-loop lag and how many
+# uploads were turned away with 503. "inline" sets the offload pools to 0
+# workers, which is how the service scored before offloading.
+
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(SERVICE_DIR)
+
+_SERVER = r'''
+import app
+app.socketio.run(app.app, host="127.0.0.1", port=PORT, use_reloader=False, log_output=False,
+                 allow_unsafe_werkzeug=True)
+'''
+
+def _server_command(server, port):
+    if server == "gunicorn":
+        # The Procfile's command
+        return [sys.executable, "-m", "gunicorn", "--worker-class", "eventlet", "-w", "1", "app:app",
+                "--bind", f"127.0.0.1:{port}", "--timeout", "900"]
+    return [sys.executable, "-c", _SERVER.replace("PORT", str(port))]
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _percentiles(values):
+    if not values:
+        return {"p50": None, "p99": None, "max": None}
+    values = sorted(values)
+    return {"p50": round(statistics.median(values), 2),
+            "p99": round(values[min(len(values) - 1, int(0.99 * len(values)))], 2),
+            "max": round(values[-1], 2)}
+
+def build_upload(lines):
+    """
+    Writes `lines` vault lines (repeated as needed) to a temp file.
+    """
+    from bench_suite import load_vault
+    corpus = [line for lines_ in load_vault().values() for line in lines_]
+    fd, path = tempfile.mkstemp(prefix="sentinelx_loop_", suffix=".log")
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        for i in range(lines):
+            f.write(corpus[i % len(corpus)] + '\n')
+    return path
+
+def run_mode(mode, upload_path, uploaders, duration, probe_ms, server_kind="socketio"):
+    port = _free_port()
+    env = dict(os.environ)
+    archive_dir = tempfile.mkdtemp(prefix="sentinelx_loop_archive_")
+    env["ARCHIVE_DIR"] = archive_dir
+    if mode == "inline":
+        env["OFFLOAD_UPLOAD_WORKERS"] = env["OFFLOAD_EVENT_WORKERS"] = "0"
+    server = subprocess.Popen(_server_command(server_kind, port), cwd=SERVICE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(600):
+            try:
+                requests.get(base + "/health", timeout=1)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.05)
+
+        stop = threading.Event()
+        upload_ms, statuses = [], {}
+        health_ms, socket_ms = [], []
+
+        def upload():
+            with open(upload_path, 'rb') as f:
+                data = f.read()
+            while not stop.is_set():
+                started = time.perf_counter()
+                r = requests.post(base + "/analysis/upload", files={"log": ("load.log", data)}, timeout=600)
+                statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+                if r.status_code == 200:
+                    upload_ms.append((time.perf_counter() - started) * 1000)
+                else:
+                    stop.wait(float(r.headers.get("Retry-After", 1)))
+
+        def probe():
+            while not stop.is_set():
+                started = time.perf_counter()
+                requests.get(base + "/health", timeout=60)
+                health_ms.append((time.perf_counter() - started) * 1000)
+                started = time.perf_counter()
+                requests.get(base + "/socket.io/", params={"EIO": 4, "transport": "polling"}, timeout=60)
+                socket_ms.append((time.perf_counter() - started) * 1000)
+                stop.wait(probe_ms / 1000)
+
+        threads = [threading.Thread(target=upload) for _ in range(uploaders)] + [threading.Thread(target=probe)]
+        for t in threads:
+            t.start()
+        time.sleep(duration)
+        stop.set()
+        for t in threads:
+            t.join()
+        health = requests.get(base + "/health", timeout=60).json()
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(archive_dir, ignore_errors=True)
+
+    lag = health["event_loop"]
+    return {
+        "async_mode": health["offload"]["upload"]["async_mode"],
+        "uploads": {"status": statuses, "latency_ms": _percentiles(upload_ms)},
+        "health_ms": _percentiles(health_ms),
+        "socket_handshake_ms": _percentiles(socket_ms),
+        "event_loop_lag_ms": {"p50": lag["p50_ms"], "p99": lag["p99_ms"], "max": lag["max_ms"]},
+        "offload": health["offload"]
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SentinelX event loop load test")
+    parser.add_argument("--modes", nargs="+", default=["offload", "inline"], choices=["offload", "inline"])
+    parser.add_argument("--server", default="socketio", choices=["socketio", "gunicorn"],
+                        help="socketio.run as app.py does, or the Procfile's gunicorn eventlet worker")
+    parser.add_argument("--lines", type=int, default=200000, help="lines per uploaded file")
+    parser.add_argument("--uploaders", type=int, default=4, help="concurrent upload clients")
+    parser.add_argument("--duration", type=float, default=20, help="seconds of load per mode")
+    parser.add_argument("--probe-ms", type=float, default=50, help="pause between health probes")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args(argv)
+
+    upload_path = build_upload(args.lines)
+    results = {}
+    try:
+        for mode in args.modes:
+            r = results[mode] = run_mode(mode, upload_path, args.uploaders, args.duration, args.probe_ms, args.server)
+            print(f"{mode:8s} ({r['async_mode']}) health p99 {r['health_ms']['p99']}ms max {r['health_ms']['max']}ms  "
+                  f"socket p99 {r['socket_handshake_ms']['p99']}ms  loop lag p99 {r['event_loop_lag_ms']['p99']}ms "
+                  f"max {r['event_loop_lag_ms']['max']}ms  uploads {r['uploads']['status']} "
+                  f"p50 {r['uploads']['latency_ms']['p50']}ms")
+    finally:
+        os.remove(upload_path)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"server": args.server, "lines": args.lines, "uploaders": args.uploaders, "results": results}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# --- SENTINELX STARTUP BENCHMARK ---
+# Measures service cold start in fresh interpreters: importing app.py, the
+# first intent prediction and the first anomaly verdict, plus peak RSS.
+# "bundle" uses the current model bundle; "legacy" hides it so the pickled
+# artifacts are loaded instead.
+
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_LINES = [
+    "ERROR: Unauthorized access attempt from 192.168.1.105 on port 22",
+    "INFO: session opened for user admin by (uid=0)",
+    "WARN: datanode heartbeat timeout, block blk_-6952295868487656571 under-replicated",
+]
+
+_PROBE = r'''
+import json, resource, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.predict_intents(LINES)
+intent = time.perf_counter()
+app.detect_anomaly_batch(LINES)
+anomaly = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "first_intent_ms": (intent - imported) * 1000,
+    "first_anomaly_ms": (anomaly - intent) * 1000,
+    "ready_ms": (anomaly - started) * 1000,
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "sklearn_imported": "sklearn" in sys.modules,
+    "lite_brain": app.model_source,
+}))
+'''
+
+def run_once(mode):
+    env = dict(os.environ)
+    with tempfile.TemporaryDirectory() as empty:
+        if mode == "legacy":
+            env["MODEL_BUNDLE_DIR"] = empty
+        proc = subprocess.run(
+            [sys.executable, "-c", _PROBE.replace("LINES", repr(SAMPLE_LINES))],
+            cwd=SERVICE_DIR, env=env, capture_output=True, text=True
+        )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{mode} probe failed:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def summarize(samples):
+    summary = {}
+    for key in ("import_ms", "first_intent_ms", "first_anomaly_ms", "ready_ms", "peak_rss_mb"):
+        values = [s[key] for s in samples]
+        summary[key] = {"median": round(statistics.median(values), 2), "max": round(max(values), 2)}
+    summary["sklearn_imported"] = any(s["sklearn_imported"] for s in samples)
+    summary["lite_brain"] = samples[-1]["lite_brain"]
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SentinelX service startup benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--modes", nargs="+", default=["bundle", "legacy"], choices=["bundle", "legacy"])
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for mode in args.modes:
+        results[mode] = summarize([run_once(mode) for _ in range(args.runs)])
+        r = results[mode]
+        print(f"{mode:7s} import {r['import_ms']['median']:8.1f}ms  first intent {r['first_intent_ms']['median']:7.1f}ms  "
+              f"first anomaly {r['first_anomaly_ms']['median']:7.1f}ms  ready {r['ready_ms']['median']:8.1f}ms  "
+              f"rss {r['peak_rss_mb']['median']:6.1f}MB  sklearn={r['sklearn_imported']}  ({r['lite_brain']})")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"runs": args.runs, "results": results}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,420 @@
+import argparse
+import contextlib
+import csv
+import glob
+import io
+import json
+import os
+import platform
+import random
+import re
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# --- SENTINELX BENCHMARK SUITE ---
+# Replays the training vault (or a synthetic scale-up of it) through every
+# stage of the analysis pipeline and writes machine-readable results.
+# `compare` diffs two result files and flags regressions.
+
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(SERVICE_DIR, '..'))
+VAULT_DIR = os.path.join(SERVICE_DIR, '..', 'data', 'training_vault')
+
+CHUNK_LINES = 2048           # Lines per batch call
+SINGLE_SAMPLE = 250          # Lines per dataset timed one call at a time
+REGRESSION_THRESHOLD = 0.15  # Relative change flagged by `compare`
+MIN_LATENCY_DELTA_MS = 0.05  # Smaller p99 moves are timer noise
+
+_DIGITS = re.compile(r'\d+')
+
+# =========================================================================
+# Corpora
+# =========================================================================
+def load_vault(vault_dir=VAULT_DIR, datasets=None):
+    """
+    Returns {dataset: [message, ...]} from the Content column of every
+    *_2k.log_structured.csv in the vault.
+    """
+    corpus = {}
+    for path in sorted(glob.glob(os.path.join(vault_dir, '*_2k.log_structured.csv'))):
+        name = os.path.basename(path).split('_')[0]
+        if datasets and name not in datasets:
+            continue
+        with open(path, newline='', encoding='utf-8', errors='ignore') as f:
+            corpus[name] = [row['Content'] for row in csv.DictReader(f) if row.get('Content')]
+    return corpus
+
+def load_archive(archive_dir, datasets=None):
+    """
+    Returns {source: [message, ...]} for every source of a log archive
+    (log_archive.py), read from its compressed message blocks.
+    """
+    import log_archive
+    archive = log_archive.LogArchive(archive_dir)
+    corpus = {}
+    for source in archive.sources():
+        if datasets and source not in datasets:
+            continue
+        corpus[source] = [m for block in archive.iter_messages(source) for m in block]
+    return corpus
+
+def scale_corpus(corpus, total_lines, seed=42):
+    """
+    Builds a synthetic corpus of ~total_lines by cycling each dataset's
+    messages with every digit run re-randomized (fresh ids, IPs, counters),
+    keeping the per-dataset proportions.
+    """
+    rng = random.Random(seed)
+    per_dataset = max(1, total_lines // max(1, len(corpus)))
+    fresh = lambda m: ''.join(rng.choice('0123456789') for _ in m.group(0))
+    scaled = {}
+    for name, lines in corpus.items():
+        scaled[name] = [_DIGITS.sub(fresh, lines[i % len(lines)]) for i in range(per_dataset)]
+    return scaled
+
+# =========================================================================
+# Measurement
+# =========================================================================
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+class StageTimer:
+    """
+    Collects per-call latencies and line counts for one stage.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.latencies_ms = []
+        self.lines = 0
+        self.seconds = 0.0
+        self.extra = {}
+
+    def call(self, fn, lines):
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = fn()
+        elapsed = time.perf_counter() - started
+        self.latencies_ms.append(elapsed * 1000)
+        self.lines += lines
+        self.seconds += elapsed
+        return result
+
+    def result(self):
+        lat = np.asarray(self.latencies_ms) if self.latencies_ms else np.zeros(1)
+        return dict({
+            "calls": len(self.latencies_ms),
+            "lines": self.lines,
+            "seconds": round(self.seconds, 4),
+            "lines_per_sec": round(self.lines / self.seconds, 1) if self.seconds else None,
+            "latency_ms": {
+                "p50": round(float(np.percentile(lat, 50)), 4),
+                "p90": round(float(np.percentile(lat, 90)), 4),
+                "p99": round(float(np.percentile(lat, 99)), 4),
+                "max": round(float(lat.max()), 4),
+                "mean": round(float(lat.mean()), 4)
+            },
+            # Process high-water mark at the end of the stage
+            "peak_rss_mb": round(peak_rss_mb(), 1)
+        }, **self.extra)
+
+def _chunks(lines, size=CHUNK_LINES):
+    for i in range(0, len(lines), size):
+        yield lines[i:i + size]
+
+def _sample(corpus, per_dataset):
+    sample = []
+    for lines in corpus.values():
+        step = max(1, len(lines) // per_dataset)
+        sample.extend(lines[::step][:per_dataset])
+    return sample
+
+# =========================================================================
+# Stages
+# =========================================================================
+def bench_vectorize(corpus, sample):
+    from ai.anomaly import LogVectorizer
+    single, batch = StageTimer("vectorize"), StageTimer("vectorize_batch")
+    for line in sample:
+        single.call(lambda: LogVectorizer.vectorize(line), 1)
+    for lines in corpus.values():
+        for chunk in _chunks(lines):
+            batch.call(lambda: LogVectorizer.vectorize_batch(chunk), len(chunk))
+    return [single, batch]
+
+def bench_anomaly(corpus, sample):
+    from ai.anomaly import detect_anomaly, detect_anomaly_batch
+    detect_anomaly(sample[0]) # Loads the model outside the timings
+    single, batch = StageTimer("detect_anomaly"), StageTimer("detect_anomaly_batch")
+    for line in sample:
+        single.call(lambda: detect_anomaly(line), 1)
+    flagged = 0
+    for lines in corpus.values():
+        for chunk in _chunks(lines):
+            flagged += sum(f for f, _ in batch.call(lambda: detect_anomaly_batch(chunk), len(chunk)))
+    batch.extra["anomalies"] = int(flagged)
+    return [single, batch]
+
+def bench_intent(app, corpus, sample):
+    app.get_lite_brain()
+    single, batch = StageTimer("intent"), StageTimer("intent_batch")
+    app.intent_cache.clear()
+    for line in sample:
+        single.call(lambda: app.predict_intents([line]), 1)
+    # Cold cache for the batch pass too, so the hit rate reflects this corpus
+    app.intent_cache.clear()
+    before = app.intent_cache.get_stats()
+    for lines in corpus.values():
+        for chunk in _chunks(lines):
+            batch.call(lambda: app.predict_intents(chunk), len(chunk))
+    after = app.intent_cache.get_stats()
+    lookups = (after["hits"] - before["hits"]) + (after["misses"] - before["misses"])
+    batch.extra["cache_hit_rate"] = round((after["hits"] - before["hits"]) / lookups, 4) if lookups else None
+    batch.extra["model"] = app.model_source
+    return [single, batch]
+
+def bench_upload(app, corpus, workdir):
+    """
+    POSTs each dataset, as a plain log file, to /analysis/upload.
+    """
+    stage = StageTimer("analyze_logs")
+    client = app.app.test_client()
+    issues = 0
+    for name, lines in corpus.items():
+        path = os.path.join(workdir, f"{name}.log")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        with open(path, 'rb') as f:
+            response = stage.call(lambda: client.post(
+                '/analysis/upload',
+                data={'log': (f, os.path.basename(path))},
+                content_type='multipart/form-data'
+            ), len(lines))
+        if response.status_code != 200:
+            raise RuntimeError(f"/analysis/upload failed for {name}: {response.status_code}")
+        issues += len(response.get_json().get("issues", []))
+        os.remove(path)
+    stage.extra["returned_issues"] = issues
+    return [stage]
+
+# Filter / aggregate / top-K mix timed by the archive stage
+ARCHIVE_QUERIES = {
+    "count": {},
+    "errors_by_component": {"levels": ["ERROR"], "group_by": "component"},
+    "top_templates": {"group_by": "template", "top": 10},
+    "token_by_hour": {"tokens": ["error"], "group_by": "time", "interval": 3600},
+    "risk_by_hour": {"min_risk": 40, "group_by": "time", "interval": 3600},
+    "top_risk_rows": {"limit": 50, "order": "risk"},
+    "last_hour_by_level": {"start": "last_hour", "group_by": "level"}
+}
+
+def bench_archive(corpus, workdir, repeat=20):
+    """
+    Archives the corpus (one source per dataset, 10ms apart) and times the
+    ARCHIVE_QUERIES mix against it.
+    """
+    import log_archive
+    from ai.matcher import LOG_MATCHER, severity_of
+    root = os.path.join(workdir, "archive")
+    ingest, query = StageTimer("archive_ingest"), StageTimer("archive_query")
+    started = 1700000000.0
+    offset = 0
+    for name, lines in corpus.items():
+        writer = log_archive.ArchiveWriter(root, source=name)
+        for chunk in _chunks(lines):
+            levels = [severity_of(LOG_MATCHER.mask(l.lower())) for l in chunk]
+            risks = [{"ERROR": 45, "WARN": 20}.get(l, 5) for l in levels]
+            stamps = [started + (offset + i) * 0.01 for i in range(len(chunk))]
+            offset += len(chunk)
+            ingest.call(lambda: writer.append_many(chunk, levels, [name] * len(chunk), risks, None, stamps), len(chunk))
+        ingest.call(writer.flush, 0)
+
+    archive = log_archive.LogArchive(root)
+    stats = archive.get_stats()
+    for spec in ARCHIVE_QUERIES.values():
+        if spec.get("start") == "last_hour":
+            spec = dict(spec, start=stats["newest"] / 1000 - 3600)
+        for _ in range(repeat):
+            query.call(lambda: archive.query(spec), stats["rows"])
+    ingest.extra["bytes_per_row"] = round(stats["bytes"] / stats["rows"], 2) if stats["rows"] else None
+    query.extra.update(chunks=stats["chunks"], rows=stats["rows"])
+    shutil.rmtree(root, ignore_errors=True)
+    return [ingest, query]
+
+def bench_train(vault_lines):
+    """
+    Runs train_model.py in a child process against a scratch bundle
+    directory, so the live models are untouched.
+    """
+    stage = StageTimer("train_model")
+    with tempfile.TemporaryDirectory() as bundle_dir:
+        env = dict(os.environ, MODEL_BUNDLE_DIR=bundle_dir)
+        proc = stage.call(lambda: subprocess.run(
+            [sys.executable, os.path.join(SERVICE_DIR, 'train_model.py')],
+            cwd=SERVICE_DIR, env=env, capture_output=True, text=True
+        ), vault_lines)
+    if proc.returncode != 0:
+        raise RuntimeError(f"train_model.py failed:\n{proc.stderr[-2000:]}")
+    stage.extra["child_peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1)
+    return [stage]
+
+# =========================================================================
+# Run / compare
+# =========================================================================
+def _meta(args, corpus):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SERVICE_DIR,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "datasets": {name: len(lines) for name, lines in corpus.items()},
+        "total_lines": sum(len(lines) for lines in corpus.values()),
+        "scale_lines": args.scale_lines,
+        "seed": args.seed
+    }
+
+def run(args):
+    corpus = load_archive(args.archive, args.datasets) if args.archive else load_vault(args.vault, args.datasets)
+    if not corpus:
+        print(f"No datasets found in {args.archive or args.vault}")
+        return 1
+    vault_lines = sum(len(lines) for lines in corpus.values())
+    if args.scale_lines:
+        corpus = scale_corpus(corpus, args.scale_lines, args.seed)
+    sample = _sample(corpus, args.sample)
+
+    # Uploads archive their lines; keep them out of the service's archive
+    archive_dir = tempfile.mkdtemp(prefix="sentinelx_bench_archive_")
+    os.environ["ARCHIVE_DIR"] = archive_dir
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app
+
+    stages = {}
+    selected = set(args.stages)
+    with tempfile.TemporaryDirectory() as workdir:
+        for _ in range(args.repeat):
+            timers = []
+            if "vectorize" in selected:
+                timers += bench_vectorize(corpus, sample)
+            if "anomaly" in selected:
+                timers += bench_anomaly(corpus, sample)
+            if "intent" in selected:
+                timers += bench_intent(app, corpus, sample)
+            if "upload" in selected:
+                timers += bench_upload(app, corpus, workdir)
+            if "train" in selected:
+                timers += bench_train(vault_lines)
+            if "archive" in selected:
+                timers += bench_archive(corpus, workdir)
+            for timer in timers:
+                merged = stages.get(timer.name)
+                if merged is None:
+                    stages[timer.name] = timer
+                else:
+                    merged.latencies_ms += timer.latencies_ms
+                    merged.lines += timer.lines
+                    merged.seconds += timer.seconds
+                    merged.extra.update(timer.extra)
+
+    app.log_archive.drain()
+    shutil.rmtree(archive_dir, ignore_errors=True)
+
+    results = {"meta": _meta(args, corpus), "stages": {name: t.result() for name, t in stages.items()}}
+    print(f"{'stage':22s} {'lines/s':>12s} {'p50 ms':>10s} {'p99 ms':>10s} {'rss MB':>8s}")
+    for name, r in results["stages"].items():
+        print(f"{name:22s} {r['lines_per_sec'] or 0:12.1f} {r['latency_ms']['p50']:10.3f} "
+              f"{r['latency_ms']['p99']:10.3f} {r['peak_rss_mb']:8.1f}")
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.out}")
+    return 0
+
+def compare(base, new, threshold=REGRESSION_THRESHOLD, min_delta_ms=MIN_LATENCY_DELTA_MS):
+    """
+    Returns (rows, regressions). A stage regresses when its throughput drops,
+    or its p99 latency or peak RSS grows, by more than `threshold`. p99
+    changes smaller than `min_delta_ms` are never flagged.
+    """
+    checks = [
+        ("lines_per_sec", lambda r: r["lines_per_sec"], -1),
+        ("p99_ms", lambda r: r["latency_ms"]["p99"], 1),
+        ("peak_rss_mb", lambda r: r["peak_rss_mb"], 1),
+    ]
+    rows, regressions = [], []
+    for stage in sorted(set(base["stages"]) | set(new["stages"])):
+        old_r, new_r = base["stages"].get(stage), new["stages"].get(stage)
+        if old_r is None or new_r is None:
+            rows.append((stage, "missing in " + ("base" if old_r is None else "new"), None, None, None, ""))
+            continue
+        for metric, get, worse_sign in checks:
+            old_v, new_v = get(old_r), get(new_r)
+            if not old_v or new_v is None:
+                continue
+            change = (new_v - old_v) / old_v
+            flag = "REGRESSION" if change * worse_sign > threshold else ("improved" if -change * worse_sign > threshold else "")
+            if metric == "p99_ms" and abs(new_v - old_v) < min_delta_ms:
+                flag = ""
+            rows.append((stage, metric, old_v, new_v, change, flag))
+            if flag == "REGRESSION":
+                regressions.append((stage, metric, change))
+    return rows, regressions
+
+def run_compare(args):
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    if base["meta"].get("total_lines") != new["meta"].get("total_lines"):
+        print(f"Warning: corpora differ ({base['meta'].get('total_lines')} vs {new['meta'].get('total_lines')} lines)")
+    rows, regressions = compare(base, new, args.threshold, args.min_delta_ms)
+    print(f"{'stage':22s} {'metric':14s} {'base':>12s} {'new':>12s} {'change':>8s}")
+    for stage, metric, old_v, new_v, change, flag in rows:
+        if change is None:
+            print(f"{stage:22s} {metric}")
+            continue
+        print(f"{stage:22s} {metric:14s} {old_v:12.3f} {new_v:12.3f} {change:+8.1%} {flag}")
+    print(f"{len(regressions)} regression(s) above {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SentinelX pipeline benchmark suite")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    r = sub.add_parser("run", help="benchmark the pipeline stages")
+    r.add_argument("--vault", default=VAULT_DIR)
+    r.add_argument("--datasets", nargs="+", help="subset of vault datasets (e.g. HDFS Linux)")
+    r.add_argument("--scale-lines", type=int, default=0,
+                   help="replay a synthetic corpus of this many lines instead of the vault")
+    r.add_argument("--seed", type=int, default=42)
+    r.add_argument("--sample", type=int, default=SINGLE_SAMPLE,
+                   help="lines per dataset for the single-call latency stages")
+    r.add_argument("--archive", metavar="DIR", help="read the corpus from this log archive instead of the vault")
+    r.add_argument("--stages", nargs="+", default=["vectorize", "anomaly", "intent", "upload", "train", "archive"],
+                   choices=["vectorize", "anomaly", "intent", "upload", "train", "archive"])
+    r.add_argument("--repeat", type=int, default=1)
+    r.add_argument("--out", help="write results JSON here")
+
+    c = sub.add_parser("compare", help="flag regressions between two result files")
+    c.add_argument("base")
+    c.add_argument("new")
+    c.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    c.add_argument("--min-delta-ms", type=float, default=MIN_LATENCY_DELTA_MS)
+
+    args = parser.parse_args(argv)
+    return run(args) if args.command == "run" else run_compare(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
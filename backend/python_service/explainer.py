@@ -0,0 +1,258 @@
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+from ai.templates import TemplateMiner
+from realtime import native
+import metrics
+
+# --- SENTINELX EXPLANATION PIPELINE ---
+# LLM explanations are produced off the request path: a small worker pool
+# talks to Ollama over one pooled keep-alive session, identical
+# (template, severity) prompts are answered once, and a circuit breaker
+# stops calling the LLM while it is down.
+
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/api/generate")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 10))
+LLM_WORKERS = int(os.getenv("LLM_WORKERS", 2))
+LLM_QUEUE_SIZE = int(os.getenv("LLM_QUEUE_SIZE", 256))
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", 2048))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", 3600))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", 3))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", 30))
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures; after
+    `reset_timeout` seconds one probe call is let through (half-open).
+    """
+    def __init__(self, failure_threshold=LLM_BREAKER_FAILURES, reset_timeout=LLM_BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire after `ttl` seconds.
+    """
+    def __init__(self, maxsize=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        # Also used as PRIME_AI's memo on its native batching thread
+        self._lock = native.threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+class ExplanationPipeline:
+    """
+    Background LLM explainer.
+
+    `submit` returns immediately. When the explanation is ready every
+    callback registered for the same (template, severity) key is invoked
+    with the text; on failure they are not called and the caller keeps
+    its fallback explanation.
+    """
+    def __init__(self, url=OLLAMA_URL, model=OLLAMA_MODEL, workers=LLM_WORKERS,
+                 queue_size=LLM_QUEUE_SIZE, timeout=LLM_TIMEOUT,
+                 cache=None, breaker=None):
+        self.url = url
+        self.model = model
+        self.timeout = timeout
+        self.workers = max(1, workers)
+        self.cache = cache or TTLCache()
+        self.breaker = breaker or CircuitBreaker()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+        # Created with the workers so `requests` is not imported at startup
+        self.session = None
+
+        self.stats = {
+            "cache_hits": 0,
+            "cache_misses": 0,
+            "deduplicated": 0,
+            "queued": 0,
+            "dropped_queue_full": 0,
+            "skipped_circuit_open": 0,
+            "llm_calls": 0,
+            "llm_errors": 0,
+            "llm_latency_ms_total": 0.0
+        }
+
+    @staticmethod
+    def key_for(message, severity):
+        # Variable fields (ids, IPs, counters) do not change the explanation
+        return ' '.join(TemplateMiner.tokenize(str(message).lower())), severity
+
+    @staticmethod
+    def build_prompt(message, ip, severity):
+        return f"Explain this error log briefly and professionally as a SOC analyst:\nLOG: {message}\nIP: {ip}\nSeverity: {severity}"
+
+    def _ensure_started(self):
+        if not self._threads:
+            with self._lock:
+                if not self._threads:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+                    # One keep-alive connection per worker, reused across calls
+                    self.session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+                    self.session.mount("http://", adapter)
+                    self.session.mount("https://", adapter)
+                    for i in range(self.workers):
+                        t = threading.Thread(target=self._run, name=f"llm-explainer-{i}", daemon=True)
+                        t.start()
+                        self._threads.append(t)
+
+    def lookup(self, message, severity):
+        """
+        Returns a cached explanation, or None.
+        """
+        text = self.cache.get(self.key_for(message, severity))
+        self.stats["cache_hits" if text is not None else "cache_misses"] += 1
+        return text
+
+    def submit(self, message, ip, severity, callback):
+        """
+        Schedules an explanation. Returns False when it was not scheduled
+        (circuit open or queue full).
+        """
+        key = self.key_for(message, severity)
+        with self._lock:
+            waiters = self._inflight.get(key)
+            if waiters is not None:
+                # Same prompt already queued: share its answer
+                waiters.append(callback)
+                self.stats["deduplicated"] += 1
+                return True
+            if not self.breaker.allow():
+                self.stats["skipped_circuit_open"] += 1
+                return False
+            try:
+                self._queue.put_nowait((key, self.build_prompt(message, ip, severity)))
+            except queue.Full:
+                self.stats["dropped_queue_full"] += 1
+                return False
+            self._inflight[key] = [callback]
+            self.stats["queued"] += 1
+        self._ensure_started()
+        return True
+
+    def _generate(self, prompt):
+        started = time.perf_counter()
+        self.stats["llm_calls"] += 1
+        try:
+            response = self.session.post(
+                self.url,
+                json={"model": self.model, "prompt": prompt, "stream": False},
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+            text = response.json().get('response', '').strip()
+            if not text:
+                raise ValueError("empty LLM response")
+            return text
+        finally:
+            elapsed = time.perf_counter() - started
+            self.stats["llm_latency_ms_total"] += elapsed * 1000
+            metrics.observe("llm_call", elapsed)
+
+    def _run(self):
+        while True:
+            key, prompt = self._queue.get()
+            text = None
+            # A breaker that opened while this was queued skips the call
+            if self.breaker.state != "open":
+                try:
+                    text = self._generate(prompt)
+                    self.breaker.record_success()
+                    self.cache.put(key, text)
+                except Exception as e:
+                    self.stats["llm_errors"] += 1
+                    self.breaker.record_failure()
+                    print(f"[LLM] Explanation failed ({self.breaker.state}): {e}")
+            else:
+                self.stats["skipped_circuit_open"] += 1
+
+            with self._lock:
+                waiters = self._inflight.pop(key, [])
+            if text is not None:
+                for callback in waiters:
+                    try:
+                        callback(text)
+                    except Exception as e:
+                        print(f"[LLM] Explanation callback error: {e}")
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        calls = stats["llm_calls"] or 1
+        stats["llm_latency_ms_avg"] = round(stats["llm_latency_ms_total"] / calls, 2)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["inflight"] = len(self._inflight)
+        stats["cache_size"] = len(self.cache)
+        stats["circuit"] = self.breaker.state
+        return stats
@@ -0,0 +1,131 @@
+import hashlib
+import os
+import re
+import sys
+from collections import OrderedDict
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from realtime.native import threading
+
+# --- SENTINELX INTENT CACHE ---
+# Memoizes the Lite Brain (TF-IDF + NB) per normalized log line. Once ids,
+# IPs, block ids and counters are masked most lines repeat, so only new
+# shapes reach the model.
+
+INTENT_CACHE_SIZE = int(os.getenv("INTENT_CACHE_SIZE", 50000))
+INTENT_CACHE_EVICTION = os.getenv("INTENT_CACHE_EVICTION", "lru").lower()
+EVICTION_POLICIES = ("lru", "fifo")
+
+# Hex ids and digit runs (IPs -> #.#.#.#, blk_-695... -> blk_-#) are
+# masked; the surrounding words still reach the key
+_VARIABLE_REGEX = re.compile(r'0x[0-9a-f]+|\d+')
+
+def normalize(text):
+    """
+    Lower-cases a line, masks its variable fields and collapses whitespace.
+    """
+    return ' '.join(_VARIABLE_REGEX.sub('#', str(text).lower()).split())
+
+def cache_key(text):
+    # Fixed-size digest so long lines do not bloat the cache
+    return hashlib.blake2b(normalize(text).encode('utf-8', 'ignore'), digest_size=16).digest()
+
+class IntentCache:
+    """
+    Bounded, thread-safe memo of intent predictions.
+
+    Args:
+        maxsize (int): Entries kept; 0 disables the cache.
+        eviction (str): "lru" (drop least recently used) or "fifo" (drop
+            oldest insert).
+    """
+    def __init__(self, maxsize=INTENT_CACHE_SIZE, eviction=INTENT_CACHE_EVICTION):
+        if eviction not in EVICTION_POLICIES:
+            print(f"[INTENT_CACHE] Unknown eviction policy '{eviction}', using lru.")
+            eviction = "lru"
+        self.maxsize = max(0, maxsize)
+        self.eviction = eviction
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped on clear(); predictions started before a reload are not stored
+        self._generation = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def predict(self, texts, predict_fn, generation=None):
+        """
+        Returns the intent of every text, calling `predict_fn` once with the
+        distinct uncached lines.
+
+        Args:
+            texts (list): Raw lines.
+            predict_fn (callable): Takes a list of lines, returns their intents.
+            generation (int): Generation the model behind `predict_fn` was
+                published for (see clear()); defaults to the current one.
+        """
+        if not texts:
+            return []
+        if not self.maxsize:
+            return list(predict_fn(texts))
+
+        keys = [cache_key(t) for t in texts]
+        results = [None] * len(texts)
+        pending = {}
+        with self._lock:
+            if generation is None:
+                generation = self._generation
+            data = self._data
+            for i, key in enumerate(keys):
+                intent = data.get(key)
+                if intent is not None:
+                    results[i] = intent
+                    if self.eviction == "lru":
+                        data.move_to_end(key)
+                else:
+                    pending.setdefault(key, []).append(i)
+            # Repeats of a line missed in this same call count as hits
+            self.stats["hits"] += len(texts) - len(pending)
+            self.stats["misses"] += len(pending)
+
+        if not pending:
+            return results
+
+        batch = [texts[idx[0]] for idx in pending.values()]
+        predicted = predict_fn(batch)
+        for indices, intent in zip(pending.values(), predicted):
+            for i in indices:
+                results[i] = intent
+
+        with self._lock:
+            if generation == self._generation:
+                for key, intent in zip(pending, predicted):
+                    self._data[key] = intent
+                evicted = 0
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+                    evicted += 1
+                self.stats["evictions"] += evicted
+        return results
+
+    def clear(self):
+        """
+        Drops every entry (after the intent model is reloaded). Returns the
+        new generation; only predictions made for it are stored from now on.
+        """
+        with self._lock:
+            self._data.clear()
+            self._generation += 1
+            self.stats["invalidations"] += 1
+            return self._generation
+
+    def __len__(self):
+        return len(self._data)
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["size"] = len(self._data)
+        stats["maxsize"] = self.maxsize
+        stats["eviction"] = self.eviction
+        return stats
@@ -0,0 +1,1148 @@
+import argparse
+import calendar
+import csv
+import glob
+import heapq
+import json
+import mmap
+import os
+import re
+import shutil
+import sys
+import time
+import weakref
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from ai.correlation import template_key
+from ai.matcher import LOG_MATCHER, severity_of
+from realtime.native import queue, threading
+
+# --- SENTINELX LOG ARCHIVE ---
+# Columnar store for analyzed log lines. Rows are sealed into immutable
+# chunks under time partitions (one directory per ARCHIVE_PARTITION_SEC).
+# Each chunk keeps narrow, memory-mapped columns (timestamp offsets, level,
+# dictionary-coded component and template, risk, anomaly flag),
+# zlib-compressed message blocks, template postings and a meta.json with
+# its zone map (time/risk min-max, per-level/component/template counts).
+# Queries prune chunks on the zone maps and the token index, answer fully
+# covered chunks from metadata alone and scan the rest with numpy.
+
+ARCHIVE_ENABLED = os.getenv("ARCHIVE_ENABLED", "1") == "1"
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", os.path.join(os.path.dirname(__file__), '..', 'data', 'archive'))
+ARCHIVE_CHUNK_ROWS = int(os.getenv("ARCHIVE_CHUNK_ROWS", 65536))
+ARCHIVE_BLOCK_ROWS = int(os.getenv("ARCHIVE_BLOCK_ROWS", 4096))
+ARCHIVE_PARTITION_SEC = int(os.getenv("ARCHIVE_PARTITION_SEC", 3600))
+# Live buffers older than this are sealed even when not full
+ARCHIVE_FLUSH_SEC = float(os.getenv("ARCHIVE_FLUSH_SEC", 60))
+ARCHIVE_COMPRESS_LEVEL = int(os.getenv("ARCHIVE_COMPRESS_LEVEL", 1))
+ARCHIVE_MAX_MESSAGE = int(os.getenv("ARCHIVE_MAX_MESSAGE", 4096))
+# Buffers waiting for the background sealer before writers block
+ARCHIVE_SEAL_QUEUE = int(os.getenv("ARCHIVE_SEAL_QUEUE", 8))
+# Oldest partitions are dropped beyond this size (0 keeps everything)
+ARCHIVE_MAX_BYTES = int(float(os.getenv("ARCHIVE_MAX_GB", 10)) * (1 << 30))
+# Chunks whose columns stay mapped (each holds a few file descriptors)
+ARCHIVE_OPEN_CHUNKS = int(os.getenv("ARCHIVE_OPEN_CHUNKS", 64))
+ARCHIVE_REFRESH_SEC = float(os.getenv("ARCHIVE_REFRESH_SEC", 2))
+ARCHIVE_MAX_ROWS = int(os.getenv("ARCHIVE_MAX_ROWS", 1000))
+ARCHIVE_MAX_GROUPS = int(os.getenv("ARCHIVE_MAX_GROUPS", 10000))
+
+FORMAT_VERSION = 1
+LEVELS = ("DEBUG", "INFO", "WARN", "ERROR", "CRITICAL")
+LEVEL_CODES = {name: code for code, name in enumerate(LEVELS)}
+LEVEL_ALIASES = {"TRACE": "DEBUG", "NOTICE": "INFO", "WARNING": "WARN", "ERR": "ERROR", "SEVERE": "ERROR",
+                 "FATAL": "CRITICAL", "CRIT": "CRITICAL", "ALERT": "CRITICAL", "EMERG": "CRITICAL"}
+GROUP_BY = ("level", "component", "template", "source", "time")
+QUERY_KEYS = ("start", "end", "levels", "components", "sources", "templates", "tokens", "min_risk", "max_risk",
+              "anomaly", "group_by", "interval", "top", "limit", "order")
+ORDERS = ("time", "risk")
+# Row order key: risk above the millisecond timestamp
+_RISK_SHIFT = 42
+
+_ISO_TS = re.compile(r'(\d{4})-(\d{2})-(\d{2})[T ](\d{2}):(\d{2}):(\d{2})(?:[.,](\d{1,6}))?')
+_TOKEN = re.compile(r'[a-z][a-z_\-]+')
+
+def level_code(name):
+    """
+    Maps a level name (any case, common aliases) to its code; None when
+    unknown.
+    """
+    name = str(name or '').strip().upper()
+    return LEVEL_CODES.get(LEVEL_ALIASES.get(name, name))
+
+def template_id(text):
+    """
+    Stable 32-bit id of a template text (the same in every chunk).
+    """
+    return zlib.crc32(text.encode('utf-8', 'replace'))
+
+def template_tokens(text):
+    """
+    Indexed words of a template. Variable fields are already masked, so
+    ids, IPs and counters are never indexed.
+    """
+    return set(_TOKEN.findall(text))
+
+def to_ms(value):
+    """
+    Epoch milliseconds from epoch seconds (int/float) or an ISO-8601
+    string; None when it cannot be read.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value * 1000)
+    m = _ISO_TS.search(str(value))
+    if m is None:
+        return None
+    return _iso_ms(m)
+
+def _iso_ms(m):
+    y, mo, d, h, mi, s, frac = m.groups()
+    try:
+        seconds = calendar.timegm((int(y), int(mo), int(d), int(h), int(mi), int(s)))
+    except (ValueError, OverflowError):
+        return None
+    return seconds * 1000 + (int(frac.ljust(3, '0')[:3]) if frac else 0)
+
+def line_ms(message, default):
+    """
+    Timestamp of a log line: an ISO-8601 stamp near its start, else
+    `default` (ingest time).
+    """
+    m = _ISO_TS.search(message, 0, 64)
+    if m is None:
+        return default
+    ms = _iso_ms(m)
+    return default if ms is None else ms
+
+def _code_dtype(n):
+    return np.uint16 if n <= 0xFFFF else np.uint32
+
+def _cross_counts(codes, size, levels, weights=None):
+    cells = np.bincount(codes * len(LEVELS) + levels, weights, minlength=size * len(LEVELS))
+    return cells.astype(np.int64).reshape(size, len(LEVELS))
+
+def _dir_bytes(path):
+    return sum(e.stat().st_size for e in os.scandir(path) if e.is_file())
+
+# =========================================================================
+# Writing
+# =========================================================================
+class _Buffer:
+    __slots__ = ("messages", "levels", "components", "risks", "anomalies", "timestamps", "started")
+
+    def __init__(self):
+        self.messages = []
+        self.levels = []
+        self.components = []
+        self.risks = []
+        self.anomalies = []
+        self.timestamps = []
+        self.started = time.monotonic()
+
+    def __len__(self):
+        return len(self.messages)
+
+class ArchiveWriter:
+    """
+    Buffers rows and seals them into chunks of `chunk_rows`.
+
+    Args:
+        root (str): Archive directory.
+        source (str): Name stored with every chunk (upload filename,
+            "live", vault dataset).
+        background (bool): Seal on the shared background thread instead of
+            in the caller; `flush` still waits for it.
+        on_seal (callable): on_seal(chunk_path) after a chunk is in place.
+    """
+    def __init__(self, root=ARCHIVE_DIR, source="live", chunk_rows=ARCHIVE_CHUNK_ROWS, background=False,
+                 on_seal=None, partition_sec=ARCHIVE_PARTITION_SEC):
+        self.root = root
+        self.source = str(source or "unknown")
+        self.chunk_rows = max(1, chunk_rows)
+        self.background = background
+        self.on_seal = on_seal
+        self.partition_ms = max(1, partition_sec) * 1000
+        self._buffer = _Buffer()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._sealed = threading.Condition(self._lock)
+        self.stats = {"rows": 0, "chunks": 0, "bytes": 0, "seal_ms_total": 0.0, "errors": 0}
+        if background:
+            _sealer.register(self)
+
+    def append(self, message, level="INFO", component="", risk=0, anomaly=False, timestamp=None):
+        self.append_many([message], [level], [component], [risk], [anomaly], [timestamp])
+
+    def append_many(self, messages, levels, components, risks=None, anomalies=None, timestamps=None):
+        """
+        Adds rows. `levels` are names (unknown ones count as INFO);
+        `timestamps` entries may be None (read from the line, else now),
+        epoch seconds or ISO strings.
+        """
+        n = len(messages)
+        if not n:
+            return
+        full = []
+        with self._lock:
+            buf = self._buffer
+            if not len(buf):
+                buf.started = time.monotonic()
+            buf.messages.extend(messages)
+            buf.levels.extend(levels)
+            buf.components.extend(components)
+            buf.risks.extend(risks if risks is not None else [0] * n)
+            buf.anomalies.extend(anomalies if anomalies is not None else [False] * n)
+            buf.timestamps.extend(timestamps if timestamps is not None else [None] * n)
+            while len(self._buffer) >= self.chunk_rows:
+                full.append(self._take(self.chunk_rows))
+        for part in full:
+            self._dispatch(part)
+
+    def _take(self, rows=None):
+        # Caller holds the lock
+        buf = self._buffer
+        if rows is None or rows >= len(buf):
+            self._buffer = _Buffer()
+            part = buf
+        else:
+            part = _Buffer()
+            for name in _Buffer.__slots__[:-1]:
+                column = getattr(buf, name)
+                setattr(part, name, column[:rows])
+                del column[:rows]
+        self._pending += 1
+        return part
+
+    def _dispatch(self, part):
+        if self.background:
+            _sealer.submit(self, part)
+        else:
+            self._seal(part)
+
+    def flush(self, wait=True):
+        """
+        Seals whatever is buffered. With wait, returns once every chunk of
+        this writer is on disk.
+        """
+        with self._lock:
+            part = self._take() if len(self._buffer) else None
+        if part is not None:
+            self._dispatch(part)
+        if wait:
+            with self._sealed:
+                while self._pending:
+                    self._sealed.wait()
+
+    def flush_if_older(self, seconds):
+        """
+        Seals a partial buffer once its first row is `seconds` old. Runs on
+        the sealer thread, so it seals in place.
+        """
+        with self._lock:
+            if not len(self._buffer) or time.monotonic() - self._buffer.started < seconds:
+                return
+            part = self._take()
+        self._seal(part)
+
+    def _seal(self, part):
+        started = time.perf_counter()
+        try:
+            for path in self._write(part):
+                if self.on_seal is not None:
+                    self.on_seal(path)
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"[ARCHIVE] Failed to seal {len(part)} rows from {self.source}: {e}", file=sys.stderr)
+        finally:
+            self.stats["seal_ms_total"] += (time.perf_counter() - started) * 1000
+            with self._sealed:
+                self._pending -= 1
+                self._sealed.notify_all()
+
+    def _write(self, part):
+        """
+        Writes one buffer as one chunk per time partition it spans.
+        """
+        n = len(part)
+        now = int(time.time() * 1000)
+        ts = np.fromiter((line_ms(m, now) if t is None else (to_ms(t) or now)
+                          for m, t in zip(part.messages, part.timestamps)), dtype=np.int64, count=n)
+        partitions = ts // self.partition_ms
+        if partitions.min() == partitions.max():
+            return [self._write_chunk(part, ts, None, int(partitions[0]))]
+        return [self._write_chunk(part, ts, np.flatnonzero(partitions == p), int(p))
+                for p in np.unique(partitions)]
+
+    def _write_chunk(self, part, ts, rows, partition):
+        pick = (lambda values: values) if rows is None else (lambda values: [values[i] for i in rows])
+        messages = [str(m)[:ARCHIVE_MAX_MESSAGE] for m in pick(part.messages)]
+        messages = [m if '\n' not in m else m.replace('\n', ' ') for m in messages]
+        ts = ts if rows is None else ts[rows]
+        n = len(messages)
+
+        level_names = pick(part.levels)
+        lut = {name: level_code(name) for name in set(level_names)}
+        levels = np.fromiter((LEVEL_CODES["INFO"] if lut[name] is None else lut[name] for name in level_names),
+                             dtype=np.uint8, count=n)
+        component_codes = {}
+        component_col = np.fromiter((component_codes.setdefault(str(c), len(component_codes))
+                                     for c in pick(part.components)), dtype=np.int64, count=n)
+        components = list(component_codes)
+        template_codes = {}
+        template_col = np.fromiter((template_codes.setdefault(template_key(m), len(template_codes))
+                                    for m in messages), dtype=np.int64, count=n)
+        templates = list(template_codes)
+        risks = np.clip(np.fromiter((int(r or 0) for r in pick(part.risks)), dtype=np.int64, count=n), 0, 255)
+        anomalies = np.fromiter((bool(a) for a in pick(part.anomalies)), dtype=bool, count=n)
+
+        ts_min, ts_max = int(ts.min()), int(ts.max())
+        span = ts_max - ts_min
+        columns = {
+            "ts": (ts - ts_min).astype(np.uint32 if span <= 0xFFFFFFFF else np.int64),
+            "level": levels,
+            "component": component_col.astype(_code_dtype(len(components))),
+            "template": template_col.astype(_code_dtype(len(templates))),
+            "risk": risks.astype(np.uint8),
+            "anomaly": anomalies
+        }
+        # Template postings: rows of each template code, in row order
+        order = np.argsort(template_col, kind='stable')
+        template_counts = np.bincount(template_col, minlength=len(templates))
+        columns["template_rows"] = order.astype(np.uint32)
+        columns["template_offsets"] = np.concatenate(([0], np.cumsum(template_counts))).astype(np.uint32)
+
+        created = int(time.time() * 1000)
+        with _seq_lock:
+            global _seq
+            _seq += 1
+            name = f"{created:013d}-{os.getpid()}-{_seq:06d}"
+        partition_dir = os.path.join(self.root, partition_name(partition, self.partition_ms))
+        os.makedirs(partition_dir, exist_ok=True)
+        tmp = os.path.join(partition_dir, '.' + name)
+        os.makedirs(tmp)
+        try:
+            block_offsets = [0]
+            with open(os.path.join(tmp, 'messages.bin'), 'wb') as f:
+                for start in range(0, n, ARCHIVE_BLOCK_ROWS):
+                    block = zlib.compress('\n'.join(messages[start:start + ARCHIVE_BLOCK_ROWS]).encode('utf-8', 'replace'),
+                                          ARCHIVE_COMPRESS_LEVEL)
+                    f.write(block)
+                    block_offsets.append(block_offsets[-1] + len(block))
+            columns["blocks"] = np.asarray(block_offsets, dtype=np.uint64)
+            # All columns in one file, 8-byte aligned: one mapping per chunk
+            layout = {}
+            with open(os.path.join(tmp, 'columns.bin'), 'wb') as f:
+                for column, values in columns.items():
+                    values = np.ascontiguousarray(values)
+                    layout[column] = [f.tell(), values.dtype.str, int(values.size)]
+                    f.write(values.tobytes())
+                    f.write(b'\0' * (-f.tell() % 8))
+            meta = {
+                "version": FORMAT_VERSION,
+                "id": name,
+                "source": self.source,
+                "rows": n,
+                "created": created,
+                "ts_min": ts_min,
+                "ts_max": ts_max,
+                "risk_min": int(risks.min()),
+                "risk_max": int(risks.max()),
+                "risk_sum": int(risks.sum()),
+                "anomalies": int(anomalies.sum()),
+                "level_counts": np.bincount(levels, minlength=len(LEVELS)).tolist(),
+                "components": components,
+                "templates": templates,
+                "template_ids": [template_id(t) for t in templates],
+                # Rows, risk sums and anomalies per (code, level): totals for
+                # one level filter and one component or template filter
+                # without a scan
+                "component_level_counts": _cross_counts(component_col, len(components), levels).tolist(),
+                "template_level_counts": _cross_counts(template_col, len(templates), levels).tolist(),
+                "component_level_risk": _cross_counts(component_col, len(components), levels, risks).tolist(),
+                "template_level_risk": _cross_counts(template_col, len(templates), levels, risks).tolist(),
+                "component_level_anomalies": _cross_counts(component_col, len(components), levels,
+                                                           anomalies).tolist(),
+                "template_level_anomalies": _cross_counts(template_col, len(templates), levels, anomalies).tolist(),
+                "block_rows": ARCHIVE_BLOCK_ROWS,
+                "columns": layout
+            }
+            meta["bytes"] = _dir_bytes(tmp)
+            with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+                json.dump(meta, f)
+            meta["bytes"] += os.path.getsize(os.path.join(tmp, 'meta.json'))
+            final = os.path.join(partition_dir, name)
+            os.rename(tmp, final)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        self.stats["rows"] += n
+        self.stats["chunks"] += 1
+        self.stats["bytes"] += meta["bytes"]
+        return final
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats["buffered"] = len(self._buffer)
+        stats["pending_chunks"] = self._pending
+        stats["seal_ms_avg"] = round(stats["seal_ms_total"] / stats["chunks"], 3) if stats["chunks"] else 0.0
+        return stats
+
+_seq = 0
+_seq_lock = threading.Lock()
+
+def partition_name(partition, partition_ms=ARCHIVE_PARTITION_SEC * 1000):
+    return time.strftime('%Y%m%dT%H%M%S', time.gmtime(partition * partition_ms // 1000))
+
+class _Sealer:
+    """
+    One background thread sealing buffers of every background writer, and
+    sealing live buffers older than ARCHIVE_FLUSH_SEC.
+    """
+    def __init__(self):
+        self._queue = queue.Queue(max(1, ARCHIVE_SEAL_QUEUE))
+        self._writers = weakref.WeakSet()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def register(self, writer):
+        self._writers.add(writer)
+
+    def submit(self, writer, part):
+        self._ensure_started()
+        # Blocks when the sealer is behind: writers slow down instead of
+        # buffering without bound
+        self._queue.put((writer, part))
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="archive-sealer", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                writer, part = self._queue.get(timeout=max(0.1, ARCHIVE_FLUSH_SEC / 4))
+            except queue.Empty:
+                for writer in list(self._writers):
+                    writer.flush_if_older(ARCHIVE_FLUSH_SEC)
+                continue
+            try:
+                writer._seal(part)
+            finally:
+                self._queue.task_done()
+
+_sealer = _Sealer()
+
+def drain():
+    """
+    Waits until every buffer handed to the background sealer is on disk.
+    """
+    _sealer._queue.join()
+
+def start_background_flush():
+    """
+    Starts the sealer so partial live buffers are sealed on time even
+    before the first full chunk.
+    """
+    _sealer._ensure_started()
+
+# =========================================================================
+# Reading
+# =========================================================================
+class _Chunk:
+    """
+    Catalog entry of one sealed chunk: its metadata in memory, its columns
+    mapped on first use.
+    """
+    def __init__(self, path, meta):
+        self.path = path
+        self.partition = os.path.basename(os.path.dirname(path))
+        self.id = meta["id"]
+        self.source = meta["source"]
+        self.rows = meta["rows"]
+        self.bytes = meta.get("bytes", 0)
+        self.ts_min = meta["ts_min"]
+        self.ts_max = meta["ts_max"]
+        self.risk_min = meta["risk_min"]
+        self.risk_max = meta["risk_max"]
+        self.risk_sum = meta["risk_sum"]
+        self.anomalies = meta["anomalies"]
+        self.block_rows = meta["block_rows"]
+        self.layout = meta["columns"]
+        levels = len(LEVELS)
+        self.cross = {
+            "component": np.asarray(meta["component_level_counts"], dtype=np.int64).reshape(-1, levels),
+            "template": np.asarray(meta["template_level_counts"], dtype=np.int64).reshape(-1, levels)
+        }
+        # Chunks sealed before these were kept are scanned for filtered totals
+        self.cross_risk = self.cross_anomalies = None
+        if "component_level_risk" in meta:
+            self.cross_risk, self.cross_anomalies = (
+                {dim: np.asarray(meta[f"{dim}_level_{kind}"], dtype=np.int64).reshape(-1, levels)
+                 for dim in ("component", "template")}
+                for kind in ("risk", "anomalies"))
+        self.counts = {
+            "level": np.asarray(meta["level_counts"], dtype=np.int64),
+            "component": self.cross["component"].sum(axis=1),
+            "template": self.cross["template"].sum(axis=1)
+        }
+        self.components = meta["components"]
+        self.component_codes = {name: code for code, name in enumerate(self.components)}
+        self.templates = meta["templates"]
+        self.template_ids = np.asarray(meta["template_ids"], dtype=np.uint32)
+        self.template_codes = {tid: code for code, tid in enumerate(meta["template_ids"])}
+        self._map = None
+        self._columns = {}
+
+    def column(self, name):
+        values = self._columns.get(name)
+        if values is None:
+            if self._map is None:
+                with open(os.path.join(self.path, 'columns.bin'), 'rb') as f:
+                    self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            offset, dtype, count = self.layout[name]
+            values = self._columns[name] = np.frombuffer(self._map, dtype=dtype, count=count, offset=offset)
+        return values
+
+    def close(self):
+        # The mapping is released once no column view refers to it
+        self._columns = {}
+        self._map = None
+
+    def block(self, index):
+        offsets = self.column("blocks")
+        start, end = int(offsets[index]), int(offsets[index + 1])
+        with open(os.path.join(self.path, 'messages.bin'), 'rb') as f:
+            f.seek(start)
+            return zlib.decompress(f.read(end - start)).decode('utf-8', 'replace').split('\n')
+
+    def group_keys(self, dim):
+        if dim == "level":
+            return LEVELS
+        if dim == "component":
+            return self.components
+        return self.template_ids.tolist()
+
+class _Query:
+    """
+    Validated query spec. Raises ValueError on bad input.
+    """
+    def __init__(self, spec, archive):
+        if not isinstance(spec, dict):
+            raise ValueError("Expected a JSON object")
+        unknown = sorted(set(spec) - set(QUERY_KEYS))
+        if unknown:
+            raise ValueError(f"Unknown query keys: {', '.join(map(str, unknown))} "
+                             f"(expected {', '.join(QUERY_KEYS)})")
+        self.start = self._time(spec.get("start"), "start")
+        self.end = self._time(spec.get("end"), "end")
+
+        self.levels = None
+        if spec.get("levels"):
+            codes = [level_code(l) for l in self._list(spec, "levels")]
+            if None in codes:
+                raise ValueError(f"levels must be among {', '.join(LEVELS)}")
+            self.levels = np.zeros(len(LEVELS), dtype=bool)
+            self.levels[codes] = True
+        self.components = set(map(str, self._list(spec, "components"))) or None
+        self.sources = set(map(str, self._list(spec, "sources"))) or None
+
+        # Template ids from explicit templates/ids and from tokens (AND)
+        self.template_ids = None
+        if spec.get("templates"):
+            self.template_ids = {int(t) if isinstance(t, int) else template_id(template_key(t))
+                                 for t in self._list(spec, "templates")}
+        for token in self._list(spec, "tokens"):
+            ids = archive.token_templates(str(token).lower())
+            self.template_ids = ids if self.template_ids is None else self.template_ids & ids
+
+        self.min_risk = self._int(spec, "min_risk")
+        self.max_risk = self._int(spec, "max_risk")
+        anomaly = spec.get("anomaly")
+        if anomaly is not None and not isinstance(anomaly, bool):
+            raise ValueError("anomaly must be true or false")
+        self.anomaly = anomaly
+
+        self.group_by = spec.get("group_by")
+        if isinstance(self.group_by, list):
+            # Groups have a single key: ["level"] is fine, ["level", "source"] is not
+            if len(self.group_by) != 1:
+                raise ValueError(f"group_by takes one dimension, one of {', '.join(GROUP_BY)}")
+            self.group_by = self.group_by[0]
+        if self.group_by is not None and self.group_by not in GROUP_BY:
+            raise ValueError(f"group_by must be one of {', '.join(GROUP_BY)}")
+        self.interval = int(float(spec.get("interval", 3600)) * 1000)
+        if self.interval <= 0:
+            raise ValueError("interval must be positive")
+        self.top = self._int(spec, "top", 20)
+        self.limit = min(self._int(spec, "limit", 0) or 0, ARCHIVE_MAX_ROWS)
+        self.order = spec.get("order", "time")
+        if self.order not in ORDERS:
+            raise ValueError(f"order must be one of {', '.join(ORDERS)}")
+
+    @staticmethod
+    def _time(value, name):
+        if value is None:
+            return None
+        ms = to_ms(value)
+        if ms is None:
+            raise ValueError(f"{name} must be epoch seconds or an ISO-8601 time")
+        return ms
+
+    @staticmethod
+    def _list(spec, name):
+        value = spec.get(name) or []
+        if isinstance(value, (str, int)):
+            value = [value]
+        if not isinstance(value, list):
+            raise ValueError(f"{name} must be a list")
+        return value
+
+    @staticmethod
+    def _int(spec, name, default=None):
+        value = spec.get(name, default)
+        if value is None:
+            return None
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"{name} must be a number")
+        return int(value)
+
+class LogArchive:
+    """
+    Catalog and query engine over an archive directory. Chunks sealed by
+    writers in this process appear at once (`add_chunk`); chunks from
+    other processes within ARCHIVE_REFRESH_SEC.
+    """
+    def __init__(self, root=ARCHIVE_DIR, max_bytes=ARCHIVE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._chunks = {}
+        self._partition_mtimes = {}
+        self._template_text = {}
+        self._token_index = {}
+        self._open = OrderedDict()
+        self._blocks = OrderedDict()
+        self._lock = threading.RLock()
+        self._refreshed = 0.0
+        self.stats = {"queries": 0, "query_ms_total": 0.0, "query_ms_max": 0.0, "dropped_partitions": 0}
+        self.refresh()
+
+    # --- Catalog ---
+    def refresh(self):
+        """
+        Picks up chunks written since the last call (partition mtimes show
+        which directories changed) and forgets deleted ones.
+        """
+        with self._lock:
+            self._refreshed = time.monotonic()
+            seen = set()
+            try:
+                partitions = [e for e in os.scandir(self.root) if e.is_dir() and not e.name.startswith('.')]
+            except FileNotFoundError:
+                partitions = []
+            for entry in partitions:
+                seen.add(entry.name)
+                mtime = entry.stat().st_mtime_ns
+                if self._partition_mtimes.get(entry.name) == mtime:
+                    continue
+                self._partition_mtimes[entry.name] = mtime
+                names = {e.name for e in os.scandir(entry.path) if e.is_dir() and not e.name.startswith('.')}
+                for key in [k for k in self._chunks if k[0] == entry.name and k[1] not in names]:
+                    self._drop(key)
+                for name in names:
+                    if (entry.name, name) not in self._chunks:
+                        self.add_chunk(os.path.join(entry.path, name))
+            for key in [k for k in self._chunks if k[0] not in seen]:
+                self._drop(key)
+            for name in [p for p in self._partition_mtimes if p not in seen]:
+                del self._partition_mtimes[name]
+
+    def _maybe_refresh(self):
+        if time.monotonic() - self._refreshed >= ARCHIVE_REFRESH_SEC:
+            self.refresh()
+
+    def add_chunk(self, path):
+        """
+        Registers a sealed chunk (the on_seal hook of in-process writers).
+        """
+        try:
+            with open(os.path.join(path, 'meta.json')) as f:
+                chunk = _Chunk(path, json.load(f))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[ARCHIVE] Skipping unreadable chunk {path}: {e}", file=sys.stderr)
+            return
+        with self._lock:
+            self._chunks[(chunk.partition, chunk.id)] = chunk
+            for tid, text in zip(chunk.template_ids.tolist(), chunk.templates):
+                if tid not in self._template_text:
+                    self._template_text[tid] = text
+                    for token in template_tokens(text):
+                        self._token_index.setdefault(token, set()).add(tid)
+            if self.max_bytes and self.bytes > self.max_bytes:
+                self._retain()
+
+    def _drop(self, key):
+        chunk = self._chunks.pop(key)
+        self._open.pop(chunk.path, None)
+        chunk.close()
+
+    def _retain(self):
+        # Drops whole partitions, oldest first, until under max_bytes
+        for partition in sorted({k[0] for k in self._chunks}):
+            if self.bytes <= self.max_bytes or len({k[0] for k in self._chunks}) <= 1:
+                break
+            for key in [k for k in self._chunks if k[0] == partition]:
+                self._drop(key)
+            shutil.rmtree(os.path.join(self.root, partition), ignore_errors=True)
+            self._partition_mtimes.pop(partition, None)
+            self.stats["dropped_partitions"] += 1
+            print(f"[ARCHIVE] Retention: dropped partition {partition}", file=sys.stderr)
+
+    @property
+    def rows(self):
+        return sum(c.rows for c in list(self._chunks.values()))
+
+    @property
+    def bytes(self):
+        return sum(c.bytes for c in list(self._chunks.values()))
+
+    def chunks(self):
+        with self._lock:
+            return sorted(self._chunks.values(), key=lambda c: (c.ts_min, c.id))
+
+    def sources(self):
+        return sorted({c.source for c in self.chunks()})
+
+    def token_templates(self, token):
+        return set(self._token_index.get(token, ()))
+
+    def _touch(self, chunk):
+        # Bounds the number of mapped chunks (file descriptors)
+        self._open.pop(chunk.path, None)
+        self._open[chunk.path] = chunk
+        while len(self._open) > ARCHIVE_OPEN_CHUNKS:
+            _, old = self._open.popitem(last=False)
+            old.close()
+        return chunk
+
+    # --- Reading rows ---
+    def message(self, chunk, row):
+        index = row // chunk.block_rows
+        key = (chunk.path, index)
+        with self._lock:
+            block = self._blocks.pop(key, None)
+        if block is None:
+            block = chunk.block(index)
+        with self._lock:
+            self._blocks[key] = block
+            while len(self._blocks) > 32:
+                self._blocks.popitem(last=False)
+        return block[row % chunk.block_rows]
+
+    def iter_messages(self, source=None, max_rows=0):
+        """
+        Streams archived messages (optionally of one source) block by
+        block, oldest chunk first.
+
+        Yields:
+            list: Up to ARCHIVE_BLOCK_ROWS messages.
+        """
+        remaining = max_rows or None
+        for chunk in self.chunks():
+            if source is not None and chunk.source != source:
+                continue
+            blocks = (chunk.rows + chunk.block_rows - 1) // chunk.block_rows
+            for index in range(blocks):
+                messages = chunk.block(index)
+                if remaining is not None:
+                    messages = messages[:remaining]
+                    remaining -= len(messages)
+                yield messages
+                if remaining == 0:
+                    return
+
+    def _row(self, chunk, row):
+        ts = chunk.ts_min + int(chunk.column("ts")[row])
+        tid = int(chunk.template_ids[chunk.column("template")[row]])
+        return {
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(ts // 1000)) + f".{ts % 1000:03d}Z",
+            "level": LEVELS[chunk.column("level")[row]],
+            "component": chunk.components[chunk.column("component")[row]],
+            "source": chunk.source,
+            "template_id": tid,
+            "template": self._template_text.get(tid),
+            "risk": int(chunk.column("risk")[row]),
+            "anomaly": bool(chunk.column("anomaly")[row]),
+            "message": self.message(chunk, row)
+        }
+
+    # --- Query ---
+    def query(self, spec):
+        """
+        Filters, aggregates and ranks archived rows.
+
+        Args:
+            spec (dict): Filters `start`/`end` (epoch seconds or ISO),
+                `levels`, `components`, `sources`, `templates` (ids or
+                texts), `tokens` (all must occur in the template),
+                `min_risk`/`max_risk`, `anomaly`; `group_by` (level,
+                component, template, source, time with `interval` seconds)
+                and `top` groups; `limit` rows ranked by `order` (time or
+                risk, highest first). Other keys raise ValueError.
+
+        Returns:
+            dict: matched, risk stats, groups, rows and how many chunks
+            were pruned, answered from metadata or scanned.
+        """
+        started = time.perf_counter()
+        self._maybe_refresh()
+        q = _Query(spec, self)
+        chunks = self.chunks()
+        result = _Result(q)
+        stats = {"total": len(chunks), "pruned": 0, "metadata": 0, "scanned": 0}
+
+        # Rows are ranked highest first, so visit the chunks that can hold
+        # the best rows first and skip the rest once the heap is full
+        if q.limit:
+            if q.order == "risk":
+                chunks.sort(key=lambda c: (c.risk_max, c.ts_max), reverse=True)
+            else:
+                chunks.sort(key=lambda c: c.ts_max, reverse=True)
+
+        for chunk in chunks:
+            plan = self._plan(chunk, q)
+            if plan is None:
+                stats["pruned"] += 1
+                continue
+            if self._from_metadata(chunk, q, plan, result):
+                stats["metadata"] += 1
+                continue
+            stats["scanned"] += 1
+            with self._lock:
+                self._touch(chunk)
+            self._scan(chunk, q, plan, result)
+
+        rows = [self._row(chunk, row) for _, _, chunk, row in sorted(result.heap, reverse=True)]
+        elapsed = (time.perf_counter() - started) * 1000
+        self.stats["queries"] += 1
+        self.stats["query_ms_total"] += elapsed
+        self.stats["query_ms_max"] = max(self.stats["query_ms_max"], round(elapsed, 3))
+        return {
+            "matched": result.matched,
+            "risk_avg": round(result.risk_sum / result.matched, 2) if result.matched else None,
+            "anomalies": result.anomalies,
+            "groups": result.groups(self),
+            "rows": rows,
+            "chunks": stats,
+            "took_ms": round(elapsed, 3)
+        }
+
+    def _plan(self, chunk, q):
+        """
+        Zone-map check. Returns None when the chunk cannot match, else the
+        row filters still needed: {dim: selector} (empty = every row).
+        """
+        plan = {}
+        if q.sources is not None and chunk.source not in q.sources:
+            return None
+        if q.start is not None or q.end is not None:
+            lo = q.start if q.start is not None else chunk.ts_min
+            hi = q.end if q.end is not None else chunk.ts_max + 1
+            if chunk.ts_max < lo or chunk.ts_min >= hi:
+                return None
+            if not (lo <= chunk.ts_min and chunk.ts_max < hi):
+                plan["ts"] = (lo - chunk.ts_min, hi - chunk.ts_min)
+        if q.min_risk is not None or q.max_risk is not None:
+            lo = q.min_risk if q.min_risk is not None else 0
+            hi = q.max_risk if q.max_risk is not None else 255
+            if chunk.risk_max < lo or chunk.risk_min > hi:
+                return None
+            if not (lo <= chunk.risk_min and chunk.risk_max <= hi):
+                plan["risk"] = (lo, hi)
+        if q.anomaly is not None:
+            if chunk.anomalies == (0 if q.anomaly else chunk.rows):
+                return None
+            if chunk.anomalies != (chunk.rows if q.anomaly else 0):
+                plan["anomaly"] = q.anomaly
+        for dim, selected in (("level", self._level_codes(chunk, q)),
+                              ("component", self._component_codes(chunk, q)),
+                              ("template", self._template_codes(chunk, q))):
+            if selected is None:
+                continue
+            present = chunk.counts[dim] > 0
+            hit = selected & present
+            if not hit.any():
+                return None
+            if (hit != present).any():
+                plan[dim] = hit
+        return plan
+
+    @staticmethod
+    def _level_codes(chunk, q):
+        return q.levels
+
+    @staticmethod
+    def _component_codes(chunk, q):
+        if q.components is None:
+            return None
+        selected = np.zeros(len(chunk.components), dtype=bool)
+        for name in q.components:
+            code = chunk.component_codes.get(name)
+            if code is not None:
+                selected[code] = True
+        return selected
+
+    @staticmethod
+    def _template_codes(chunk, q):
+        if q.template_ids is None:
+            return None
+        selected = np.zeros(len(chunk.templates), dtype=bool)
+        if len(q.template_ids) < len(chunk.templates):
+            codes = [chunk.template_codes[t] for t in q.template_ids if t in chunk.template_codes]
+        else:
+            codes = [code for t, code in chunk.template_codes.items() if t in q.template_ids]
+        selected[codes] = True
+        return selected
+
+    def _from_metadata(self, chunk, q, plan, result):
+        """
+        Answers a chunk from its (code, level) counts when only a level
+        filter and one component or template filter remain and the
+        grouping needs no other column. Rows are only read when they could
+        still make the top `limit`.
+        """
+        if q.limit and result.wants(q.order, chunk):
+            return False
+        dims = set(plan)
+        if dims - {"level", "component", "template"} or {"component", "template"} <= dims:
+            return False
+        if dims and chunk.cross_risk is None:
+            return False
+        group_by = q.group_by
+        if group_by == "time" and (chunk.ts_min // q.interval != chunk.ts_max // q.interval):
+            return False
+        coded = "component" if "component" in dims else "template" if "template" in dims else None
+        if group_by in ("component", "template") and coded not in (None, group_by):
+            return False
+
+        base = coded or (group_by if group_by in ("component", "template") else "component")
+        selected = np.ones(chunk.cross[base].shape, dtype=bool)
+        if coded is not None:
+            selected &= plan[coded][:, None]
+        if "level" in dims:
+            selected &= plan["level"][None, :]
+        counts = chunk.cross[base] * selected
+        matched = int(counts.sum())
+        result.matched += matched
+        if dims:
+            result.risk_sum += int((chunk.cross_risk[base] * selected).sum())
+            result.anomalies += int((chunk.cross_anomalies[base] * selected).sum())
+        else:
+            result.risk_sum += chunk.risk_sum
+            result.anomalies += chunk.anomalies
+        if group_by == "level":
+            result.add_counts("level", chunk, counts.sum(axis=0))
+        elif group_by in ("component", "template"):
+            result.add_counts(group_by, chunk, counts.sum(axis=1))
+        elif group_by == "source":
+            result.add(chunk.source, matched)
+        elif group_by == "time":
+            result.add(chunk.ts_min // q.interval * q.interval, matched)
+        return True
+
+    def _scan(self, chunk, q, plan, result):
+        # Template postings narrow the rows before any column is read
+        rows = None
+        if "template" in plan:
+            offsets = chunk.column("template_offsets")
+            postings = chunk.column("template_rows")
+            codes = np.flatnonzero(plan["template"])
+            rows = np.sort(np.concatenate([postings[offsets[c]:offsets[c + 1]] for c in codes]))
+
+        def col(name):
+            values = chunk.column(name)
+            return values if rows is None else values[rows]
+
+        mask = None
+        def both(cond):
+            return cond if mask is None else mask & cond
+        if "ts" in plan:
+            lo, hi = plan["ts"]
+            ts = col("ts").astype(np.int64)
+            mask = both((ts >= lo) & (ts < hi))
+        if "risk" in plan:
+            lo, hi = plan["risk"]
+            risk = col("risk")
+            mask = both((risk >= lo) & (risk <= hi))
+        if "anomaly" in plan:
+            anomaly = col("anomaly")
+            mask = both(anomaly if plan["anomaly"] else ~anomaly)
+        for dim in ("level", "component"):
+            if dim in plan:
+                mask = both(plan[dim][col(dim)])
+
+        if rows is None:
+            rows = np.flatnonzero(mask) if mask is not None else None
+        elif mask is not None:
+            rows = rows[mask]
+        matched = chunk.rows if rows is None else int(rows.size)
+        if not matched:
+            return
+        result.matched += matched
+        risk = col("risk")
+        result.risk_sum += int(risk.sum(dtype=np.int64))
+        result.anomalies += int(np.count_nonzero(col("anomaly")))
+
+        group_by = q.group_by
+        if group_by in ("level", "component", "template"):
+            size = len(chunk.group_keys(group_by)) if group_by != "level" else len(LEVELS)
+            result.add_counts(group_by, chunk, np.bincount(col(group_by), minlength=size))
+        elif group_by == "source":
+            result.add(chunk.source, matched)
+        elif group_by == "time":
+            first = chunk.ts_min // q.interval
+            counts = np.bincount((col("ts").astype(np.int64) + chunk.ts_min) // q.interval - first)
+            for k in np.flatnonzero(counts).tolist():
+                result.add((first + k) * q.interval, int(counts[k]))
+
+        if q.limit and result.wants(q.order, chunk):
+            keys = col("ts").astype(np.int64) + chunk.ts_min
+            if q.order == "risk":
+                keys |= risk.astype(np.int64) << _RISK_SHIFT
+            if keys.size > q.limit:
+                best = np.argpartition(keys, keys.size - q.limit)[keys.size - q.limit:]
+            else:
+                best = np.arange(keys.size)
+            for i in best.tolist():
+                result.push(int(keys[i]), chunk, i if rows is None else int(rows[i]))
+
+    def get_stats(self):
+        chunks = self.chunks()
+        stats = dict(self.stats)
+        stats["query_ms_avg"] = round(stats["query_ms_total"] / stats["queries"], 3) if stats["queries"] else 0.0
+        stats["chunks"] = len(chunks)
+        stats["rows"] = sum(c.rows for c in chunks)
+        stats["bytes"] = sum(c.bytes for c in chunks)
+        stats["partitions"] = len({c.partition for c in chunks})
+        stats["sources"] = len({c.source for c in chunks})
+        stats["templates"] = len(self._template_text)
+        stats["open_chunks"] = len(self._open)
+        stats["oldest"] = chunks[0].ts_min if chunks else None
+        stats["newest"] = max(c.ts_max for c in chunks) if chunks else None
+        return stats
+
+class _Result:
+    """
+    Accumulates one query: match count, risk totals, group counts and a
+    min-heap of the `limit` best row keys.
+    """
+    def __init__(self, q):
+        self.q = q
+        self.matched = 0
+        self.risk_sum = 0
+        self.anomalies = 0
+        self.counts = {}
+        self.heap = []
+        self._tie = 0
+
+    def add(self, key, count):
+        if count:
+            self.counts[key] = self.counts.get(key, 0) + count
+
+    def add_counts(self, dim, chunk, counts):
+        keys = chunk.group_keys(dim)
+        for code in np.flatnonzero(counts).tolist():
+            self.add(keys[code], int(counts[code]))
+
+    def wants(self, order, chunk):
+        """
+        True when a row of `chunk` could still enter the top `limit`.
+        """
+        if len(self.heap) < self.q.limit:
+            return True
+        bound = chunk.ts_max
+        if order == "risk":
+            bound |= chunk.risk_max << _RISK_SHIFT
+        return bound > self.heap[0][0]
+
+    def push(self, key, chunk, row):
+        self._tie += 1
+        item = (key, self._tie, chunk, row)
+        if len(self.heap) < self.q.limit:
+            heapq.heappush(self.heap, item)
+        elif key > self.heap[0][0]:
+            heapq.heapreplace(self.heap, item)
+
+    def groups(self, archive):
+        q = self.q
+        if q.group_by is None:
+            return None
+        if q.group_by == "time":
+            items = sorted(self.counts.items())[-ARCHIVE_MAX_GROUPS:]
+            return [{"key": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(k // 1000)), "count": n} for k, n in items]
+        items = heapq.nlargest(q.top or len(self.counts), self.counts.items(), key=lambda kv: kv[1])
+        if q.group_by == "template":
+            return [{"key": archive._template_text.get(k), "template_id": k, "count": n} for k, n in items]
+        return [{"key": k, "count": n} for k, n in items]
+
+# =========================================================================
+# Import / command line
+# =========================================================================
+VAULT_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'training_vault')
+
+def import_vault(root=ARCHIVE_DIR, vault_dir=VAULT_DIR):
+    """
+    Loads every vault CSV into the archive, one source per dataset. The
+    CSV level is kept when it is a known level; otherwise the matcher's
+    severity is used, as for uploads.
+
+    Returns:
+        dict: {dataset: rows}
+    """
+    imported = {}
+    for path in sorted(glob.glob(os.path.join(vault_dir, '*_2k.log_structured.csv'))):
+        name = os.path.basename(path).split('_')[0]
+        writer = ArchiveWriter(root, source=name)
+        with open(path, newline='', encoding='utf-8', errors='ignore') as f:
+            for row in csv.DictReader(f):
+                message = row.get('Content') or row.get('Message')
+                if not message:
+                    continue
+                level = row.get('Level')
+                if level_code(level) is None:
+                    level = severity_of(LOG_MATCHER.mask(message.lower()))
+                writer.append(message, level, row.get('Component') or name)
+        writer.flush()
+        imported[name] = writer.stats["rows"]
+    return imported
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SentinelX log archive")
+    parser.add_argument("--dir", default=ARCHIVE_DIR, help="Archive directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("import-vault", help="Load the training vault CSVs")
+    query = sub.add_parser("query", help="Run a JSON query spec")
+    query.add_argument("spec", help='e.g. \'{"levels": ["ERROR"], "group_by": "component"}\'')
+    sub.add_parser("stats", help="Catalog summary")
+    args = parser.parse_args(argv)
+
+    if args.command == "import-vault":
+        started = time.perf_counter()
+        imported = import_vault(args.dir)
+        print(json.dumps({"imported": imported, "rows": sum(imported.values()),
+                          "elapsed_sec": round(time.perf_counter() - started, 3)}, indent=2))
+    elif args.command == "query":
+        print(json.dumps(LogArchive(args.dir).query(json.loads(args.spec)), indent=2))
+    else:
+        print(json.dumps(LogArchive(args.dir).get_stats(), indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+import bisect
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from realtime.native import threading
+
+# --- SENTINELX METRICS ---
+# Per-stage latency histograms for the scoring hot path, rendered with the
+# service's other counters (caches, queues, model loads) in the Prometheus
+# text format on /metrics. Stages are timed per call or per chunk, never
+# per line, so the cost is a couple of perf_counter() reads per batch.
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+# Seconds; stages range from microsecond matcher passes to multi-second LLM calls
+BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+           0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+STAGES = ("decode", "pattern_match", "severity_scan", "template_mine", "tfidf_transform",
+          "nb_predict", "anomaly_predict", "llm_call", "socket_emit")
+
+class _Series:
+    __slots__ = ("buckets", "sum", "count", "items")
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.items = 0
+
+class StageHistograms:
+    """
+    One latency histogram (plus an items counter) per stage.
+    """
+    def __init__(self):
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds, items=1):
+        with self._lock:
+            series = self._series.get(stage)
+            if series is None:
+                series = self._series[stage] = _Series()
+            series.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+            series.sum += seconds
+            series.count += 1
+            series.items += items
+
+    def snapshot(self):
+        with self._lock:
+            return {stage: (list(s.buckets), s.sum, s.count, s.items) for stage, s in self._series.items()}
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+stages = StageHistograms()
+_collectors = []
+
+def observe(stage, seconds, items=1):
+    """
+    Records one timed pass of `stage` that handled `items` units.
+    """
+    if METRICS_ENABLED:
+        stages.observe(stage, seconds, items)
+
+@contextmanager
+def timed(stage, items=1):
+    if not METRICS_ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stages.observe(stage, time.perf_counter() - started, items)
+
+def register_collector(fn):
+    """
+    Adds a scrape-time source of samples.
+
+    Args:
+        fn (callable): Returns a list of (name, type, help, samples) where
+            samples is a list of (labels dict, value).
+    """
+    _collectors.append(fn)
+    return fn
+
+def _labels(labels):
+    if not labels:
+        return ""
+    body = ",".join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+                    for k, v in labels.items())
+    return "{" + body + "}"
+
+def _value(v):
+    if isinstance(v, bool):
+        return "1" if v else "0"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+def render():
+    """
+    Returns every metric in the Prometheus text exposition format.
+    """
+    out = []
+    snapshot = stages.snapshot()
+    out.append("# HELP sentinelx_stage_seconds Time spent per pass of a scoring stage.")
+    out.append("# TYPE sentinelx_stage_seconds histogram")
+    for stage in sorted(snapshot):
+        buckets, total, count, _ = snapshot[stage]
+        cumulative = 0
+        for bound, n in zip(BUCKETS, buckets):
+            cumulative += n
+            out.append(f'sentinelx_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+        out.append(f'sentinelx_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {count}')
+        out.append(f'sentinelx_stage_seconds_sum{{stage="{stage}"}} {total!r}')
+        out.append(f'sentinelx_stage_seconds_count{{stage="{stage}"}} {count}')
+    out.append("# HELP sentinelx_stage_items_total Lines or events handled per stage.")
+    out.append("# TYPE sentinelx_stage_items_total counter")
+    for stage in sorted(snapshot):
+        out.append(f'sentinelx_stage_items_total{{stage="{stage}"}} {snapshot[stage][3]}')
+
+    for collect in _collectors:
+        try:
+            families = collect()
+        except Exception as e:
+            print(f"[METRICS] Collector error: {e}")
+            continue
+        for name, kind, help_text, samples in families:
+            samples = [(labels, v) for labels, v in samples if v is not None]
+            if not samples:
+                continue
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+            for labels, v in samples:
+                out.append(f"{name}{_labels(labels)} {_value(v)}")
+    return "\n".join(out) + "\n"
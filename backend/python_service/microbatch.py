@@ -0,0 +1,131 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from realtime.native import queue, threading
+
+# --- SENTINELX MICRO-BATCHER ---
+# Coalesces concurrent single-item calls into one vectorized call. Callers
+# block on submit(); a background drainer collects items for at most
+# `max_wait_ms` (or until `max_batch` items) and fans the results back out.
+
+class _Slot:
+    __slots__ = ("item", "event", "result", "error")
+
+    def __init__(self, item):
+        self.item = item
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+class MicroBatcher:
+    """
+    Args:
+        fn (callable): Takes a list of items, returns a list of results in
+            the same order.
+        max_batch (int): Flush as soon as this many items are queued.
+        max_wait_ms (float): Longest time the first item of a batch waits
+            for company.
+        name (str): Label used in logs.
+        on_wait (callable): Called after every batch with its items' mean
+            queue wait, in seconds.
+    """
+    # Power-of-two upper bounds for the batch-size histogram
+    BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+    def __init__(self, fn, max_batch=64, max_wait_ms=3.0, name="batcher", on_wait=None):
+        self.fn = fn
+        self.on_wait = on_wait
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "batches": 0,
+            "items": 0,
+            "max_batch_seen": 0,
+            "errors": 0,
+            "size_histogram": dict({str(b): 0 for b in self.BUCKETS}, **{"+Inf": 0}),
+            "queue_wait_ms_total": 0.0
+        }
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                    self._thread.start()
+
+    def submit(self, item, timeout=None):
+        """
+        Queues one item and blocks until its batch has been processed.
+        """
+        self._ensure_started()
+        slot = _Slot(item)
+        self._queue.put((time.monotonic(), slot))
+        if not slot.event.wait(timeout):
+            raise TimeoutError(f"{self.name}: batch result not ready after {timeout}s")
+        if slot.error is not None:
+            raise slot.error
+        return slot.result
+
+    def _collect(self):
+        first = self._queue.get()
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.monotonic()
+            slots = [slot for _, slot in batch]
+            try:
+                results = self.fn([slot.item for slot in slots])
+                for slot, result in zip(slots, results):
+                    slot.result = result
+            except Exception as e:
+                print(f"[BATCH] {self.name} failed on {len(slots)} items: {e}")
+                for slot in slots:
+                    slot.error = e
+            for slot in slots:
+                slot.event.set()
+            wait_total = sum(started - queued for queued, _ in batch)
+            self._record(len(slots), wait_total, slots)
+            if self.on_wait is not None:
+                self.on_wait(wait_total / len(slots))
+
+    def _record(self, size, wait_total, slots):
+        with self._stats_lock:
+            self.stats["batches"] += 1
+            self.stats["items"] += size
+            self.stats["max_batch_seen"] = max(self.stats["max_batch_seen"], size)
+            self.stats["queue_wait_ms_total"] += wait_total * 1000
+            if any(slot.error is not None for slot in slots):
+                self.stats["errors"] += 1
+            for bound in self.BUCKETS:
+                if size <= bound:
+                    self.stats["size_histogram"][str(bound)] += 1
+                    break
+            else:
+                self.stats["size_histogram"]["+Inf"] += 1
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self.stats, size_histogram=dict(self.stats["size_histogram"]))
+        batches = stats["batches"] or 1
+        stats["mean_batch_size"] = round(stats["items"] / batches, 2)
+        stats["mean_queue_wait_ms"] = round(stats["queue_wait_ms_total"] / (stats["items"] or 1), 3)
+        stats["max_batch"] = self.max_batch
+        stats["max_wait_ms"] = self.max_wait * 1000
+        return stats
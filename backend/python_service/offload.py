@@ -0,0 +1,305 @@
+import math
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from realtime import native
+
+# --- SENTINELX OFFLOAD ---
+# Keeps CPU-bound work off the Socket.IO event loop. Under eventlet every
+# request and every socket heartbeat share one OS thread, so a handler that
+# scores an upload for two seconds stalls all of them. An OffloadPool runs
+# such calls on a bounded pool of native threads and waits for the result
+# cooperatively. Under eventlet the calls themselves go through tpool (a
+# ThreadPoolExecutor would be built from monkey-patched, green threads and
+# score on the hub); in threading mode they use a plain executor. Work
+# beyond `workers + queue_size` is refused up front with Saturated, which
+# the service answers with 503 and Retry-After.
+
+# Floor of the Retry-After hint, in seconds
+OFFLOAD_RETRY_AFTER = int(os.getenv("OFFLOAD_RETRY_AFTER", 1))
+OFFLOAD_TIMEOUT = float(os.getenv("OFFLOAD_TIMEOUT", 600))
+LOOP_LAG_INTERVAL_MS = float(os.getenv("LOOP_LAG_INTERVAL_MS", 100))
+# Lag samples kept for the percentiles (60s at the default interval)
+LOOP_LAG_WINDOW = int(os.getenv("LOOP_LAG_WINDOW", 600))
+
+class Saturated(Exception):
+    """
+    Raised by OffloadPool.admit() when every worker and queue slot is taken.
+
+    Attributes:
+        retry_after (int): Seconds the client should wait before retrying.
+    """
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} is saturated, retry in {retry_after}s")
+        self.name = name
+        self.retry_after = retry_after
+
+# Default size of eventlet's tpool (EVENTLET_THREADPOOL_SIZE)
+_TPOOL_DEFAULT = int(os.getenv("EVENTLET_THREADPOOL_SIZE", 20))
+_tpool_reserved = 0
+
+def _reserve_tpool(threads):
+    """
+    Grows eventlet's tpool so every admitted request can hold a native
+    thread at once (one running or waiting call each); calls beyond its
+    size would queue behind unrelated waits. Must run before tpool's first
+    use, which is why pools are created at import.
+    """
+    global _tpool_reserved
+    from eventlet import tpool
+    _tpool_reserved += threads
+    tpool.set_num_threads(max(_TPOOL_DEFAULT, _tpool_reserved))
+
+def _waiter(async_mode):
+    """
+    Returns wait(future, timeout) that blocks only the calling green thread.
+    """
+    if async_mode == "gevent":
+        import gevent
+        return lambda future, timeout: gevent.get_hub().threadpool.apply(future.result, (timeout,))
+    return lambda future, timeout: future.result(timeout)
+
+class _Ticket:
+    """
+    One admitted request. Holds its slot until released; release() is
+    idempotent so a streamed response can release from both the generator
+    and the response's close hook.
+    """
+    __slots__ = ("pool", "released")
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.pool._release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+class OffloadPool:
+    """
+    Bounded native thread pool with admission control.
+
+    Args:
+        name (str): Label used in logs, errors and stats.
+        workers (int): Native threads; 0 runs calls inline (no offload).
+        queue_size (int): Admitted requests allowed to wait for a worker.
+        async_mode (str): The Socket.IO async mode ('eventlet', 'gevent'
+            or 'threading'); decides how callers wait.
+        timeout (float): Seconds a caller waits for one call.
+        on_wait (callable): Called with each call's queue wait, in seconds
+            (the overload controller's signal).
+    """
+    def __init__(self, name, workers=2, queue_size=8,
+                 async_mode="threading", timeout=OFFLOAD_TIMEOUT, retry_after=OFFLOAD_RETRY_AFTER, on_wait=None):
+        self.name = name
+        self.on_wait = on_wait
+        self.workers = max(0, int(workers))
+        self.capacity = max(1, self.workers) + max(0, int(queue_size))
+        self.async_mode = async_mode
+        self.timeout = timeout
+        self.retry_after = max(1, int(retry_after))
+        self._wait = _waiter(async_mode)
+        self._executor = None
+        # Green callers queue here for one of `workers` tpool threads
+        self._slots = None
+        if async_mode == "eventlet" and self.workers:
+            from eventlet.semaphore import Semaphore
+            self._slots = Semaphore(self.workers)
+            _reserve_tpool(self.capacity)
+        # Also taken on the worker threads, so never a green lock
+        self._lock = native.threading.Lock()
+        self._admitted = 0
+        self._running = 0
+        self.stats = {
+            "admitted": 0,
+            "rejected": 0,
+            "calls": 0,
+            "errors": 0,
+            "max_admitted": 0,
+            "run_ms_total": 0.0,
+            "queue_wait_ms_total": 0.0
+        }
+
+    def _ensure_started(self):
+        if self._executor is None and self.workers:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix=self.name)
+
+    def admit(self):
+        """
+        Reserves a slot for one request (any number of run() calls).
+
+        Returns:
+            _Ticket: Release it (or use it as a context manager) when done.
+
+        Raises:
+            Saturated: All workers are busy and the queue is full.
+        """
+        with self._lock:
+            if self._admitted >= self.capacity:
+                self.stats["rejected"] += 1
+                raise Saturated(self.name, self._retry_after())
+            self._admitted += 1
+            self.stats["admitted"] += 1
+            self.stats["max_admitted"] = max(self.stats["max_admitted"], self._admitted)
+        return _Ticket(self)
+
+    def _release(self):
+        with self._lock:
+            self._admitted -= 1
+
+    def _retry_after(self):
+        # Time for the admitted work to drain at the mean call duration
+        calls = self.stats["calls"]
+        if not calls:
+            return self.retry_after
+        mean_s = self.stats["run_ms_total"] / calls / 1000.0
+        return max(self.retry_after, math.ceil(mean_s * self._admitted / max(1, self.workers)))
+
+    def run(self, fn, *args, **kwargs):
+        """
+        Runs fn(*args, **kwargs) on a worker thread and returns its result.
+        The caller must hold a ticket from admit().
+        """
+        if not self.workers:
+            return fn(*args, **kwargs)
+        queued = time.perf_counter()
+        if self._slots is not None:
+            import eventlet
+            from eventlet import tpool
+            expired = TimeoutError(f"{self.name}: no result after {self.timeout}s")
+            with self._slots, eventlet.Timeout(self.timeout, expired):
+                return tpool.execute(self._call, queued, fn, args, kwargs)
+        self._ensure_started()
+        future = self._executor.submit(self._call, queued, fn, args, kwargs)
+        return self._wait(future, self.timeout)
+
+    def wait_on(self, fn, *args, **kwargs):
+        """
+        Calls a function that blocks without using the CPU (e.g. a
+        MicroBatcher submit) so that only the calling green thread waits.
+        It does not take a worker; the caller must hold a ticket.
+        """
+        if self.async_mode == "eventlet":
+            from eventlet import tpool
+            return tpool.execute(fn, *args, **kwargs)
+        if self.async_mode == "gevent":
+            import gevent
+            return gevent.get_hub().threadpool.apply(fn, args, kwargs)
+        return fn(*args, **kwargs)
+
+    def _call(self, queued, fn, args, kwargs):
+        started = time.perf_counter()
+        with self._lock:
+            self._running += 1
+        if self.on_wait is not None:
+            self.on_wait(started - queued)
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            with self._lock:
+                self.stats["errors"] += 1
+            raise
+        finally:
+            finished = time.perf_counter()
+            with self._lock:
+                self._running -= 1
+                self.stats["calls"] += 1
+                self.stats["run_ms_total"] += (finished - started) * 1000
+                self.stats["queue_wait_ms_total"] += (started - queued) * 1000
+
+    def iterate(self, iterator):
+        """
+        Advances a CPU-bound generator on the pool, one item per call, so
+        the event loop runs between items.
+        """
+        if not self.workers:
+            yield from iterator
+            return
+        done = object()
+        while True:
+            item = self.run(next, iterator, done)
+            if item is done:
+                return
+            yield item
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats, admitted_now=self._admitted, running=self._running)
+        calls = stats["calls"] or 1
+        stats["queued"] = max(0, stats["admitted_now"] - stats["running"])
+        stats["mean_run_ms"] = round(stats["run_ms_total"] / calls, 3)
+        stats["mean_queue_wait_ms"] = round(stats["queue_wait_ms_total"] / calls, 3)
+        stats["workers"] = self.workers
+        stats["capacity"] = self.capacity
+        stats["async_mode"] = self.async_mode
+        return stats
+
+class LoopLagMonitor:
+    """
+    Measures event-loop responsiveness: a background task sleeps for
+    `interval_ms` and records how late it wakes up. Under eventlet a late
+    wake-up means something held the hub; in threading mode it shows GIL
+    contention.
+
+    Args:
+        start_fn (callable): Starts the probe as a background task.
+        sleep_fn (callable): Cooperative sleep of the server's async mode.
+    """
+    def __init__(self, start_fn, sleep_fn, interval_ms=LOOP_LAG_INTERVAL_MS, window=LOOP_LAG_WINDOW):
+        self.start_fn = start_fn
+        self.sleep_fn = sleep_fn
+        self.interval = max(1.0, interval_ms) / 1000.0
+        self._samples = deque(maxlen=max(1, window))
+        self._lock = threading.Lock()
+        self._started = False
+        self.stats = {"samples": 0, "max_ms": 0.0, "lag_ms_total": 0.0}
+
+    def start(self):
+        """
+        Starts the probe once; later calls do nothing.
+        """
+        if not self._started:
+            with self._lock:
+                if self._started:
+                    return
+                self._started = True
+            self.start_fn(self._run)
+
+    def _run(self):
+        while True:
+            expected = time.perf_counter() + self.interval
+            self.sleep_fn(self.interval)
+            lag_ms = max(0.0, (time.perf_counter() - expected) * 1000)
+            with self._lock:
+                self._samples.append(lag_ms)
+                self.stats["samples"] += 1
+                self.stats["lag_ms_total"] += lag_ms
+                self.stats["max_ms"] = max(self.stats["max_ms"], lag_ms)
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            recent = sorted(self._samples)
+        stats["mean_ms"] = round(stats["lag_ms_total"] / (stats["samples"] or 1), 3)
+        stats["max_ms"] = round(stats["max_ms"], 3)
+        stats["interval_ms"] = self.interval * 1000
+        # Percentiles over the last `window` samples
+        for label, q in (("p50_ms", 0.5), ("p99_ms", 0.99)):
+            stats[label] = round(recent[min(len(recent) - 1, int(q * len(recent)))], 3) if recent else None
+        stats["recent_max_ms"] = round(recent[-1], 3) if recent else None
+        return stats
@@ -0,0 +1,370 @@
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from ai.bundle import BUNDLE_DIR, BundleNB
+from realtime.native import queue, threading
+
+# --- SENTINELX ONLINE INTENT LEARNING ---
+# Incremental alternative to the full train_model.py rebuild. Features come
+# from a stateless hashing space (no vocabulary to refit), so the Naive
+# Bayes counts can absorb new lines with partial_fit in mini-batches while
+# the service runs. Ingested lines are labeled by the training rules;
+# analyst labels are taken as given. The model is checkpointed to disk and
+# published to the predictor as an immutable snapshot, so a learning step
+# never races a prediction.
+
+ONLINE_LEARNING = os.getenv("ONLINE_LEARNING", "0") == "1"
+ONLINE_N_FEATURES = int(os.getenv("ONLINE_N_FEATURES", 1 << 18))
+ONLINE_BATCH_SIZE = int(os.getenv("ONLINE_BATCH_SIZE", 512))
+ONLINE_FLUSH_SEC = float(os.getenv("ONLINE_FLUSH_SEC", 5))
+ONLINE_QUEUE_SIZE = int(os.getenv("ONLINE_QUEUE_SIZE", 50000))
+# Snapshots handed to the predictor (each one empties the intent cache)
+ONLINE_PUBLISH_SEC = float(os.getenv("ONLINE_PUBLISH_SEC", 30))
+ONLINE_CHECKPOINT_SEC = float(os.getenv("ONLINE_CHECKPOINT_SEC", 300))
+# One analyst-labeled line counts as this many rule-labeled ones
+ONLINE_ANALYST_WEIGHT = float(os.getenv("ONLINE_ANALYST_WEIGHT", 10))
+ONLINE_DIR = os.getenv("ONLINE_MODEL_DIR", os.path.join(BUNDLE_DIR, 'online'))
+CHECKPOINT_FILE = 'intent_online.npz'
+
+# The batch model smooths with alpha=0.1 over a 10000-term vocabulary
+# (train_model.py); the same total pseudo-count is spread over the hashing
+# space, or it would swamp every class with little data
+BATCH_ALPHA = 0.1
+BATCH_VOCABULARY = 10000
+
+def nb_alpha(n_features=ONLINE_N_FEATURES):
+    return BATCH_ALPHA * BATCH_VOCABULARY / n_features
+
+def make_vectorizer(n_features=ONLINE_N_FEATURES):
+    """
+    Stateless counterpart of the training TfidfVectorizer: same tokens and
+    stop words, l2-normalised, no idf. Non-negative for MultinomialNB.
+    """
+    from sklearn.feature_extraction.text import HashingVectorizer
+    return HashingVectorizer(n_features=n_features, stop_words='english', alternate_sign=False, norm='l2')
+
+def intent_classes():
+    """
+    Intents the batch trainer can produce: its seed phrases plus the rule
+    labels.
+    """
+    import train_model
+    return np.array(sorted({l for _, l in train_model.data} | set(train_model.INTENT_RULES) | {"logs"}))
+
+def checkpoint_path(directory=ONLINE_DIR):
+    return os.path.join(directory, CHECKPOINT_FILE)
+
+def active_checkpoint(directory=ONLINE_DIR):
+    """
+    Returns the checkpoint analysis workers should predict with, or None
+    when online learning is off or has not checkpointed yet.
+    """
+    path = checkpoint_path(directory)
+    return path if ONLINE_LEARNING and os.path.exists(path) else None
+
+def snapshot(feature_count, class_count, classes, alpha):
+    """
+    Immutable predictor for the given counts (MultinomialNB's smoothing).
+    """
+    smoothed = feature_count + alpha
+    feature_log_prob = np.log(smoothed) - np.log(smoothed.sum(axis=1, keepdims=True))
+    class_log_prior = np.log(class_count) - np.log(class_count.sum())
+    return BundleNB(np.asarray(classes).astype(str), class_log_prior, np.ascontiguousarray(feature_log_prob.T))
+
+def load_checkpoint(path):
+    """
+    Returns (feature_count, class_count, classes, meta) from a checkpoint.
+    """
+    with np.load(path, allow_pickle=False) as ckpt:
+        meta = json.loads(str(ckpt["meta"]))
+        return ckpt["feature_count"], ckpt["class_count"], ckpt["classes"], meta
+
+def load_predictor(path):
+    """
+    (model, vectorizer) for a checkpoint, as analysis workers load them.
+    """
+    feature_count, class_count, classes, meta = load_checkpoint(path)
+    return snapshot(feature_count, class_count, classes, meta["alpha"]), make_vectorizer(meta["n_features"])
+
+class OnlineIntentLearner:
+    """
+    Background partial_fit loop over a bounded queue of new lines.
+
+    Args:
+        on_publish (callable): on_publish(model, vectorizer, info) receives
+            each new predictor snapshot.
+        on_checkpoint (callable): on_checkpoint(path) runs after each
+            checkpoint is written.
+        directory (str): Checkpoint location.
+    """
+    def __init__(self, on_publish=None, on_checkpoint=None, directory=ONLINE_DIR, n_features=ONLINE_N_FEATURES,
+                 batch_size=ONLINE_BATCH_SIZE, flush_sec=ONLINE_FLUSH_SEC, queue_size=ONLINE_QUEUE_SIZE,
+                 publish_sec=ONLINE_PUBLISH_SEC, checkpoint_sec=ONLINE_CHECKPOINT_SEC):
+        self.on_publish = on_publish
+        self.on_checkpoint = on_checkpoint
+        self.directory = directory
+        self.n_features = n_features
+        self.batch_size = max(1, batch_size)
+        self.flush_sec = flush_sec
+        self.publish_sec = publish_sec
+        self.checkpoint_sec = checkpoint_sec
+        self.vectorizer = make_vectorizer(n_features)
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._fit_lock = threading.Lock()
+        self._flushing = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._nb = None
+        self.classes = intent_classes()
+        self.ready = False
+        self._dirty_publish = False
+        self._dirty_checkpoint = False
+        self._last_publish = 0.0
+        self._last_checkpoint = time.monotonic()
+        self.stats = {
+            "queued": 0,
+            "dropped_queue_full": 0,
+            "rejected_labels": 0,
+            "learned_ingest": 0,
+            "learned_analyst": 0,
+            "updates": 0,
+            "fit_ms_total": 0.0,
+            "publishes": 0,
+            "checkpoints": 0,
+            "bootstrap": None,
+            "bootstrap_seconds": None,
+            "last_checkpoint_at": None,
+            "errors": 0,
+        }
+
+    # --- Producer side ---
+    def learn(self, texts, labels=None):
+        """
+        Queues lines for the next mini-batch without blocking.
+
+        Args:
+            texts (list): Raw log lines.
+            labels (list): Analyst intents, or None to label by rule.
+
+        Returns:
+            int: Lines queued (the rest were dropped, queue full).
+
+        Raises:
+            ValueError: When a label is not one of the model's intents.
+        """
+        if labels is not None:
+            if len(labels) != len(texts):
+                raise ValueError("texts and labels differ in length")
+            bad = sorted({str(l) for l in labels} - set(self.classes.tolist()))
+            if bad:
+                self.stats["rejected_labels"] += len(labels)
+                raise ValueError(f"unknown intents {bad}; expected one of {self.classes.tolist()}")
+        self._ensure_started()
+        queued = 0
+        for i, text in enumerate(texts):
+            text = str(text)
+            if not text.strip():
+                continue
+            try:
+                self._queue.put_nowait((text, None if labels is None else str(labels[i])))
+                queued += 1
+            except queue.Full:
+                self.stats["dropped_queue_full"] += len(texts) - i
+                break
+        self.stats["queued"] += queued
+        return queued
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="online-learner", daemon=True)
+                    self._thread.start()
+
+    def start(self):
+        """
+        Starts the learner (restore or bootstrap) ahead of the first line.
+        """
+        self._ensure_started()
+
+    # --- Model state ---
+    def _bootstrap(self):
+        """
+        Restores the last checkpoint; without one, fits the vault once (the
+        only full pass this mode ever makes).
+        """
+        import train_model
+        from sklearn.naive_bayes import MultinomialNB
+        started = time.perf_counter()
+        path = checkpoint_path(self.directory)
+        if os.path.exists(path):
+            feature_count, class_count, classes, meta = load_checkpoint(path)
+            if meta.get("n_features") == self.n_features:
+                self._nb = train_model.intent_model_from_counts(feature_count, class_count, classes)
+                self._nb.alpha = meta["alpha"]
+                self.classes = np.asarray(classes)
+                self.stats["updates"] = meta.get("updates", 0)
+                self.stats["bootstrap"] = "checkpoint"
+                print(f"[ONLINE] Restored intent checkpoint ({self.stats['updates']} updates).")
+                return time.perf_counter() - started
+            print(f"[ONLINE] Checkpoint has {meta.get('n_features')} features, expected {self.n_features}; refitting.")
+
+        # Seed phrases cover every intent, so no class ever has a zero count
+        texts = [t for t, _ in train_model.data]
+        labels = [l for _, l in train_model.data]
+        self._nb = MultinomialNB(alpha=nb_alpha(self.n_features))
+        self._nb.partial_fit(self.vectorizer.transform(texts), labels, classes=self.classes)
+        for _, csv_path in train_model.dataset_paths():
+            for messages in train_model.iter_messages(csv_path):
+                batch = messages.str.lower().tolist()
+                if batch:
+                    self._nb.partial_fit(self.vectorizer.transform(batch), train_model.label_intents(batch))
+        self.stats["bootstrap"] = "vault"
+        self._dirty_checkpoint = True
+        print(f"[ONLINE] Intent model fitted from the vault ({int(self._nb.class_count_.sum())} lines).")
+        return time.perf_counter() - started
+
+    def _fit(self, batch):
+        import train_model
+        texts = [t for t, _ in batch]
+        lowered = [t.lower() for t in texts]
+        rule_labels = train_model.label_intents(lowered)
+        labels = np.array([label or rule_labels[i] for i, (_, label) in enumerate(batch)], dtype=object)
+        weights = np.array([1.0 if label is None else ONLINE_ANALYST_WEIGHT for _, label in batch])
+        started = time.perf_counter()
+        with self._fit_lock:
+            self._nb.partial_fit(self.vectorizer.transform(lowered), labels, sample_weight=weights)
+        self.stats["fit_ms_total"] += (time.perf_counter() - started) * 1000
+        analyst = sum(1 for _, label in batch if label is not None)
+        self.stats["learned_analyst"] += analyst
+        self.stats["learned_ingest"] += len(batch) - analyst
+        self.stats["updates"] += 1
+        self._dirty_publish = self._dirty_checkpoint = True
+
+    def publish(self):
+        """
+        Hands a snapshot of the current counts to `on_publish`.
+        """
+        with self._fit_lock:
+            model = snapshot(self._nb.feature_count_.copy(), self._nb.class_count_.copy(), self._nb.classes_, self._nb.alpha)
+        self._dirty_publish = False
+        self._last_publish = time.monotonic()
+        self.stats["publishes"] += 1
+        if self.on_publish is not None:
+            self.on_publish(model, self.vectorizer, {"updates": self.stats["updates"], "samples": self.samples})
+
+    def checkpoint(self):
+        """
+        Writes the counts atomically (temporary file, then rename).
+
+        Returns:
+            str: Checkpoint path.
+        """
+        with self._fit_lock:
+            feature_count = self._nb.feature_count_.copy()
+            class_count = self._nb.class_count_.copy()
+            classes = np.asarray(self._nb.classes_).astype(str)
+        meta = {"n_features": self.n_features, "alpha": self._nb.alpha, "updates": self.stats["updates"],
+                "samples": float(class_count.sum()), "created_at": time.strftime('%Y-%m-%dT%H:%M:%S%z')}
+        os.makedirs(self.directory, exist_ok=True)
+        path = checkpoint_path(self.directory)
+        tmp = path + '.tmp.npz'
+        np.savez(tmp, feature_count=feature_count, class_count=class_count, classes=classes, meta=np.array(json.dumps(meta)))
+        os.replace(tmp, path)
+        self._dirty_checkpoint = False
+        self._last_checkpoint = time.monotonic()
+        self.stats["checkpoints"] += 1
+        self.stats["last_checkpoint_at"] = meta["created_at"]
+        if self.on_checkpoint is not None:
+            self.on_checkpoint(path)
+        return path
+
+    @property
+    def samples(self):
+        return float(self._nb.class_count_.sum()) if self._nb is not None else 0.0
+
+    # --- Learner loop ---
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_sec
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                # A pending flush() closes the batch at once
+                batch.append(self._queue.get_nowait() if self._flushing.is_set()
+                             else self._queue.get(timeout=min(remaining, 0.1)))
+            except queue.Empty:
+                if self._flushing.is_set():
+                    break
+        return batch
+
+    def _run(self):
+        try:
+            self.stats["bootstrap_seconds"] = round(self._bootstrap(), 3)
+            self.ready = True
+            self.publish()
+            if self._dirty_checkpoint:
+                self.checkpoint()
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"[ONLINE] Bootstrap failed, online learning disabled: {e}")
+            return
+        while True:
+            batch = self._collect()
+            try:
+                self._fit(batch)
+                now = time.monotonic()
+                if self._dirty_publish and now - self._last_publish >= self.publish_sec:
+                    self.publish()
+                if self._dirty_checkpoint and now - self._last_checkpoint >= self.checkpoint_sec:
+                    self.checkpoint()
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"[ONLINE] Learning step failed: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self, timeout=30):
+        """
+        Fits everything queued so far, then publishes and checkpoints.
+        Returns the stats afterwards.
+        """
+        self._ensure_started()
+        deadline = time.monotonic() + timeout
+        while not self.ready and time.monotonic() < deadline:
+            time.sleep(0.05)
+        if not self.ready:
+            raise TimeoutError("online learner still bootstrapping")
+        # The learner thread fits the backlog without waiting for full batches
+        self._flushing.set()
+        try:
+            with self._queue.all_tasks_done:
+                while self._queue.unfinished_tasks:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"{self._queue.unfinished_tasks} lines still being learned")
+                    self._queue.all_tasks_done.wait(remaining)
+        finally:
+            self._flushing.clear()
+        self.publish()
+        self.checkpoint()
+        return self.get_stats()
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats["enabled"] = ONLINE_LEARNING
+        stats["ready"] = self.ready
+        stats["queue_depth"] = self._queue.qsize()
+        stats["samples"] = self.samples
+        stats["n_features"] = self.n_features
+        stats["classes"] = self.classes.tolist()
+        stats["fit_ms_avg"] = round(stats["fit_ms_total"] / stats["updates"], 3) if stats["updates"] and stats["fit_ms_total"] else 0.0
+        return stats
@@ -0,0 +1,197 @@
+import os
+import sys
+import time
+from collections import deque
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from realtime.native import threading
+
+# --- SENTINELX OVERLOAD CONTROL ---
+# Decides how much work each event gets while the service is overloaded.
+# The signal is queue delay: how long scoring calls waited for an offload
+# worker (or a batch). When even the shortest wait of the last
+# OVERLOAD_WINDOW_SEC stays above OVERLOAD_TARGET_MS there is a standing
+# queue, and the service degrades in stages:
+#   1 shed_llm     no new LLM explanations (the fallback text is used)
+#   2 sample       low-severity lines of known templates are sampled 1 in
+#                  OVERLOAD_SAMPLE_EVERY; the rest are only counted
+#   3 skip_intent  low-severity lines get no intent prediction (cached
+#                  template intents and rules only)
+# Each stage starts at twice the delay of the previous one. ERROR and
+# CRITICAL lines, anomalies and threat-rule hits are always fully processed.
+
+OVERLOAD_ENABLED = os.getenv("OVERLOAD_ENABLED", "1") == "1"
+OVERLOAD_TARGET_MS = float(os.getenv("OVERLOAD_TARGET_MS", 50))
+OVERLOAD_WINDOW_SEC = float(os.getenv("OVERLOAD_WINDOW_SEC", 2))
+OVERLOAD_SAMPLE_EVERY = int(os.getenv("OVERLOAD_SAMPLE_EVERY", 10))
+# A template seen this many times is "known" and may be sampled
+OVERLOAD_KNOWN_TEMPLATE = int(os.getenv("OVERLOAD_KNOWN_TEMPLATE", 50))
+# Templates the live sampler tracks at once; beyond that it starts over
+OVERLOAD_LIVE_STRATA = int(os.getenv("OVERLOAD_LIVE_STRATA", 10000))
+
+LEVELS = ("normal", "shed_llm", "sample", "skip_intent")
+NORMAL, SHED_LLM, SAMPLE, SKIP_INTENT = range(len(LEVELS))
+PROTECTED_SEVERITIES = frozenset(("ERROR", "CRITICAL", "FATAL"))
+# Delay window resolution
+_SLOTS = 20
+
+class Sampler:
+    """
+    Systematic 1-in-`every` sampling per stratum (e.g. severity and
+    template), with exact counts of what was kept and sampled away. The
+    first line of every stratum is kept.
+
+    Args:
+        every (int): Keep one line in this many per stratum.
+        max_strata (int): Strata tracked at once (None: unbounded). Past
+            it every position is forgotten, so each stratum keeps its next
+            line again.
+    """
+    def __init__(self, every=OVERLOAD_SAMPLE_EVERY, max_strata=None):
+        self.every = max(1, int(every))
+        self.max_strata = max_strata
+        self._seen = {}
+        self._lock = threading.Lock()
+        self.kept = {}
+        self.sampled_out = {}
+
+    def keep(self, stratum, severity):
+        with self._lock:
+            n = self._seen.get(stratum, 0)
+            if not n and self.max_strata and len(self._seen) >= self.max_strata:
+                self._seen.clear()
+            self._seen[stratum] = n + 1
+            counts = self.kept if n % self.every == 0 else self.sampled_out
+            counts[severity] = counts.get(severity, 0) + 1
+        return counts is self.kept
+
+    def merge(self, other):
+        """
+        Adds the counts of another sampler's to_dict().
+        """
+        with self._lock:
+            for mine, theirs in ((self.kept, other["kept"]), (self.sampled_out, other["sampled_out"])):
+                for sev, n in theirs.items():
+                    mine[sev] = mine.get(sev, 0) + n
+
+    def to_dict(self):
+        with self._lock:
+            return {"every": self.every, "kept": dict(self.kept), "sampled_out": dict(self.sampled_out)}
+
+class OverloadController:
+    """
+    Maps recent queue delay to a degradation level and keeps the exact
+    counts of shed work: `live` samples /api/analyze-log(s) events, upload
+    counts are added with record().
+
+    Args:
+        target_ms (float): Standing delay that starts shedding.
+        window_sec (float): The level follows the smallest delay observed
+            over this window, so a single slow call does not trip it.
+        clock (callable): Monotonic time source.
+    """
+    def __init__(self, target_ms=OVERLOAD_TARGET_MS, window_sec=OVERLOAD_WINDOW_SEC,
+                 enabled=OVERLOAD_ENABLED, clock=time.monotonic):
+        self.target = max(0.001, target_ms / 1000.0)
+        self.slot = max(0.01, window_sec) / _SLOTS
+        self.enabled = enabled
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Forgets observed delays, sampler positions and counters.
+        """
+        with self._lock:
+            # (slot number, smallest delay in that slot)
+            self._slots = deque()
+            self._level = NORMAL
+            self._level_since = self.clock()
+            # Live events never end, so their per-template positions are bounded
+            self.live = Sampler(max_strata=OVERLOAD_LIVE_STRATA)
+            self.uploads = Sampler()
+            self.stats = {
+                "observations": 0,
+                "level_changes": 0,
+                "llm_skipped": 0,
+                "intents_skipped": 0,
+                "seconds_by_level": {name: 0.0 for name in LEVELS}
+            }
+
+    def observe(self, delay):
+        """
+        Records one queue delay, in seconds.
+        """
+        if not self.enabled:
+            return
+        slot = int(self.clock() / self.slot)
+        with self._lock:
+            self.stats["observations"] += 1
+            if self._slots and self._slots[-1][0] == slot:
+                if delay < self._slots[-1][1]:
+                    self._slots[-1][1] = delay
+            else:
+                self._slots.append([slot, delay])
+                while len(self._slots) > _SLOTS:
+                    self._slots.popleft()
+
+    def standing_delay(self):
+        """
+        Smallest delay observed within the window (0 when idle).
+        """
+        oldest = int(self.clock() / self.slot) - _SLOTS + 1
+        with self._lock:
+            recent = [d for slot, d in self._slots if slot >= oldest]
+        return min(recent) if recent else 0.0
+
+    def level(self):
+        """
+        Returns the current degradation level (NORMAL ... SKIP_INTENT).
+        """
+        if not self.enabled:
+            return NORMAL
+        delay = self.standing_delay()
+        level = NORMAL
+        threshold = self.target
+        while level < SKIP_INTENT and delay >= threshold:
+            level += 1
+            threshold *= 2
+        if level != self._level:
+            with self._lock:
+                changed = level != self._level
+                if changed:
+                    now = self.clock()
+                    self.stats["seconds_by_level"][LEVELS[self._level]] += now - self._level_since
+                    self.stats["level_changes"] += 1
+                    self._level, self._level_since = level, now
+            if changed:
+                print(f"[OVERLOAD] Level {LEVELS[level]} (standing queue delay {delay * 1000:.1f}ms)")
+        return level
+
+    def record(self, llm_skipped=0, shedding=None):
+        """
+        Adds shed work to the counters; `shedding` is an upload's
+        LogScorer.shedding() (or analyze_file's load_shedding).
+        """
+        with self._lock:
+            self.stats["llm_skipped"] += llm_skipped
+            if shedding:
+                self.stats["intents_skipped"] += shedding["intents_skipped"]
+        if shedding:
+            self.uploads.merge(shedding)
+
+    def get_stats(self):
+        level = self.level()
+        delay = self.standing_delay()
+        with self._lock:
+            stats = dict(self.stats, seconds_by_level=dict(self.stats["seconds_by_level"]))
+            stats["seconds_by_level"][LEVELS[level]] += self.clock() - self._level_since
+        stats["live"] = self.live.to_dict()
+        stats["uploads"] = self.uploads.to_dict()
+        stats["seconds_by_level"] = {k: round(v, 3) for k, v in stats["seconds_by_level"].items()}
+        stats["level"] = LEVELS[level]
+        stats["standing_delay_ms"] = round(delay * 1000, 3)
+        stats["target_ms"] = self.target * 1000
+        stats["enabled"] = self.enabled
+        return stats
@@ -0,0 +1,276 @@
+import hashlib
+import os
+import pickle
+import sys
+import time
+from collections import OrderedDict
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from realtime.native import threading
+
+# --- SENTINELX RESULT CACHE ---
+# Operators upload the same rotated logs again and again, and growing files
+# (syslog) with a few new lines each time. Every analysis stores its final
+# state (analysis_engine LogScorer.part) on disk, named after the SHA-256 of
+# the bytes it covers. An identical upload is answered from that entry. An
+# upload that starts with those bytes (an append) is scored only from the
+# stored offset. Entries share one size-bounded directory and are evicted
+# least recently used first. A new model version drops every entry of the
+# old one.
+
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "1") == "1"
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR",
+                             os.path.join(os.path.dirname(__file__), '..', 'data', 'result_cache'))
+RESULT_CACHE_MAX_BYTES = int(float(os.getenv("RESULT_CACHE_MAX_MB", 256)) * (1 << 20))
+# Uploads are grouped by the hash of their first bytes; an append is only
+# recognized when the earlier upload was at least this long
+RESULT_CACHE_HEAD_BYTES = int(os.getenv("RESULT_CACHE_HEAD_BYTES", 64 << 10))
+
+FORMAT_VERSION = 1
+_READ_BYTES = 1 << 20
+_SUFFIX = ".pkl"
+
+def _digest(*parts):
+    return hashlib.blake2b("|".join(parts).encode('utf-8', 'ignore'), digest_size=12).hexdigest()
+
+class Lookup:
+    """
+    Outcome of ResultCache.lookup() for one upload.
+
+    Attributes:
+        part (dict): Stored state to continue from, or None.
+        offset (int): Bytes `part` covers (0 without one). Equal to the
+            upload size on a full hit.
+        size (int): Upload size.
+        line_end (bool): The upload ends with a newline, so its state can
+            be resumed by a later append.
+    """
+    __slots__ = ("group", "digest", "size", "line_end", "part", "offset")
+
+    def __init__(self, group, digest, size, line_end, part=None, offset=0):
+        self.group = group
+        self.digest = digest
+        self.size = size
+        self.line_end = line_end
+        self.part = part
+        self.offset = offset
+
+    @property
+    def hit(self):
+        return self.part is not None and self.offset == self.size
+
+class ResultCache:
+    """
+    On-disk LRU of analysis states.
+
+    Entry names hold the model version tag, the upload group (settings and
+    first bytes), the offset covered, the SHA-256 of those bytes and whether
+    the state can be resumed ("c") or only returned as is ("r").
+
+    Args:
+        directory (str): Cache directory (created on first store).
+        max_bytes (int): Size the directory is trimmed to.
+        head_bytes (int): Bytes hashed to group an upload with its appends.
+    """
+    def __init__(self, directory=RESULT_CACHE_DIR, max_bytes=RESULT_CACHE_MAX_BYTES,
+                 head_bytes=RESULT_CACHE_HEAD_BYTES):
+        self.directory = directory
+        self.max_bytes = max(0, max_bytes)
+        self.head_bytes = max(1, head_bytes)
+        self._lock = threading.Lock()
+        # name -> size, least recently used first
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._version = None
+        self._loaded = False
+        self.stats = {
+            "lookups": 0,
+            "hits": 0,
+            "resumes": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "invalidations": 0,
+            "bytes_hashed": 0,
+            "bytes_skipped": 0,
+            "bytes_uploaded": 0,
+            "hash_ms_total": 0.0
+        }
+
+    def _ensure_loaded(self):
+        # Caller must hold self._lock
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            names = [n for n in os.listdir(self.directory) if n.endswith(_SUFFIX)]
+        except OSError:
+            return
+        found = []
+        for name in names:
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            found.append((st.st_mtime, name, st.st_size))
+        for _, name, size in sorted(found):
+            self._entries[name] = size
+            self._bytes += size
+
+    def _drop(self, name):
+        # Caller must hold self._lock
+        self._bytes -= self._entries.pop(name)
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except OSError:
+            pass
+
+    def _set_version(self, version):
+        # Caller must hold self._lock. Returns the version tag.
+        tag = _digest(str(FORMAT_VERSION), version)
+        if tag != self._version:
+            self._version = tag
+            stale = [name for name in self._entries if not name.startswith(tag + "-")]
+            for name in stale:
+                self._drop(name)
+            self.stats["invalidations"] += len(stale)
+            if stale:
+                print(f"[RESULT_CACHE] Model version changed, dropped {len(stale)} entries.")
+        return tag
+
+    def lookup(self, stream, size, version, settings=""):
+        """
+        Hashes a seekable upload in one pass and finds its stored state:
+        the whole upload (hit) or its longest stored prefix (resume). The
+        stream is rewound to where it was.
+
+        Args:
+            stream: Binary file object positioned at the upload's start.
+            size (int): Bytes in the upload.
+            version (str): Versions of the models the analysis depends on.
+            settings (str): Anything else the result depends on (device
+                context, issue limit).
+
+        Returns:
+            Lookup: Pass it to store() after analyzing.
+        """
+        started = time.perf_counter()
+        origin = stream.tell()
+        head = stream.read(min(size, self.head_bytes))
+        stream.seek(origin)
+
+        with self._lock:
+            self._ensure_loaded()
+            tag = self._set_version(version)
+            group = f"{tag}-{_digest(settings, hashlib.sha256(head).hexdigest())}-"
+            # offset -> [(sha256, kind, name)] of this group's entries
+            stored = {}
+            for name in self._entries:
+                if name.startswith(group):
+                    offset, covered, kind = name[len(group):-len(_SUFFIX)].split("-")
+                    stored.setdefault(int(offset, 16), []).append((covered, kind, name))
+
+        # One pass over the upload; the hash is sampled at every stored offset
+        sha = hashlib.sha256()
+        prefixes = {}
+        marks = sorted(offset for offset in stored if offset <= size)
+        position = 0
+        last = b''
+        for mark in marks + [size]:
+            while position < mark:
+                block = stream.read(min(_READ_BYTES, mark - position))
+                if not block:
+                    break
+                sha.update(block)
+                position += len(block)
+                last = block
+            prefixes[mark] = sha.hexdigest()
+        stream.seek(origin)
+        result = Lookup(group, prefixes[size], size, last.endswith(b'\n'))
+
+        # Longest stored prefix of this upload: an exact entry of any kind
+        # for the whole upload, else a resumable one
+        for offset in reversed(marks):
+            for covered, kind, name in stored[offset]:
+                if covered != prefixes[offset] or (kind != "c" and offset != size):
+                    continue
+                result.part = self._read(name)
+                if result.part is not None:
+                    result.offset = offset
+                    break
+            if result.part is not None:
+                break
+
+        with self._lock:
+            self.stats["lookups"] += 1
+            self.stats["bytes_hashed"] += position
+            self.stats["bytes_uploaded"] += size
+            self.stats["bytes_skipped"] += result.offset
+            self.stats["hash_ms_total"] += (time.perf_counter() - started) * 1000
+            if result.hit:
+                self.stats["hits"] += 1
+            elif result.part is not None:
+                self.stats["resumes"] += 1
+            else:
+                self.stats["misses"] += 1
+        return result
+
+    def _read(self, name):
+        try:
+            with open(os.path.join(self.directory, name), 'rb') as f:
+                part = pickle.load(f)
+        except Exception as e:
+            print(f"[RESULT_CACHE] Dropping unreadable entry {name}: {e}")
+            with self._lock:
+                if name in self._entries:
+                    self._drop(name)
+            return None
+        with self._lock:
+            if name in self._entries:
+                self._entries.move_to_end(name)
+        try:
+            os.utime(os.path.join(self.directory, name))
+        except OSError:
+            pass
+        return part
+
+    def store(self, lookup, part):
+        """
+        Stores the state of a complete analysis of the looked-up upload.
+        """
+        if not self.max_bytes:
+            return
+        kind = "c" if lookup.line_end else "r"
+        name = f"{lookup.group}{lookup.size:x}-{lookup.digest}-{kind}{_SUFFIX}"
+        data = pickle.dumps(part, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if not lookup.group.startswith(self._version + "-"):
+                # Analyzed with models that are no longer live
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, name)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+            if name in self._entries:
+                self._bytes -= self._entries.pop(name)
+            self._entries[name] = len(data)
+            self._bytes += len(data)
+            self.stats["stores"] += 1
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                self._drop(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats, entries=len(self._entries), size_bytes=self._bytes)
+        lookups = stats["lookups"] or 1
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4)
+        stats["resume_ratio"] = round(stats["resumes"] / lookups, 4)
+        stats["skipped_ratio"] = round(stats["bytes_skipped"] / (stats["bytes_uploaded"] or 1), 4)
+        stats["hash_ms_total"] = round(stats["hash_ms_total"], 3)
+        stats["max_bytes"] = self.max_bytes
+        return stats
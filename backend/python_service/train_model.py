@@ -1,18 +1,44 @@
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.naive_bayes import MultinomialNB
-from sklearn.ensemble import IsolationForest
-import numpy as np
-import pickle
+import argparse
+import json
 import os
+import sys
+import time
+import random
+import re
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
-import glob
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS, TfidfVectorizer
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.ensemble import IsolationForest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from ai.anomaly import LogVectorizer
+from ai.bundle import export_bundle
+from ai.matcher import KeywordMatcher
 
 # --- 1. CONFIGURATION ---
-print("--- PRIME_AI NEURAL CORE: LAYER 2 TRAINING (AUGMENTED PATTERNS) ---")
 # Pointing to the forensic data vault (re-synchronized)
 uploads_dir = os.path.join(os.path.dirname(__file__), '..', 'data', 'training_vault')
 folders = ['Linux', 'Windows', 'Apache', 'Android', 'HDFS', 'Zookeeper', 'HPC', 'Proxifier', 'HealthApp', 'Mac', 'OpenSSH', 'Spark', 'Thunderbird', 'BGL', 'Hadoop', 'OpenStack']
 
+# "vault" reads the structured CSVs; "archive" reads every source of the
+# log archive (log_archive.py) instead
+TRAIN_SOURCE = os.getenv("TRAIN_SOURCE", "vault")
+# Rows read per dataset (2000 for high-fidelity training; 0 reads everything)
+TRAIN_MAX_ROWS = int(os.getenv("TRAIN_MAX_ROWS", 2000))
+TRAIN_CHUNK_ROWS = int(os.getenv("TRAIN_CHUNK_ROWS", 100000))
+TRAIN_WORKERS = int(os.getenv("TRAIN_WORKERS", os.cpu_count() or 1))
+MAX_FEATURES = 10000
+# Per-worker term table size before singleton terms are dropped
+TRAIN_VOCAB_CAP = int(os.getenv("TRAIN_VOCAB_CAP", 2000000))
+# Baseline rows kept for the Isolation Forest (uniform reservoir sample)
+ANOMALY_SAMPLE = int(os.getenv("TRAIN_ANOMALY_SAMPLE", 1000000))
+RANDOM_SEED = 42
+
 data = [
     ("hello", "greeting"), ("hi", "greeting"), ("hey", "greeting"),
     ("system status", "status"), ("server health", "status"),
@@ -21,83 +47,364 @@ data = [
     ("help", "help"), ("commands", "help")
 ]
 
-anomaly_features = []
+# Enhanced keyword mapping: security wins over status, everything else is logs
+INTENT_RULES = {
+    'security': ["fail", "error", "critical", "deny", "invalid", "panic", "unauthorized", "refused", "blocked"],
+    'status': ["info", "success", "open", "close", "normal", "started", "stopped", "ready"],
+}
 
-# FEATURE EXTRACTION HELPER
-def extract_features(msg):
-    msg = str(msg)
-    return [
-        len(msg),                           # Feature 1: Length
-        sum(c.isdigit() for c in msg),      # Feature 2: Numeric Count
-        sum(1 for c in msg if not c.isalnum() and not c.isspace()) # Feature 3: Special Chars
-    ]
+def _vectorizer():
+    return TfidfVectorizer(stop_words='english', max_features=MAX_FEATURES) # Increased features
+
+# The vectorizer's analyzer, for counting terms a chunk at a time: its
+# default token pattern ((?u)\b\w\w+\b finds the same tokens) and stop words
+TOKEN_REGEX = re.compile(r"\w\w+")
+STOP_WORDS = np.array(sorted(ENGLISH_STOP_WORDS), dtype=object)
+DOC_SEPARATOR = "\nDOC\n"
 
 # --- 2. DATA AUGMENTATION ---
-for folder in folders:
-    # --- HANDLES FLAT STRUCTURE IN VAULT ---
-    search_pattern = os.path.join(uploads_dir, f"{folder}_2k.log_structured.csv")
-    csv_files = glob.glob(search_pattern)
-    
-    if csv_files:
-        print(f"Deep Analysis: Indexing {folder} neural patterns...")
-        try:
-            # Shift to 2000 rows for high-fidelity training
-            df = pd.read_csv(csv_files[0], nrows=2000) 
-            content_col = 'Content' if 'Content' in df.columns else ('Message' if 'Message' in df.columns else None)
-            
-            if content_col:
-                for msg in df[content_col].dropna():
-                    msg_low = str(msg).lower()
-                    
-                    # A. Intent Classification Data
-                    intent = "logs"
-                    # Enhanced keyword mapping
-                    if any(k in msg_low for k in ["fail", "error", "critical", "deny", "invalid", "panic", "unauthorized", "refused", "blocked"]):
-                        intent = "security"
-                    elif any(k in msg_low for k in ["info", "success", "open", "close", "normal", "started", "stopped", "ready"]):
-                        intent = "status"
-                    data.append((msg_low, intent))
-                    
-                    # B. Anomaly Detection Baseline
-                    # Only map "Normal" (status/info) logs to the baseline for better outlier detection
-                    if intent != "security": 
-                        anomaly_features.append(extract_features(msg))
-                        
-        except Exception as e:
-            print(f"Skipping {folder}: {e}")
-
-# --- 3. TRAIN CHATBOT/INTENT MODEL ---
-print(f"PRIME_AI: Training Intent Engine on {len(data)} deep patterns...")
-vectorizer = TfidfVectorizer(stop_words='english', max_features=10000) # Increased features
-texts = [d[0] for d in data]
-X_intent = vectorizer.fit_transform(texts)
-y_intent = [d[1] for d in data]
-
-clf_intent = MultinomialNB(alpha=0.1) # Smoothed for better generalization
-clf_intent.fit(X_intent, y_intent)
-
-# --- 4. TRAIN ANOMALY DETECTION MODEL ---
-print(f"PRIME_AI: Training Anomaly Engine on {len(anomaly_features)} baseline samples...")
-# Lower contamination for professional environments
-clf_anomaly = IsolationForest(contamination=0.005, random_state=42) 
-if anomaly_features:
-    clf_anomaly.fit(np.array(anomaly_features))
-else:
-    print("Warning: No anomaly features collected. Falling back to dummy.")
-    clf_anomaly.fit(np.array([[50, 2, 0], [45, 1, 0], [60, 4, 0]]))
-
-# --- 5. PERSISTENCE ---
-artifacts = {
-    'chatbot_model.pkl': clf_intent,
-    'tfidf_vectorizer.pkl': vectorizer,
-    'anomaly_model.pkl': clf_anomaly
-}
+ARCHIVE_PREFIX = 'archive:'
+
+def dataset_paths():
+    if TRAIN_SOURCE == "archive":
+        import log_archive
+        return [(source, ARCHIVE_PREFIX + source) for source in log_archive.LogArchive().sources()]
+    paths = []
+    for folder in folders:
+        # --- HANDLES FLAT STRUCTURE IN VAULT ---
+        path = os.path.join(uploads_dir, f"{folder}_2k.log_structured.csv")
+        if os.path.exists(path):
+            paths.append((folder, path))
+    return paths
+
+def iter_messages(path):
+    """
+    Streams the message column of a structured CSV in chunks, reading only
+    that column, or the messages of an archived source.
+
+    Yields:
+        pd.Series: Raw messages (NaN dropped).
+    """
+    if path.startswith(ARCHIVE_PREFIX):
+        # Archived sources are already columnar: messages come straight
+        # from their compressed blocks
+        import log_archive
+        archive = log_archive.LogArchive()
+        batch = []
+        for messages in archive.iter_messages(path[len(ARCHIVE_PREFIX):], TRAIN_MAX_ROWS):
+            batch.extend(messages)
+            if len(batch) >= TRAIN_CHUNK_ROWS:
+                yield pd.Series(batch, dtype=object)
+                batch = []
+        if batch:
+            yield pd.Series(batch, dtype=object)
+        return
+    header = pd.read_csv(path, nrows=0).columns
+    content_col = 'Content' if 'Content' in header else ('Message' if 'Message' in header else None)
+    if content_col is None:
+        return
+    reader = pd.read_csv(path, usecols=[content_col], dtype=str, chunksize=TRAIN_CHUNK_ROWS,
+                         nrows=TRAIN_MAX_ROWS or None)
+    for chunk in reader:
+        yield chunk[content_col].dropna()
+
+_intent_matcher = None
+
+def label_intents(texts):
+    """
+    Labels lower-cased messages with one automaton pass per message.
+
+    Returns:
+        np.ndarray: Intent labels (object dtype).
+    """
+    global _intent_matcher
+    if _intent_matcher is None:
+        _intent_matcher = KeywordMatcher(INTENT_RULES)
+    masks = np.fromiter(_intent_matcher.masks(texts), dtype=np.int64, count=len(texts))
+    labels = np.full(len(texts), "logs", dtype=object)
+    labels[(masks & _intent_matcher.bit('status')) != 0] = "status"
+    labels[(masks & _intent_matcher.bit('security')) != 0] = "security"
+    return labels
+
+class Reservoir:
+    """
+    Uniform sample of at most `capacity` feature rows from a stream.
+    """
+    def __init__(self, capacity, seed):
+        self.capacity = capacity
+        self.rows = []
+        self.seen = 0
+        self.rng = random.Random(seed)
+
+    def add(self, features):
+        for row in features:
+            self.seen += 1
+            if len(self.rows) < self.capacity:
+                self.rows.append(row)
+            else:
+                j = self.rng.randrange(self.seen)
+                if j < self.capacity:
+                    self.rows[j] = row
+
+    def array(self):
+        return np.array(self.rows, dtype=np.int64).reshape(-1, 5)
+
+def count_terms(texts, term_counts, doc_counts):
+    """
+    Adds the term and document frequencies of a chunk of lower-cased texts
+    to the two dicts. The chunk is tokenized in one regex pass, counted with
+    numpy, and only its distinct terms are merged in Python.
+    """
+    if not texts:
+        return
+    # One token list for the chunk; the upper-case separator cannot occur
+    # in lower-cased text, so it marks where each text starts
+    tokens = TOKEN_REGEX.findall(DOC_SEPARATOR.join(texts))
+    codes, terms = pd.factorize(np.array(tokens, dtype=object))
+    separator = terms == DOC_SEPARATOR.strip()
+    docs = np.cumsum(separator[codes])
+    keep = ~separator & ~np.isin(terms, STOP_WORDS)
+    counted = keep[codes]
+    codes, docs = codes[counted], docs[counted]
+    tfs = np.bincount(codes, minlength=len(terms))
+    # Each distinct (text, term) pair adds one to the term's df
+    dfs = np.bincount(pd.unique(docs * len(terms) + codes) % len(terms), minlength=len(terms))
+    for term, tf, df in zip(terms[keep].tolist(), tfs[keep].tolist(), dfs[keep].tolist()):
+        term_counts[term] = term_counts.get(term, 0) + tf
+        doc_counts[term] = doc_counts.get(term, 0) + df
+
+def scan_dataset(name, path):
+    """
+    Pass 1 (one worker per dataset): term and document frequencies for the
+    vocabulary, intent label counts and the anomaly baseline sample. A
+    dataset that cannot be read is logged and skipped (an empty scan).
+    """
+    term_counts, doc_counts = {}, {}
+    label_counts = {}
+    baseline = Reservoir(ANOMALY_SAMPLE, RANDOM_SEED ^ zlib.crc32(name.encode()))
+    rows = 0
+    skipped = False
+    try:
+        for messages in iter_messages(path):
+            texts = messages.str.lower().tolist()
+            labels = label_intents(texts)
+            for label, count in zip(*np.unique(labels.astype(str), return_counts=True)):
+                label_counts[label] = label_counts.get(label, 0) + int(count)
+            count_terms(texts, term_counts, doc_counts)
+            if len(term_counts) > TRAIN_VOCAB_CAP:
+                # Space bound for huge vaults: singletons cannot reach the top terms
+                for token in [t for t, c in term_counts.items() if c <= 1]:
+                    del term_counts[token]
+                    doc_counts.pop(token, None)
+
+            # Only map "Normal" (status/info) logs to the baseline for better outlier detection
+            normal = messages[labels != "security"].tolist()
+            baseline.add(LogVectorizer.vectorize_batch(normal))
+            rows += len(texts)
+    except Exception as e:
+        # One unreadable CSV must not abort the whole training run
+        print(f"Skipping {name}: {e}")
+        term_counts, doc_counts, label_counts = {}, {}, {}
+        baseline = Reservoir(0, RANDOM_SEED)
+        rows, skipped = 0, True
+    return {
+        "name": name, "rows": rows, "term_counts": term_counts, "doc_counts": doc_counts,
+        "label_counts": label_counts, "baseline": baseline.array(), "baseline_seen": baseline.seen,
+        "skipped": skipped
+    }
+
+def count_dataset(path, vocabulary, idf, classes):
+    """
+    Pass 2 (one worker per dataset): per-class sums of the TF-IDF rows, the
+    only statistics MultinomialNB keeps.
+    """
+    vectorizer = fixed_vectorizer(vocabulary, idf)
+    class_index = {c: i for i, c in enumerate(classes)}
+    feature_counts = np.zeros((len(classes), len(vocabulary)))
+    class_counts = np.zeros(len(classes))
+    for messages in iter_messages(path):
+        texts = messages.str.lower().tolist()
+        accumulate(vectorizer, texts, label_intents(texts), class_index, feature_counts, class_counts)
+    return feature_counts, class_counts
+
+def accumulate(vectorizer, texts, labels, class_index, feature_counts, class_counts):
+    codes = np.fromiter((class_index[label] for label in labels), dtype=np.int64, count=len(texts))
+    X = vectorizer.transform(texts)
+    Y = sp.csr_matrix((np.ones(len(codes)), (np.arange(len(codes)), codes)),
+                      shape=(len(codes), len(class_index)))
+    feature_counts += (Y.T @ X).toarray()
+    class_counts += np.bincount(codes, minlength=len(class_index))
+
+def fixed_vectorizer(vocabulary, idf):
+    """
+    TfidfVectorizer over a precomputed vocabulary and idf.
+    """
+    vectorizer = TfidfVectorizer(stop_words='english', vocabulary=vocabulary)
+    vectorizer.fit([''])
+    vectorizer.idf_ = idf
+    return vectorizer
+
+def select_vocabulary(term_counts, doc_counts, n_docs):
+    """
+    Keeps the MAX_FEATURES most frequent terms and computes their smoothed
+    idf, as TfidfVectorizer(max_features=...) does.
+    """
+    terms = sorted(term_counts)
+    if len(terms) > MAX_FEATURES:
+        tfs = np.fromiter((term_counts[t] for t in terms), dtype=np.float64, count=len(terms))
+        # Same ordering (and tie-breaking) as CountVectorizer._limit_features
+        keep = np.sort((-tfs).argsort()[:MAX_FEATURES])
+        terms = [terms[i] for i in keep]
+    vocabulary = {t: i for i, t in enumerate(terms)}
+    df = np.fromiter((doc_counts.get(t, 0) for t in terms), dtype=np.float64, count=len(terms))
+    idf = np.log((1 + n_docs) / (1 + df)) + 1
+    return vocabulary, idf
+
+def intent_model_from_counts(feature_counts, class_counts, classes):
+    """
+    Builds the fitted MultinomialNB from per-class sums through the public
+    partial_fit API: one row per class carries the feature sums, then empty
+    rows weighted by the remaining sample count complete class_count_.
+    """
+    clf_intent = MultinomialNB(alpha=0.1) # Smoothed for better generalization
+    clf_intent.partial_fit(feature_counts, classes, classes=classes)
+    clf_intent.partial_fit(np.zeros_like(feature_counts), classes, sample_weight=class_counts - 1)
+    return clf_intent
+
+def _run(executor, fn, jobs, on_done=None):
+    """
+    Runs fn over jobs (in the pool when there is one), calling on_done(n)
+    as each of the n-th results arrives, in order.
+    """
+    results = (fn(*job) for job in jobs) if executor is None else executor.map(fn, *zip(*jobs))
+    collected = []
+    for result in results:
+        collected.append(result)
+        if on_done:
+            on_done(len(collected))
+    return collected
+
+def train(workers=TRAIN_WORKERS, progress=None):
+    """
+    Trains the intent and anomaly models from the vault and exports a new
+    model bundle.
+
+    Args:
+        workers (int): Dataset worker processes (1 runs in-process).
+        progress (callable): Optional progress(stage, fraction, detail).
+
+    Returns:
+        dict: Bundle path and training statistics.
+    """
+    report = progress or (lambda stage, fraction, detail: None)
+    started = time.perf_counter()
+    datasets = dataset_paths()
+    workers = max(1, min(workers, len(datasets) or 1))
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        # Pass 1: vocabulary statistics, labels and anomaly baseline
+        report("scan", 0.0, f"{len(datasets)} datasets, {workers} workers")
+        for name, _ in datasets:
+            print(f"Deep Analysis: Indexing {name} neural patterns...")
+        scans = _run(executor, scan_dataset, datasets,
+                     lambda n: report("scan", n / len(datasets), datasets[n - 1][0]))
+        seed_texts = [d[0] for d in data]
+        term_counts, doc_counts = {}, {}
+        count_terms(seed_texts, term_counts, doc_counts)
+        label_counts = {}
+        for _, label in data:
+            label_counts[label] = label_counts.get(label, 0) + 1
+        for scan in scans:
+            for token, count in scan["term_counts"].items():
+                term_counts[token] = term_counts.get(token, 0) + count
+            for token, count in scan["doc_counts"].items():
+                doc_counts[token] = doc_counts.get(token, 0) + count
+            for label, count in scan["label_counts"].items():
+                label_counts[label] = label_counts.get(label, 0) + count
+        n_docs = len(data) + sum(scan["rows"] for scan in scans)
+        vocabulary, idf = select_vocabulary(term_counts, doc_counts, n_docs)
+        classes = np.array(sorted(label_counts))
+        report("scan", 1.0, f"{n_docs} messages, {len(vocabulary)} terms")
+
+        # --- 3. TRAIN CHATBOT/INTENT MODEL ---
+        print(f"PRIME_AI: Training Intent Engine on {n_docs} deep patterns...")
+        report("intent", 0.0, None)
+        class_index = {c: i for i, c in enumerate(classes)}
+        feature_counts = np.zeros((len(classes), len(vocabulary)))
+        class_counts = np.zeros(len(classes))
+        accumulate(fixed_vectorizer(vocabulary, idf), seed_texts, [d[1] for d in data],
+                   class_index, feature_counts, class_counts)
+        # Skipped datasets added nothing to the vocabulary or the class counts
+        counted = [dataset for dataset, scan in zip(datasets, scans) if not scan["skipped"]]
+        jobs = [(path, vocabulary, idf, classes) for _, path in counted]
+        for fc, cc in _run(executor, count_dataset, jobs,
+                           lambda n: report("intent", n / len(jobs), counted[n - 1][0])):
+            feature_counts += fc
+            class_counts += cc
+        vectorizer = fixed_vectorizer(vocabulary, idf)
+        clf_intent = intent_model_from_counts(feature_counts, class_counts, classes)
+        report("intent", 1.0, None)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    # --- 4. TRAIN ANOMALY DETECTION MODEL ---
+    baseline = np.concatenate([scan["baseline"] for scan in scans]) if scans else np.zeros((0, 5), dtype=np.int64)
+    if len(baseline) > ANOMALY_SAMPLE:
+        keep = np.random.default_rng(RANDOM_SEED).choice(len(baseline), ANOMALY_SAMPLE, replace=False)
+        baseline = baseline[np.sort(keep)]
+    print(f"PRIME_AI: Training Anomaly Engine on {len(baseline)} baseline samples...")
+    report("anomaly", 0.0, f"{len(baseline)} samples")
+    # Lower contamination for professional environments
+    clf_anomaly = IsolationForest(contamination=0.005, random_state=42, n_jobs=workers)
+    if len(baseline):
+        clf_anomaly.fit(baseline)
+    else:
+        print("Warning: No anomaly features collected. Falling back to dummy.")
+        clf_anomaly.fit(LogVectorizer.vectorize_batch(["service started", "session opened for user admin", "heartbeat ok"]))
+    report("anomaly", 1.0, None)
+
+    # --- 5. PERSISTENCE ---
+    # One versioned, memory-mappable bundle (see ai/bundle.py); the service
+    # picks it up through its CURRENT pointer.
+    report("export", 0.0, None)
+    bundle_path = export_bundle(vectorizer, clf_intent, clf_anomaly)
+    report("export", 1.0, bundle_path)
+    return {
+        "bundle": bundle_path,
+        "intent_patterns": n_docs,
+        "anomaly_baseline": len(baseline),
+        "anomaly_baseline_seen": sum(scan["baseline_seen"] for scan in scans),
+        "vocabulary": len(vocabulary),
+        "skipped_datasets": [scan["name"] for scan in scans if scan["skipped"]],
+        "seconds": round(time.perf_counter() - started, 2)
+    }
+
+# Share of a full run spent in each stage, for one overall progress figure
+STAGE_WEIGHTS = (("scan", 0.45), ("intent", 0.35), ("anomaly", 0.15), ("export", 0.05))
+
+def _print_progress(stage, fraction, detail):
+    done = 0.0
+    for name, weight in STAGE_WEIGHTS:
+        if name == stage:
+            done += weight * fraction
+            break
+        done += weight
+    # Parsed by training_jobs.py; flushed so the service sees it live
+    print("PROGRESS " + json.dumps({"stage": stage, "progress": round(done, 4), "detail": detail}), flush=True)
 
-for name, obj in artifacts.items():
-    path = os.path.join(os.path.dirname(__file__), name)
-    with open(path, 'wb') as f:
-        pickle.dump(obj, f)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SentinelX model training")
+    parser.add_argument("--workers", type=int, default=TRAIN_WORKERS)
+    parser.add_argument("--progress", action="store_true", help="emit machine-readable progress lines")
+    args = parser.parse_args()
 
-print(f"SUCCESS: SentinelX Neural Nexus Synchronized (v8.0 Deep Training).")
-print(f"- Total Intent Patterns: {len(data)}")
-print(f"- Anomaly Baseline Nodes: {len(anomaly_features)}")
+    print("--- PRIME_AI NEURAL CORE: LAYER 2 TRAINING (AUGMENTED PATTERNS) ---")
+    result = train(args.workers, _print_progress if args.progress else None)
+    print(f"SUCCESS: SentinelX Neural Nexus Synchronized (v8.0 Deep Training).")
+    print(f"- Model Bundle: {result['bundle']}")
+    print(f"- Total Intent Patterns: {result['intent_patterns']}")
+    print(f"- Anomaly Baseline Nodes: {result['anomaly_baseline']}")
+    print(f"- Training Time: {result['seconds']}s")
+    if args.progress:
+        print("RESULT " + json.dumps(result), flush=True)
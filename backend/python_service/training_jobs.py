@@ -0,0 +1,198 @@
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# --- SENTINELX TRAINING JOBS ---
+# Runs train_model.py in a child process off the request path. Jobs wait in
+# a bounded queue and run one at a time; progress lines from the trainer are
+# kept on the job and pushed to listeners. When a run succeeds the caller's
+# `on_success` swaps the service onto the new model bundle.
+
+TRAIN_SCRIPT = os.path.join(os.path.dirname(__file__), 'train_model.py')
+TRAIN_QUEUE_SIZE = int(os.getenv("TRAIN_QUEUE_SIZE", 4))
+TRAIN_JOB_TIMEOUT = float(os.getenv("TRAIN_JOB_TIMEOUT", 3600))
+TRAIN_JOB_HISTORY = int(os.getenv("TRAIN_JOB_HISTORY", 20))
+
+# Line prefixes written by `train_model.py --progress`
+PROGRESS_PREFIX = "PROGRESS "
+RESULT_PREFIX = "RESULT "
+
+TERMINAL_STATES = ("succeeded", "failed")
+
+class QueueFull(Exception):
+    pass
+
+class TrainingJobManager:
+    """
+    Bounded FIFO of training runs with one background worker.
+
+    Args:
+        on_success (callable): Called with the trainer's result dict before
+            the job is marked succeeded; its return value is stored as
+            `job["swap"]`. An exception fails the job.
+        on_event (callable): Called with a job snapshot on every state or
+            progress change.
+        queue_size (int): Jobs allowed to wait behind the running one.
+        timeout (float): Seconds before a run is killed.
+    """
+    def __init__(self, on_success=None, on_event=None, queue_size=TRAIN_QUEUE_SIZE,
+                 timeout=TRAIN_JOB_TIMEOUT, history=TRAIN_JOB_HISTORY, script=TRAIN_SCRIPT):
+        self.on_success = on_success
+        self.on_event = on_event
+        self.timeout = timeout
+        self.history = max(1, history)
+        self.script = script
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.active_job = None
+        self.stats = {"submitted": 0, "rejected_queue_full": 0, "succeeded": 0, "failed": 0}
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="training-jobs", daemon=True)
+                    self._thread.start()
+
+    def submit(self, params=None):
+        """
+        Queues a training run and returns its snapshot immediately.
+
+        Raises:
+            QueueFull: When `queue_size` jobs are already waiting.
+        """
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": "queued",
+            "stage": None,
+            "progress": 0.0,
+            "detail": None,
+            "params": dict(params or {}),
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "swap": None,
+            "error": None,
+        }
+        with self._lock:
+            try:
+                self._queue.put_nowait(job["id"])
+            except queue.Full:
+                self.stats["rejected_queue_full"] += 1
+                raise QueueFull(f"{self._queue.qsize()} training jobs already queued")
+            self._jobs[job["id"]] = job
+            self.stats["submitted"] += 1
+            self._trim()
+            snapshot = dict(job)
+        self._ensure_started()
+        self._publish(job)
+        return snapshot
+
+    def _trim(self):
+        # Caller must hold self._lock; only finished jobs are forgotten
+        finished = [jid for jid, j in self._jobs.items() if j["status"] in TERMINAL_STATES]
+        for jid in finished[:max(0, len(self._jobs) - self.history)]:
+            del self._jobs[jid]
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list_jobs(self):
+        with self._lock:
+            return [dict(j) for j in reversed(self._jobs.values())]
+
+    def _update(self, job, **fields):
+        with self._lock:
+            job.update(fields)
+        self._publish(job)
+
+    def _publish(self, job):
+        if self.on_event is None:
+            return
+        try:
+            self.on_event(self.get(job["id"]) or dict(job))
+        except Exception as e:
+            print(f"[TRAINING] Progress listener error: {e}")
+
+    def _command(self, job):
+        cmd = [sys.executable, self.script, "--progress"]
+        workers = job["params"].get("workers")
+        if workers:
+            cmd += ["--workers", str(int(workers))]
+        return cmd
+
+    def _train(self, job):
+        """
+        Runs the trainer, streaming its progress into the job. Returns the
+        trainer's result dict.
+        """
+        proc = subprocess.Popen(
+            self._command(job), cwd=os.path.dirname(self.script),
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, bufsize=1
+        )
+        # Kill runaway runs; the read loop below then sees EOF
+        timer = threading.Timer(self.timeout, proc.kill)
+        timer.start()
+        result = None
+        stderr_tail = []
+        drain = threading.Thread(target=lambda: stderr_tail.extend(proc.stderr), daemon=True)
+        drain.start()
+        try:
+            for line in proc.stdout:
+                if line.startswith(PROGRESS_PREFIX):
+                    event = json.loads(line[len(PROGRESS_PREFIX):])
+                    self._update(job, stage=event["stage"], progress=event["progress"], detail=event.get("detail"))
+                elif line.startswith(RESULT_PREFIX):
+                    result = json.loads(line[len(RESULT_PREFIX):])
+            returncode = proc.wait()
+        finally:
+            timer.cancel()
+            drain.join(timeout=1)
+        if returncode != 0 or result is None:
+            reason = "timed out" if returncode == -9 else f"exit code {returncode}"
+            raise RuntimeError(f"train_model.py failed ({reason}): {''.join(stderr_tail[-20:]).strip()}")
+        return result
+
+    def _run(self):
+        while True:
+            job_id = self._queue.get()
+            with self._lock:
+                job = self._jobs.get(job_id)
+            if job is None:
+                continue
+            self.active_job = job_id
+            self._update(job, status="running", started_at=time.time())
+            print(f"[TRAINING] Job {job_id} started.")
+            try:
+                result = self._train(job)
+                self._update(job, stage="swap", detail=result.get("bundle"))
+                swap = self.on_success(result) if self.on_success else None
+                self._update(job, status="succeeded", stage="done", progress=1.0, result=result, swap=swap,
+                             finished_at=time.time())
+                self.stats["succeeded"] += 1
+                print(f"[TRAINING] Job {job_id} succeeded ({result.get('bundle')}).")
+            except Exception as e:
+                self._update(job, status="failed", error=str(e), finished_at=time.time())
+                self.stats["failed"] += 1
+                print(f"[TRAINING] Job {job_id} failed: {e}")
+            finally:
+                self.active_job = None
+                with self._lock:
+                    self._trim()
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["active_job"] = self.active_job
+        return stats
@@ -0,0 +1,29 @@
+import importlib
+
+# --- NATIVE THREADING ---
+# gunicorn's eventlet worker monkey-patches the standard library before the
+# app is imported: threading and queue then hand out green locks, queues and
+# threads, all of which run on the hub's one OS thread. CPU-bound scoring
+# runs on native threads instead (python_service/offload.py), and a green
+# lock or queue cannot be waited on from a native thread. Everything that
+# work shares (locks, queues, the batching, learning and sealing threads)
+# therefore comes from the unpatched modules below. Without monkey patching
+# they are simply the standard modules.
+
+def original(name):
+    """
+    Returns the standard module `name` as it was before eventlet patched it.
+
+    Args:
+        name (str): 'threading' or 'queue'.
+    """
+    try:
+        from eventlet import patcher
+    except ImportError:
+        return importlib.import_module(name)
+    if not patcher.is_monkey_patched('thread'):
+        return importlib.import_module(name)
+    return patcher.original(name)
+
+threading = original('threading')
+queue = original('queue')
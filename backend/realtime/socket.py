@@ -1,48 +1,401 @@
+import os
+import threading
+import time
+from collections import deque
+
 from flask_socketio import SocketIO, emit
 from flask import request
 
+from realtime import native
+
 # --- REALTIME SYNC ENGINE ---
-# Maintains active neural links between Python Core and UI
+# Maintains active neural links between Python Core and UI.
+# Request handlers never emit: send_log_to_clients() only queues telemetry
+# and a background task flushes the queue every BROADCAST_INTERVAL_MS,
+# filtered by each client's subscription and thinned when the client stops
+# acknowledging. Clients get one 'realtime_log' event per line, as they
+# always have, unless they subscribe with "batch": true to receive one
+# 'realtime_log_batch' frame per flush instead.
+
+BROADCAST_QUEUE_SIZE = int(os.getenv("BROADCAST_QUEUE_SIZE", 10000))
+BROADCAST_INTERVAL_MS = float(os.getenv("BROADCAST_INTERVAL_MS", 100))
+BROADCAST_BATCH_MAX = int(os.getenv("BROADCAST_BATCH_MAX", 500))
+# Unacknowledged frames a client may have before it is considered behind
+BROADCAST_CLIENT_WINDOW = int(os.getenv("BROADCAST_CLIENT_WINDOW", 4))
+# Events per frame still sent to a client that is behind (priority first)
+BROADCAST_SAMPLE_SIZE = int(os.getenv("BROADCAST_SAMPLE_SIZE", 20))
+
+PRIORITY_SEVERITIES = ('ERROR', 'CRITICAL')
+
 socket_instance = None
 connected_clients = set()
 
-def setup_socket(app):
+class Subscription:
+    """
+    What one client wants to see. Empty filters match everything.
+
+    Args:
+        severities (list): Severities to keep (e.g. ["ERROR", "WARN"]).
+        sources (list): Sources / devices to keep.
+        anomaly_only (bool): Keep only events flagged as anomalies.
+        ack (bool): The client acknowledges frames, enabling backpressure.
+        batch (bool): One 'realtime_log_batch' frame per flush instead of
+            one 'realtime_log' event per line.
+    """
+    def __init__(self, severities=None, sources=None, anomaly_only=False, ack=False, batch=False):
+        self.severities = frozenset(str(s).upper() for s in severities or ())
+        self.sources = frozenset(sources or ())
+        self.anomaly_only = bool(anomaly_only)
+        self.ack = bool(ack)
+        self.batch = bool(batch)
+
+    @classmethod
+    def from_payload(cls, payload):
+        payload = payload if isinstance(payload, dict) else {}
+        return cls(payload.get('severities'), payload.get('sources'),
+                   payload.get('anomaly_only', False), payload.get('ack', False), payload.get('batch', False))
+
+    @property
+    def key(self):
+        # Clients with equal filters share one filtering pass per frame
+        return (self.severities, self.sources, self.anomaly_only)
+
+    def matches(self, event):
+        if self.anomaly_only and not event.get('is_anomaly'):
+            return False
+        if self.severities and str(event.get('severity', '')).upper() not in self.severities:
+            return False
+        if self.sources and event.get('source') not in self.sources:
+            return False
+        return True
+
+    def to_dict(self):
+        return {"severities": sorted(self.severities), "sources": sorted(self.sources),
+                "anomaly_only": self.anomaly_only, "ack": self.ack, "batch": self.batch}
+
+def is_priority(event):
+    return bool(event.get('is_anomaly')) or str(event.get('severity', '')).upper() in PRIORITY_SEVERITIES
+
+class _Client:
+    __slots__ = ("subscription", "inflight", "dropped", "seq")
+
+    def __init__(self, subscription):
+        self.subscription = subscription
+        self.inflight = 0
+        # Events withheld since the last frame this client received
+        self.dropped = 0
+        self.seq = 0
+
+class BroadcastPipeline:
+    """
+    Bounded queue of outgoing telemetry, drained into one frame (or run of
+    'realtime_log' events) per client and flush.
+
+    Args:
+        emit_fn (callable): emit_fn(event, payload, sid, callback) sends one
+            message to one client; callback (or None) is the ack handler.
+        start_fn (callable): Starts the drain loop as a background task.
+        sleep_fn (callable): Sleeps between flushes (cooperative under
+            eventlet).
+    """
+    def __init__(self, emit_fn, start_fn=None, sleep_fn=time.sleep, queue_size=BROADCAST_QUEUE_SIZE,
+                 interval_ms=BROADCAST_INTERVAL_MS, batch_max=BROADCAST_BATCH_MAX,
+                 window=BROADCAST_CLIENT_WINDOW, sample_size=BROADCAST_SAMPLE_SIZE):
+        self.emit_fn = emit_fn
+        self.start_fn = start_fn or (lambda fn: threading.Thread(target=fn, name="broadcast", daemon=True).start())
+        self.sleep_fn = sleep_fn
+        self.queue_size = max(1, queue_size)
+        self.interval = max(1.0, interval_ms) / 1000.0
+        self.batch_max = max(1, batch_max)
+        self.window = max(1, window)
+        self.sample_size = max(0, sample_size)
+        self._queue = deque()
+        self._clients = {}
+        # Producers include native offload threads; the drain loop stays a
+        # green task because it emits
+        self._lock = native.threading.Lock()
+        self._started = False
+        # Optional on_flush(seconds, events) timing hook
+        self.on_flush = None
+        self.stats = {
+            "enqueued": 0,
+            "dropped_queue_full": 0,
+            "dropped_no_clients": 0,
+            "dropped_backpressure": 0,
+            "sampled_frames": 0,
+            "frames": 0,
+            "events_sent": 0,
+            "updates_sent": 0,
+            "flushes": 0,
+            "emit_errors": 0,
+            "emit_latency_ms_total": 0.0,
+            "emit_latency_ms_max": 0.0,
+            "flush_ms_total": 0.0
+        }
+
+    # --- Client registry ---
+    def add_client(self, sid, subscription=None):
+        with self._lock:
+            self._clients[sid] = _Client(subscription or Subscription())
+        # Started from the connect handler, on the event loop: publish()
+        # may run on a native thread, where a green task cannot be spawned
+        self._ensure_started()
+
+    def remove_client(self, sid):
+        with self._lock:
+            self._clients.pop(sid, None)
+
+    def subscribe(self, sid, subscription):
+        with self._lock:
+            client = self._clients.get(sid)
+            if client is None:
+                client = self._clients[sid] = _Client(subscription)
+            client.subscription = subscription
+            # A new window starts with the new subscription
+            client.inflight = 0
+
+    def _ack(self, sid):
+        def callback(*args):
+            with self._lock:
+                client = self._clients.get(sid)
+                if client is not None and client.inflight > 0:
+                    client.inflight -= 1
+        return callback
+
+    # --- Producer side ---
+    def publish(self, event):
+        """
+        Queues one event without blocking. Returns False when it was dropped.
+        """
+        if not self._clients:
+            self.stats["dropped_no_clients"] += 1
+            return False
+        with self._lock:
+            if len(self._queue) >= self.queue_size:
+                self.stats["dropped_queue_full"] += 1
+                return False
+            self._queue.append((time.monotonic(), event))
+            self.stats["enqueued"] += 1
+        self._ensure_started()
+        return True
+
+    def send_update(self, event):
+        """
+        Emits one 'realtime_log' event at once to every client whose
+        subscription matches, batching or not, outside the queue and
+        backpressure. For follow-ups of an event clients already have
+        (a late LLM explanation), which must not be sampled away.
+
+        Returns:
+            int: Clients it was sent to.
+        """
+        with self._lock:
+            clients = list(self._clients.items())
+        sent = 0
+        for sid, client in clients:
+            if not client.subscription.matches(event):
+                continue
+            try:
+                self.emit_fn('realtime_log', event, sid, None)
+                sent += 1
+            except Exception as e:
+                self.stats["emit_errors"] += 1
+                print(f"[REALTIME] Emit to {sid} failed: {e}")
+        self.stats["updates_sent"] += sent
+        return sent
+
+    def _ensure_started(self):
+        if not self._started:
+            with self._lock:
+                if self._started:
+                    return
+                self._started = True
+            self.start_fn(self._run)
+
+    # --- Drain side ---
+    def _run(self):
+        while True:
+            self.sleep_fn(self.interval)
+            try:
+                while self.flush() >= self.batch_max:
+                    pass
+            except Exception as e:
+                print(f"[REALTIME] Broadcast flush error: {e}")
+
+    def _take(self):
+        with self._lock:
+            n = min(len(self._queue), self.batch_max)
+            batch = [self._queue.popleft() for _ in range(n)]
+            clients = list(self._clients.items())
+        return batch, clients
+
+    def _frame_for(self, client, events):
+        """
+        Returns the events to send to one client, or None to skip the frame.
+        """
+        if not client.subscription.ack or client.inflight < self.window:
+            return events
+        self.stats["sampled_frames"] += 1
+        if client.inflight >= 2 * self.window:
+            # Far behind: withhold the whole frame
+            return None
+        # Behind: keep anomalies and errors first, up to the sample size
+        priority = [e for e in events if is_priority(e)]
+        rest = [e for e in events if not is_priority(e)]
+        return (priority + rest)[:self.sample_size]
+
+    def flush(self):
+        """
+        Sends everything queued so far (up to batch_max events) as one frame
+        per client. Returns the number of events taken from the queue.
+        """
+        started = time.perf_counter()
+        batch, clients = self._take()
+        if not batch:
+            return 0
+        events = [event for _, event in batch]
+        now = time.monotonic()
+
+        filtered = {}
+        for sid, client in clients:
+            key = client.subscription.key
+            if key not in filtered:
+                filtered[key] = [e for e in events if client.subscription.matches(e)]
+            selected = filtered[key]
+            if not selected:
+                continue
+            frame_events = self._frame_for(client, selected) or []
+            withheld = len(selected) - len(frame_events)
+            self.stats["dropped_backpressure"] += withheld
+            client.dropped += withheld
+            if not frame_events:
+                continue
+
+            callback = None
+            if client.subscription.ack:
+                with self._lock:
+                    client.inflight += 1
+                callback = self._ack(sid)
+            try:
+                if client.subscription.batch:
+                    client.seq += 1
+                    frame = {"seq": client.seq, "events": frame_events, "dropped": client.dropped}
+                    self.emit_fn('realtime_log_batch', frame, sid, callback)
+                else:
+                    # One event per line; the flush's ack rides on the last
+                    last = len(frame_events) - 1
+                    for i, event in enumerate(frame_events):
+                        self.emit_fn('realtime_log', event, sid, callback if i == last else None)
+                client.dropped = 0
+                self.stats["frames"] += 1
+                self.stats["events_sent"] += len(frame_events)
+            except Exception as e:
+                self.stats["emit_errors"] += 1
+                print(f"[REALTIME] Emit to {sid} failed: {e}")
+
+        # Queue wait: enqueue to flush
+        self.stats["emit_latency_ms_total"] += sum(now - queued for queued, _ in batch) * 1000
+        self.stats["emit_latency_ms_max"] = max(self.stats["emit_latency_ms_max"], round((now - batch[0][0]) * 1000, 3))
+        elapsed = time.perf_counter() - started
+        self.stats["flushes"] += 1
+        self.stats["flush_ms_total"] += elapsed * 1000
+        if self.on_flush is not None:
+            self.on_flush(elapsed, len(batch))
+        return len(batch)
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        taken = stats["enqueued"] - len(self._queue)
+        stats["emit_latency_ms_avg"] = round(stats["emit_latency_ms_total"] / taken, 3) if taken else 0.0
+        stats["flush_ms_avg"] = round(stats["flush_ms_total"] / stats["flushes"], 3) if stats["flushes"] else 0.0
+        stats["queue_depth"] = len(self._queue)
+        stats["clients"] = len(self._clients)
+        stats["lagging_clients"] = sum(1 for c in list(self._clients.values())
+                                       if c.subscription.ack and c.inflight >= self.window)
+        return stats
+
+broadcaster = None
+
+def setup_socket(app, on_flush=None):
     """
     Configures Socket.IO for the Flask application.
-    
+
     Args:
         app (Flask): The main Flask application instance.
-        
+        on_flush (callable): Optional on_flush(seconds, events) called after
+            every broadcast flush.
+
     Returns:
         SocketIO: The initialized socket instance.
     """
-    global socket_instance
+    global socket_instance, broadcaster
     socket_instance = SocketIO(app, cors_allowed_origins="*")
 
+    def emit_frame(event, payload, sid, callback):
+        socket_instance.emit(event, payload, to=sid, callback=callback)
+
+    # Drained by a Socket.IO background task so it cooperates with the
+    # server's async mode (threads or green threads)
+    broadcaster = BroadcastPipeline(emit_frame, socket_instance.start_background_task, socket_instance.sleep)
+    broadcaster.on_flush = on_flush
+
     @socket_instance.on('connect')
     def on_connect():
         # Track the Session ID for regional monitoring
         connected_clients.add(request.sid)
+        broadcaster.add_client(request.sid)
         print(f"[REALTIME] Neural Handshake Established: {request.sid}")
 
     @socket_instance.on('disconnect')
     def on_disconnect():
         # Purge the Session ID from the active matrix
         connected_clients.discard(request.sid)
+        broadcaster.remove_client(request.sid)
         print(f"[REALTIME] Neural Link Severed: {request.sid}")
 
+    @socket_instance.on('subscribe')
+    def on_subscribe(payload=None):
+        # Server-side filtering: {"severities": [...], "sources": [...], "anomaly_only": bool, "ack": bool,
+        # "batch": bool}
+        subscription = Subscription.from_payload(payload)
+        broadcaster.subscribe(request.sid, subscription)
+        emit('subscribed', subscription.to_dict())
+
     return socket_instance
 
 def send_log_to_clients(log_data):
     """
-    Broadcasts processed log telemetry to all authenticated UI clients.
-    
+    Queues processed log telemetry for the next flush. Never blocks the
+    caller; returns False when the event was dropped.
+
     Args:
         log_data (dict): The structured log forensic data.
     """
+    if broadcaster is None:
+        return False
+    return broadcaster.publish(log_data)
+
+def send_log_update(log_data):
+    """
+    Sends an update of an already broadcast event (same `event_id`) as a
+    'realtime_log' event right away, exempt from batching and backpressure.
+
+    Args:
+        log_data (dict): The updated log forensic data.
+    """
+    if broadcaster is None:
+        return 0
+    return broadcaster.send_update(log_data)
+
+def get_broadcast_stats():
+    return broadcaster.get_stats() if broadcaster else None
+
+def send_training_event(job):
+    """
+    Streams a training job snapshot (status, stage, progress) to UI clients.
+
+    Args:
+        job (dict): The job as returned by the training job manager.
+    """
     if socket_instance:
-        # Emit over the 'realtime_log' channel for frontend capturing
-        socket_instance.emit('realtime_log', log_data)
-        print(f"[REALTIME] Telemetry broadcasted to {len(connected_clients)} active nodes.")
-    else:
-        print("[REALTIME] Error: Socket instance not initialized.")
+        socket_instance.emit('training_progress', job)
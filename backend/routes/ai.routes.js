@@ -9,9 +9,20 @@ const PYTHON_URL = process.env.PYTHON_URL || 'http://127.0.0.1:5000';
 
 router.post('/train', authorize(['super_admin', 'admin']), async (req, res) => {
     try {
+        // Returns 202 with a job id; training runs in the background
         const response = await fetch(`${PYTHON_URL}/ai/train`, { method: 'POST' });
         const data = await response.json();
-        res.json(data);
+        res.status(response.status).json(data);
+    } catch (e) {
+        res.status(500).json({ error: "AI Service Unreachable" });
+    }
+});
+
+router.get('/train/jobs/:id', authorize(['super_admin', 'admin']), async (req, res) => {
+    try {
+        const response = await fetch(`${PYTHON_URL}/ai/train/jobs/${encodeURIComponent(req.params.id)}`);
+        const data = await response.json();
+        res.status(response.status).json(data);
     } catch (e) {
         res.status(500).json({ error: "AI Service Unreachable" });
     }
@@ -13,6 +13,7 @@ router.get("/", (req, res) => {
 
 // ✅ LOGGING & FORENSICS (Point 10 Premium)
 router.post("/log", logController.receiveLog);
+router.post("/logs/batch", logController.receiveLogBatch);
 router.get("/logs", authorize(), logController.getLogs);
 router.get("/logs/timeline", authorize(), logController.getTimeline);
 router.get("/logs/history", authorize(), logController.getLogs);
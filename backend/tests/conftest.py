@@ -0,0 +1,48 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+# The service modules import each other by bare name (python_service and
+# agents run as script directories) and the shared packages from backend/
+BACKEND = os.path.join(os.path.dirname(__file__), '..')
+for path in (BACKEND, os.path.join(BACKEND, 'python_service'), os.path.join(BACKEND, 'agents')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+# Set before collection imports anything: the archive and result cache bind
+# their default directories at import, and must never point into the repo
+SCRATCH = tempfile.mkdtemp(prefix="sentinelx_tests_")
+os.environ.update(ARCHIVE_DIR=os.path.join(SCRATCH, "archive"), RESULT_CACHE_DIR=os.path.join(SCRATCH, "cache"))
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(SCRATCH, ignore_errors=True)
+
+@pytest.fixture(scope="session")
+def service():
+    # Imported once: it wires module-level state
+    import app
+    return app
+
+@pytest.fixture
+def app_module(service, tmp_path, monkeypatch):
+    """
+    The Flask service with an empty archive, result cache, template miner,
+    correlation engine and overload controller for each test.
+    """
+    from ai import templates
+    from ai.correlation import CorrelationEngine
+    import analysis_engine
+    import log_archive
+
+    service.open_stores(str(tmp_path / "archive"), str(tmp_path / "cache"))
+    service.overload_control.reset()
+    templates.reset_miner()
+    monkeypatch.setattr(service, "correlation_engine", CorrelationEngine())
+    yield service
+    # Let background sealers finish before the directory goes
+    log_archive.drain()
+    # Upload workers keep their own miners
+    analysis_engine.reset_pool()
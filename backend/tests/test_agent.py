@@ -0,0 +1,127 @@
+import gzip
+import json
+import os
+import time
+
+import pytest
+import requests
+
+import agent
+
+class Response:
+    def __init__(self, status, headers=None):
+        self.status_code = status
+        self.headers = headers or {}
+        self.text = ""
+
+class ScriptedSession:
+    """
+    Answers posts from a script of statuses (or exceptions), then with
+    `default`; records the events of every accepted batch.
+    """
+    def __init__(self, script=(), default=201):
+        self.script = list(script)
+        self.default = default
+        self.delivered = []
+        self.posts = 0
+
+    def post(self, url, data=None, timeout=None, headers=None):
+        self.posts += 1
+        outcome = self.script.pop(0) if self.script else self.default
+        if isinstance(outcome, Exception):
+            raise outcome
+        status, response_headers = outcome if isinstance(outcome, tuple) else (outcome, None)
+        if 200 <= status < 300:
+            self.delivered.extend(json.loads(gzip.decompress(data)))
+        return Response(status, response_headers)
+
+EMPTY = gzip.compress(b"[]")
+
+def wait_for(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+def make_shipper(spool_dir, session, **kwargs):
+    options = dict(batch_events=5, flush_interval_ms=5, backoff_min=0.01, backoff_max=0.02)
+    options.update(kwargs)
+    return agent.Shipper("http://ingest.invalid/api/logs/batch", agent.Spool(str(spool_dir)), session, **options)
+
+def test_spool_resumes_in_order_and_caps_its_size(tmp_path):
+    spool = agent.Spool(str(tmp_path), max_bytes=10)
+    for i in range(3):
+        spool.push(f"batch{i}".encode(), i + 1)
+    # Past the cap the oldest batches go first; the newest always stays
+    assert len(spool) == 1 and spool.dropped_events == 3
+    (tmp_path / "000000000099-7.json.gz.tmp").write_bytes(b"half written")
+    spool.max_bytes = 1 << 20
+    spool.push(b"batch3", 4)
+
+    reopened = agent.Spool(str(tmp_path))
+    assert len(reopened) == 2 and reopened.events == 7
+    path, count, payload = reopened.peek()
+    assert (count, payload) == (3, b"batch2")
+    reopened.remove(path)
+    assert reopened.peek()[1:] == (4, b"batch3")
+    # New batches are numbered after the resumed backlog
+    reopened.push(b"batch4", 5)
+    assert os.path.basename(reopened._segments[-1][1]) == "000000000004-5.json.gz"
+
+@pytest.mark.parametrize("outcome, done", [
+    (201, True), (400, True), (413, True),
+    (408, False), (429, False), (500, False), (502, False), (503, False), (504, False),
+    (requests.ConnectionError("refused"), False), (requests.Timeout("slow"), False),
+])
+def test_responses_are_classified_as_done_or_retry(tmp_path, outcome, done):
+    shipper = make_shipper(tmp_path, ScriptedSession([outcome]))
+    assert shipper._post(EMPTY, 3) is done
+    stats = shipper.stats
+    if not done:
+        assert stats["send_errors"] == 1 and shipper._retry_at > time.monotonic() - 1
+    elif outcome == 201:
+        assert stats["events_sent"] == 3 and stats["batches_sent"] == 1
+    else:
+        # Permanently rejected: not retried, not counted as sent
+        assert stats["events_rejected"] == 3 and stats["events_sent"] == 0
+
+def test_retry_after_is_honoured_and_backoff_grows(tmp_path):
+    shipper = make_shipper(tmp_path, ScriptedSession([(429, {"Retry-After": "5"}), 503, 503, 201]),
+                           backoff_min=0.5, backoff_max=4)
+    shipper._post(EMPTY, 1)
+    assert shipper._retry_at - time.monotonic() > 4.5
+    shipper._post(EMPTY, 1)
+    shipper._post(EMPTY, 1)
+    assert shipper._backoff == 2.0
+    shipper._post(EMPTY, 1)
+    assert shipper._backoff == 0.0
+
+def test_batches_spooled_during_an_outage_are_replayed_in_order(tmp_path):
+    outage = [requests.ConnectionError("down")] * 3 + [503] * 2
+    session = ScriptedSession(outage)
+    shipper = make_shipper(tmp_path, session).start()
+    events = [{"message": f"line {i}", "severity": "INFO"} for i in range(40)]
+    for event in events:
+        shipper.offer(event)
+    wait_for(lambda: len(session.delivered) == len(events))
+    shipper.close(timeout=10)
+    stats = shipper.get_stats()
+    assert session.delivered == events
+    assert stats["spooled_batches"] > 0 and stats["retries"] > 0
+    assert stats["spool_batches"] == 0 and stats["events_sent"] == 40
+
+def test_a_restarted_agent_delivers_the_backlog_first(tmp_path):
+    first = make_shipper(tmp_path, ScriptedSession(default=503)).start()
+    for i in range(12):
+        first.offer({"message": f"old {i}"})
+    # The uplink never recovers: close spools what is left
+    first.close(timeout=10)
+    assert not first._thread.is_alive()
+    assert agent.Spool(str(tmp_path)).events == 12
+
+    session = ScriptedSession()
+    second = make_shipper(tmp_path, session).start()
+    second.offer({"message": "new 0"})
+    wait_for(lambda: len(session.delivered) == 13)
+    second.close(timeout=10)
+    assert [e["message"] for e in session.delivered] == [f"old {i}" for i in range(12)] + ["new 0"]
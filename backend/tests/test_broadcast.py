@@ -0,0 +1,79 @@
+from realtime.socket import BroadcastPipeline, Subscription
+
+def make_pipeline(**kwargs):
+    sent = []
+    pipeline = BroadcastPipeline(lambda event, payload, sid, callback: sent.append((event, payload, sid, callback)),
+                                 start_fn=lambda fn: None, **kwargs)
+    return pipeline, sent
+
+EVENTS = [{"message": "disk ok", "severity": "INFO", "source": "node1"},
+          {"message": "kernel panic", "severity": "ERROR", "source": "node2"},
+          {"message": "odd login", "severity": "WARN", "source": "node1", "is_anomaly": True}]
+
+def test_clients_get_one_realtime_log_per_event_by_default():
+    pipeline, sent = make_pipeline()
+    pipeline.add_client("legacy")
+    for event in EVENTS:
+        pipeline.publish(event)
+    assert pipeline.flush() == 3
+    assert [(e, p) for e, p, _, _ in sent] == [("realtime_log", event) for event in EVENTS]
+
+def test_batch_subscribers_get_one_frame_per_flush():
+    pipeline, sent = make_pipeline()
+    pipeline.add_client("new", Subscription(batch=True))
+    pipeline.add_client("legacy")
+    for event in EVENTS:
+        pipeline.publish(event)
+    pipeline.flush()
+    frames = [p for e, p, sid, _ in sent if sid == "new"]
+    assert [e for e, _, sid, _ in sent if sid == "new"] == ["realtime_log_batch"]
+    assert frames[0] == {"seq": 1, "events": EVENTS, "dropped": 0}
+    assert sum(1 for _, _, sid, _ in sent if sid == "legacy") == 3
+
+def test_subscription_filters_apply_to_both_delivery_modes():
+    pipeline, sent = make_pipeline()
+    pipeline.add_client("errors", Subscription(severities=["error"]))
+    pipeline.add_client("anomalies", Subscription(anomaly_only=True, batch=True))
+    for event in EVENTS:
+        pipeline.publish(event)
+    pipeline.flush()
+    by_sid = {sid: payload for _, payload, sid, _ in sent}
+    assert by_sid["errors"] == EVENTS[1]
+    assert by_sid["anomalies"]["events"] == [EVENTS[2]]
+
+def test_lagging_ack_clients_are_sampled_then_withheld():
+    pipeline, sent = make_pipeline(window=1, sample_size=1)
+    pipeline.add_client("slow", Subscription(ack=True))
+    for _ in range(3):
+        for event in EVENTS:
+            pipeline.publish(event)
+        pipeline.flush()
+    # Full run, then one priority event, then nothing until acked
+    assert [p for _, p, _, _ in sent] == EVENTS + [EVENTS[1]]
+    assert pipeline.stats["dropped_backpressure"] == 2 + 3
+    # Only the last event of each run carries the ack callback
+    assert [cb is not None for _, _, _, cb in sent] == [False, False, True, True]
+    sent[-1][3]()
+    sent[2][3]()
+    pipeline.publish(EVENTS[0])
+    pipeline.flush()
+    assert sent[-1][1] == EVENTS[0]
+
+def test_events_without_clients_are_not_queued():
+    pipeline, sent = make_pipeline()
+    assert pipeline.publish(EVENTS[0]) is False
+    assert pipeline.flush() == 0 and not sent
+
+def test_updates_skip_the_queue_and_backpressure():
+    pipeline, sent = make_pipeline(window=1, sample_size=0)
+    pipeline.add_client("slow", Subscription(ack=True, batch=True))
+    pipeline.add_client("warn_only", Subscription(severities=["WARN"]))
+    pipeline.publish(EVENTS[1])
+    pipeline.publish(EVENTS[1])
+    pipeline.flush()
+    pipeline.flush()
+    del sent[:]
+    # "slow" is behind and would get nothing from a flush
+    assert pipeline.send_update(dict(EVENTS[1], explanation="late")) == 1
+    assert sent == [("realtime_log", dict(EVENTS[1], explanation="late"), "slow", None)]
+    assert pipeline.stats["updates_sent"] == 1
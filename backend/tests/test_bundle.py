@@ -0,0 +1,73 @@
+import os
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import IsolationForest
+from sklearn.naive_bayes import MultinomialNB
+
+from ai import bundle
+from ai.anomaly import LogVectorizer
+from train_model import _vectorizer, label_intents
+
+VAULT = os.path.join(os.path.dirname(__file__), '..', 'data', 'training_vault')
+
+@pytest.fixture(scope="module")
+def models(tmp_path_factory):
+    """
+    Vault-trained sklearn models, reloaded from joblib files, and the
+    bundle exported from them.
+    """
+    lines = bundle._vault_lines(VAULT)[::4]
+    if not lines:
+        pytest.skip("training vault not available")
+    texts = [line.lower() for line in lines]
+    vectorizer = _vectorizer().fit(texts)
+    intent = MultinomialNB(alpha=0.1).fit(vectorizer.transform(texts), label_intents(texts))
+    forest = IsolationForest(n_estimators=50, contamination=0.005, random_state=42).fit(
+        LogVectorizer.vectorize_batch(lines))
+
+    root = tmp_path_factory.mktemp("models")
+    joblib.dump((vectorizer, intent, forest), root / "models.joblib")
+    path = bundle.export_bundle(vectorizer, intent, forest, root=str(root / "bundles"), version="test")
+    return lines, joblib.load(root / "models.joblib"), bundle.ModelBundle(path)
+
+def test_parity_report_is_clean_on_the_vault(models):
+    lines, (_, _, forest), _ = models
+    report = bundle.forest_parity(forest, lines, timing_rows=50)
+    assert report["ok"], report
+    assert report["features_match"] and report["single_equals_batch"] and report["flag_mismatches"] == 0
+
+def test_bundle_forest_scores_like_the_joblib_forest(models):
+    lines, (_, _, forest), loaded = models
+    X = LogVectorizer.vectorize_batch(lines)
+    flat = loaded.forest
+    expected = forest.score_samples(X)
+    assert np.max(np.abs(flat.score_samples(X) - expected)) <= 1e-12
+    assert np.array_equal(flat.predict(X), forest.predict(X))
+    assert flat.offset_ == forest.offset_
+
+def test_single_rows_score_like_the_batch(models):
+    lines, _, loaded = models
+    X = LogVectorizer.vectorize_batch(lines[:500])
+    batch = loaded.forest.score_samples(X)
+    # Twice: cold cells, then memoized ones
+    for _ in range(2):
+        assert [loaded.forest.score_one(row) for row in X.tolist()] == batch.tolist()
+    assert loaded.forest.stats["cell_hits"] >= 500
+
+@pytest.mark.parametrize("line", ["", None, "x" * 5000, "Failed password for root from 10.0.0.1 port 22",
+                                  "ÜBER error: naïve café at 192.168.1.1 -> code=503", "panic!!! ;;; $$ 12 34"])
+def test_single_line_features_match_the_batch(line):
+    assert LogVectorizer.vectorize_one(line) == tuple(LogVectorizer.vectorize_batch([line])[0].tolist())
+
+def test_bundle_vectorizer_and_intents_match_sklearn(models):
+    lines, (vectorizer, intent, _), loaded = models
+    texts = lines[:2000]
+    expected = vectorizer.transform(texts)
+    got = loaded.vectorizer.transform(texts)
+    dense = np.zeros(got.shape)
+    for i in range(got.shape[0]):
+        dense[i, got.indices[got.indptr[i]:got.indptr[i + 1]]] = got.data[got.indptr[i]:got.indptr[i + 1]]
+    assert np.allclose(dense, expected.toarray(), rtol=0, atol=1e-12)
+    assert np.array_equal(loaded.intent_model.predict(got), intent.predict(expected))
@@ -0,0 +1,66 @@
+import random
+
+from ai.correlation import CorrelationEngine, TopK, WindowedSketch, template_key
+
+def engine(**kwargs):
+    options = dict(window=60, buckets=12, memory_mb=0.25, brute_force_threshold=5, ip_flood_threshold=50,
+                   burst_threshold=30, clock=None)
+    options.update(kwargs)
+    return CorrelationEngine(**options)
+
+def test_brute_force_needs_failures_from_one_ip():
+    corr = engine()
+    for i in range(4):
+        assert corr.observe(ip="10.0.0.9", auth_failure=True, now=i)["detections"] == []
+        # Successes and other IPs do not count towards it
+        corr.observe(ip="10.0.0.9", now=i)
+        corr.observe(ip=f"10.0.1.{i}", auth_failure=True, now=i)
+    result = corr.observe(ip="10.0.0.9", auth_failure=True, now=5)
+    assert result["ip_failures"] == 5 and result["detections"] == ["brute_force"]
+
+def test_counts_leave_the_window():
+    corr = engine()
+    for i in range(4):
+        corr.observe(ip="10.0.0.9", auth_failure=True, now=i)
+    # Four failures a minute ago, one now: below the threshold
+    assert corr.observe(ip="10.0.0.9", auth_failure=True, now=70)["ip_failures"] == 1
+
+def test_floods_and_bursts_are_flagged_per_key():
+    corr = engine()
+    detections = set()
+    for i in range(50):
+        detections.update(corr.observe(ip="10.0.0.1", template=template_key(f"GET /item/{i} 200"), now=i / 10)[
+            "detections"])
+    assert detections == {"ip_flood", "burst"}
+    assert corr.get_stats()["top"]["ip"][0] == {"key": "10.0.0.1", "count": 50}
+
+def test_weights_stand_for_sampled_events():
+    corr = engine()
+    assert corr.observe(ip="10.0.0.2", auth_failure=True, now=0, weight=5)["detections"] == ["brute_force"]
+
+def test_sketch_never_undercounts_and_stays_close():
+    rng = random.Random(0)
+    sketch = WindowedSketch(width=256, depth=4, window=1000, buckets=4)
+    truth = {}
+    sketch.advance(0)
+    for _ in range(5000):
+        key = f"k{int(rng.paretovariate(1.2)) % 2000}"
+        truth[key] = truth.get(key, 0) + 1
+        sketch.add(key, 0)
+    errors = [sketch.estimate(k) - n for k, n in truth.items()]
+    assert min(errors) >= 0
+    # e/width of the events, for most keys
+    assert sorted(errors)[int(len(errors) * 0.9)] <= 5000 * 2.72 / 256
+
+def test_top_k_keeps_the_heaviest_keys():
+    top = TopK(3)
+    for key, n in [("a", 1), ("b", 5), ("c", 2), ("d", 9), ("e", 1), ("c", 7)]:
+        top.offer(key, n)
+    assert [k for k, _ in top.items()] == ["d", "c", "b"]
+
+def test_memory_is_fixed_by_the_budget():
+    small, large = engine(memory_mb=0.25), engine(memory_mb=2)
+    for i in range(2000):
+        small.observe(ip=f"10.{i % 256}.{i // 256}.1", now=i / 100)
+    assert small.get_stats()["memory_bytes"] <= 0.25 * (1 << 20)
+    assert large.get_stats()["sketch_width"] > small.get_stats()["sketch_width"]
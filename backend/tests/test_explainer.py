@@ -0,0 +1,138 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from explainer import CircuitBreaker, ExplanationPipeline, TTLCache
+
+class StubOllama:
+    """
+    Minimal /api/generate: answers {"response": ...}, or 500 while
+    `failing`, and holds every request while `gate` is cleared.
+    """
+    def __init__(self):
+        self.prompts = []
+        self.failing = False
+        self.gate = threading.Event()
+        self.gate.set()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                stub.prompts.append(body["prompt"])
+                stub.gate.wait(10)
+                if stub.failing:
+                    self.send_response(500)
+                    self.end_headers()
+                    return
+                data = json.dumps({"response": f"explained #{len(stub.prompts)}"}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/api/generate"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.gate.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def stub():
+    server = StubOllama()
+    yield server
+    server.close()
+
+class Answers:
+    def __init__(self):
+        self.texts = []
+        self.done = threading.Event()
+
+    def __call__(self, text):
+        self.texts.append(text)
+        self.done.set()
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+def test_identical_prompts_are_sent_once(stub):
+    pipeline = ExplanationPipeline(url=stub.url, workers=1, timeout=5)
+    stub.gate.clear()
+    answers = [Answers() for _ in range(3)]
+    # Same template: only the variable fields differ
+    for i, answer in enumerate(answers):
+        assert pipeline.submit(f"Failed password for root from 10.0.0.{i} port 22{i}", "10.0.0.1", "ERROR", answer)
+    stub.gate.set()
+    for answer in answers:
+        assert answer.done.wait(5)
+    assert len(stub.prompts) == 1
+    assert {a.texts[0] for a in answers} == {"explained #1"}
+    assert pipeline.stats["deduplicated"] == 2
+    # Answered from the cache from now on
+    assert pipeline.lookup("Failed password for root from 10.9.9.9 port 2299", "ERROR") == "explained #1"
+    assert pipeline.lookup("Failed password for root from 10.9.9.9 port 2299", "WARN") is None
+
+def test_ttl_cache_expires_and_evicts():
+    cache = TTLCache(maxsize=2, ttl=0.05)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    # "b" was the least recently used
+    assert cache.get("b") is None and len(cache) == 2
+    time.sleep(0.06)
+    assert cache.get("a") is None and cache.get("c") is None
+
+def test_breaker_opens_then_lets_one_probe_through(stub):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.2)
+    pipeline = ExplanationPipeline(url=stub.url, workers=1, timeout=5, breaker=breaker)
+    stub.failing = True
+    for i in range(2):
+        assert pipeline.submit(f"disk failure {i} on sda", "", "ERROR", Answers())
+        wait_for(lambda: pipeline.stats["llm_errors"] == i + 1)
+    assert breaker.state == "open"
+    assert not pipeline.submit("kernel panic", "", "CRITICAL", Answers())
+    assert pipeline.stats["skipped_circuit_open"] == 1
+
+    time.sleep(0.25)
+    assert breaker.state == "half-open"
+    stub.failing = False
+    stub.gate.clear()
+    probe = Answers()
+    assert pipeline.submit("kernel panic", "", "CRITICAL", probe)
+    # Only the probe goes out while half-open
+    assert not pipeline.submit("fan speed low", "", "WARN", Answers())
+    stub.gate.set()
+    assert probe.done.wait(5)
+    wait_for(lambda: breaker.state == "closed")
+    assert pipeline.submit("fan speed low", "", "WARN", Answers())
+
+def test_full_queue_refuses_new_prompts(stub):
+    pipeline = ExplanationPipeline(url=stub.url, workers=1, queue_size=1, timeout=5)
+    stub.gate.clear()
+    first, second = Answers(), Answers()
+    assert pipeline.submit("first problem", "", "ERROR", first)
+    # The worker holds the first prompt; the second fills the queue
+    wait_for(lambda: len(stub.prompts) == 1)
+    assert pipeline.submit("second problem", "", "ERROR", second)
+    assert not pipeline.submit("third problem", "", "ERROR", Answers())
+    assert pipeline.stats["dropped_queue_full"] == 1
+    # A duplicate of a queued prompt still joins it
+    joined = Answers()
+    assert pipeline.submit("second problem", "", "ERROR", joined)
+    stub.gate.set()
+    assert first.done.wait(5) and second.done.wait(5) and joined.done.wait(5)
+    assert second.texts == joined.texts
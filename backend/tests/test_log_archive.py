@@ -0,0 +1,73 @@
+import random
+
+import pytest
+
+import log_archive
+
+LEVELS = ["INFO", "WARN", "ERROR", "CRITICAL"]
+
+@pytest.fixture(scope="module")
+def archive(tmp_path_factory):
+    """
+    Three chunks of generated rows, and the rows themselves for brute-force
+    answers.
+    """
+    root = str(tmp_path_factory.mktemp("archive"))
+    rng = random.Random(1)
+    rows = []
+    writer = log_archive.ArchiveWriter(root, source="node.log", chunk_rows=400)
+    for i in range(1200):
+        row = {"message": f"{rng.choice(['disk full on', 'link down on', 'user login on'])} node{i % 7}",
+               "level": rng.choice(LEVELS), "component": rng.choice(["kernel", "sshd", "nginx"]),
+               "risk": rng.randint(0, 100), "anomaly": rng.random() < 0.1, "timestamp": 1700000000 + i}
+        rows.append(row)
+        writer.append(**row)
+    writer.flush()
+    return log_archive.LogArchive(root), rows
+
+def brute(rows, levels=None, component=None):
+    hits = [r for r in rows if (levels is None or r["level"] in levels)
+            and (component is None or r["component"] == component)]
+    return len(hits), round(sum(r["risk"] for r in hits) / len(hits), 2), sum(r["anomaly"] for r in hits)
+
+@pytest.mark.parametrize("spec, levels, component", [
+    ({"levels": ["ERROR"]}, {"ERROR"}, None),
+    ({"levels": ["WARN", "CRITICAL"], "group_by": "component"}, {"WARN", "CRITICAL"}, None),
+    ({"levels": ["ERROR"], "components": ["sshd"]}, {"ERROR"}, "sshd"),
+    ({"components": ["nginx"], "group_by": "level"}, None, "nginx"),
+])
+def test_totals_are_exact_when_answered_from_metadata(archive, spec, levels, component):
+    store, rows = archive
+    result = store.query(spec)
+    assert result["chunks"]["metadata"] == 3
+    assert (result["matched"], result["risk_avg"], result["anomalies"]) == brute(rows, levels, component)
+
+def test_scanned_totals_match(archive):
+    store, rows = archive
+    # A risk bound forces a scan
+    result = store.query({"levels": ["ERROR"], "min_risk": 1})
+    assert result["chunks"]["scanned"] == 3
+    assert (result["matched"], result["risk_avg"], result["anomalies"]) == \
+        brute([r for r in rows if r["risk"] >= 1], {"ERROR"})
+
+@pytest.mark.parametrize("spec", [{"level": ["ERROR"]}, {"contains": "password"}, {"levels": ["ERROR"], "lmit": 5}])
+def test_unknown_keys_are_rejected(archive, spec):
+    with pytest.raises(ValueError, match="Unknown query keys"):
+        archive[0].query(spec)
+
+def test_group_by_takes_one_dimension(archive):
+    store, rows = archive
+    as_list = store.query({"group_by": ["component"]})["groups"]
+    assert as_list == store.query({"group_by": "component"})["groups"]
+    with pytest.raises(ValueError, match="one dimension"):
+        store.query({"group_by": ["level", "component"]})
+
+def test_chunks_without_risk_cross_sums_are_scanned(archive, monkeypatch):
+    store, rows = archive
+    # As sealed before the per-level risk sums were kept
+    for chunk in store.chunks():
+        monkeypatch.setattr(chunk, "cross_risk", None)
+        monkeypatch.setattr(chunk, "cross_anomalies", None)
+    result = store.query({"levels": ["ERROR"]})
+    assert result["chunks"]["scanned"] == 3
+    assert (result["matched"], result["risk_avg"], result["anomalies"]) == brute(rows, {"ERROR"})
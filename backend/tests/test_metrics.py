@@ -0,0 +1,26 @@
+import io
+
+import metrics
+
+def counts():
+    return {stage: series[2] for stage, series in metrics.stages.snapshot().items()}
+
+def test_upload_times_matcher_and_template_mining_separately(app_module, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", True)
+    before = counts()
+    data = b"INFO heartbeat ok\nERROR connection timeout to db-1 after 30 ms\n" * 50
+    app_module.analyze_log_upload(io.BytesIO(data), "node.log")
+    grown = {stage for stage, count in counts().items() if count > before.get(stage, 0)}
+    assert {"pattern_match", "severity_scan", "template_mine"} <= grown
+    assert grown <= set(metrics.STAGES)
+
+def test_live_events_time_the_matcher(app_module, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", True)
+    before = counts().get("pattern_match", 0)
+    app_module.score_events([{"message": "Failed password for root", "severity": "WARN"}] * 3)
+    assert counts()["pattern_match"] == before + 1
+
+def test_prometheus_text_labels_each_stage(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", True)
+    metrics.observe("template_mine", 0.002, 10)
+    assert 'sentinelx_stage_seconds_count{stage="template_mine"}' in metrics.render()
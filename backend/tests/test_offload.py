@@ -0,0 +1,110 @@
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import offload
+
+def test_run_uses_a_worker_thread_and_counts_the_call():
+    pool = offload.OffloadPool("t", workers=2, queue_size=1)
+    with pool.admit():
+        name = pool.run(lambda: threading.current_thread().name)
+    assert name.startswith("t")
+    stats = pool.get_stats()
+    assert stats["calls"] == 1 and stats["admitted_now"] == 0
+
+def test_zero_workers_run_inline():
+    pool = offload.OffloadPool("t", workers=0)
+    with pool.admit():
+        assert pool.run(threading.get_ident) == threading.get_ident()
+
+def test_admission_beyond_capacity_is_refused():
+    pool = offload.OffloadPool("t", workers=1, queue_size=1, retry_after=3)
+    tickets = [pool.admit(), pool.admit()]
+    with pytest.raises(offload.Saturated) as e:
+        pool.admit()
+    assert e.value.retry_after == 3
+    tickets[0].release()
+    tickets[0].release()  # idempotent
+    pool.admit().release()
+    assert pool.get_stats()["rejected"] == 1
+
+def test_errors_propagate_and_are_counted():
+    pool = offload.OffloadPool("t", workers=1)
+    with pool.admit(), pytest.raises(ZeroDivisionError):
+        pool.run(lambda: 1 / 0)
+    assert pool.get_stats()["errors"] == 1
+
+def test_iterate_advances_the_generator_on_the_pool():
+    pool = offload.OffloadPool("t", workers=1)
+    with pool.admit():
+        names = list(pool.iterate(threading.current_thread().name for _ in range(3)))
+    assert len(names) == 3 and all(n.startswith("t") for n in names)
+    assert pool.get_stats()["calls"] == 4  # three items and the end
+
+def test_queue_wait_is_reported():
+    waits = []
+    pool = offload.OffloadPool("t", workers=1, queue_size=2, on_wait=waits.append)
+    threads = [threading.Thread(target=pool.run, args=(time.sleep, 0.05)) for _ in range(2)]
+    with pool.admit(), pool.admit():
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    assert len(waits) == 2 and max(waits) >= 0.04
+
+def test_loop_lag_monitor_starts_once():
+    probe = []
+    monitor = offload.LoopLagMonitor(lambda fn: probe.append(fn), lambda s: None, interval_ms=1)
+    monitor.start()
+    monitor.start()
+    assert len(probe) == 1
+
+EVENTLET_PROBE = r"""
+import eventlet
+eventlet.monkey_patch()
+import json, sys, threading, time
+sys.path[:0] = %r
+import offload
+from realtime import native
+
+pool = offload.OffloadPool("t", workers=2, queue_size=2, async_mode="eventlet")
+lag = []
+
+def ticker():
+    while True:
+        expected = time.perf_counter() + 0.01
+        eventlet.sleep(0.01)
+        lag.append(time.perf_counter() - expected)
+
+def burn():
+    lock = native.threading.Lock()
+    end = time.perf_counter() + 0.5
+    while time.perf_counter() < end:
+        with lock:
+            pass
+    return native.threading.current_thread().name
+
+eventlet.spawn(ticker)
+eventlet.sleep(0.05)
+with pool.admit(), pool.admit():
+    names = [g.wait() for g in [eventlet.spawn(pool.run, burn) for _ in range(2)]]
+print(json.dumps({"names": names, "max_lag": max(lag), "calls": pool.get_stats()["calls"]}))
+"""
+
+@pytest.mark.skipif(importlib.util.find_spec("eventlet") is None, reason="eventlet not installed")
+def test_eventlet_calls_run_on_native_threads_and_leave_the_hub_free():
+    here = os.path.dirname(__file__)
+    paths = [os.path.join(here, '..'), os.path.join(here, '..', 'python_service')]
+    out = subprocess.run([sys.executable, "-c", EVENTLET_PROBE % paths], capture_output=True, text=True, timeout=60)
+    assert out.returncode == 0, out.stderr
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    assert result["calls"] == 2
+    assert all(name.startswith("tpool_thread") for name in result["names"])
+    # 0.5s of CPU per call would show up as lag if it ran on the hub
+    assert result["max_lag"] < 0.25
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+import online_learning
+
+N_FEATURES = 1 << 12
+
+def make_learner(directory, published):
+    return online_learning.OnlineIntentLearner(
+        on_publish=lambda model, vectorizer, info: published.append((model, vectorizer, info)),
+        directory=str(directory), n_features=N_FEATURES, batch_size=64, flush_sec=0.05,
+        publish_sec=3600, checkpoint_sec=3600)
+
+def predict(model, vectorizer, texts):
+    return model.predict(vectorizer.transform([t.lower() for t in texts])).tolist()
+
+@pytest.fixture(scope="module")
+def trained(tmp_path_factory):
+    """
+    A learner bootstrapped from the vault, then taught one new phrase by
+    an analyst.
+    """
+    directory = tmp_path_factory.mktemp("online")
+    published = []
+    learner = make_learner(directory, published)
+    learner.start()
+    stats = learner.flush(timeout=120)
+    assert stats["bootstrap"] == "vault"
+    before = predict(*published[-1][:2], ["quasar flux regulator drift"])
+    learner.learn(["quasar flux regulator drift"] * 20, ["security"] * 20)
+    learner.learn(["heartbeat ok from node7", ""])
+    stats = learner.flush()
+    return directory, learner, published, before, stats
+
+def test_analyst_labels_are_learned_and_published(trained):
+    _, learner, published, before, stats = trained
+    assert before != ["security"]
+    assert predict(*published[-1][:2], ["quasar flux regulator drift"]) == ["security"]
+    assert stats["learned_analyst"] == 20 and stats["learned_ingest"] == 1
+    assert stats["queue_depth"] == 0 and stats["checkpoints"] >= 2
+
+def test_unknown_or_mismatched_labels_are_rejected(trained):
+    learner = trained[1]
+    with pytest.raises(ValueError, match="unknown intents"):
+        learner.learn(["x"], ["not-an-intent"])
+    with pytest.raises(ValueError, match="length"):
+        learner.learn(["x", "y"], ["logs"])
+
+def test_a_restart_restores_the_checkpoint(trained):
+    directory, learner, published, _, _ = trained
+    restored = []
+    again = make_learner(directory, restored)
+    again.start()
+    assert again.flush()["bootstrap"] == "checkpoint"
+    assert np.array_equal(again._nb.feature_count_, learner._nb.feature_count_)
+    # Analysis workers load the same predictor from the file
+    model, vectorizer = online_learning.load_predictor(online_learning.checkpoint_path(str(directory)))
+    texts = ["quasar flux regulator drift", "session opened for user root", "kernel panic"]
+    assert predict(model, vectorizer, texts) == predict(*published[-1][:2], texts)
+
+def test_smoothing_matches_the_batch_model_in_total():
+    assert online_learning.nb_alpha(N_FEATURES) * N_FEATURES == pytest.approx(
+        online_learning.BATCH_ALPHA * online_learning.BATCH_VOCABULARY)
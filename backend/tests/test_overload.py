@@ -0,0 +1,62 @@
+import overload
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_sampler_keeps_one_in_every_per_stratum():
+    sampler = overload.Sampler(every=3)
+    kept = [sampler.keep(stratum, "INFO") for _ in range(6) for stratum in ("a", "b")]
+    # Each stratum keeps its 1st and 4th line, however they interleave
+    assert kept == [True, True, False, False, False, False] * 2
+    assert sampler.to_dict() == {"every": 3, "kept": {"INFO": 4}, "sampled_out": {"INFO": 8}}
+
+def test_bounded_sampler_starts_over_when_full():
+    sampler = overload.Sampler(every=10, max_strata=2)
+    assert sampler.keep("a", "INFO") and not sampler.keep("a", "INFO")
+    assert sampler.keep("b", "INFO")
+    # A third stratum clears the positions: "a" keeps its next line again
+    assert sampler.keep("c", "INFO")
+    assert sampler.keep("a", "INFO")
+
+def test_levels_follow_the_standing_delay():
+    clock = Clock()
+    control = overload.OverloadController(target_ms=50, window_sec=2, clock=clock)
+    assert control.level() == overload.NORMAL
+    # One fast call in the window keeps the level down
+    control.observe(0.5)
+    control.observe(0.001)
+    assert control.level() == overload.NORMAL
+    for delay, level in ((0.06, overload.SHED_LLM), (0.12, overload.SAMPLE), (1.0, overload.SKIP_INTENT)):
+        clock.now += 10
+        control.observe(delay)
+        assert control.level() == level
+    clock.now += 10
+    assert control.level() == overload.NORMAL
+    assert control.get_stats()["level_changes"] == 4
+
+def test_record_merges_upload_shedding():
+    control = overload.OverloadController()
+    control.record(llm_skipped=2, shedding={"every": 10, "kept": {"WARN": 3}, "sampled_out": {"WARN": 27},
+                                            "intents_skipped": 5})
+    stats = control.get_stats()
+    assert stats["llm_skipped"] == 2 and stats["intents_skipped"] == 5
+
+def test_live_sampling_is_per_template(app_module, monkeypatch):
+    monkeypatch.setattr(app_module.overload_control, "level", lambda: overload.SAMPLE)
+    # Anomalies are never sampled; keep the verdicts independent of the local model
+    monkeypatch.setattr(app_module, "detect_anomaly_batch", lambda lines: [(False, "NORMAL")] * len(lines))
+    noisy = [{"message": f"heartbeat ok seq {i}", "severity": "INFO", "source": "t1"} for i in range(200)]
+    rare = [{"message": f"cache warmed in {i} ms", "severity": "INFO", "source": "t2"} for i in range(200)]
+    # Alternate the two templates past the known-template threshold
+    events = [e for pair in zip(noisy, rare) for e in pair]
+    kept = {"t1": 0, "t2": 0}
+    for event, verdict in zip(events, app_module.score_events(events)):
+        if not verdict["sampled_out"]:
+            kept[event["source"]] += 1
+    known = overload.OVERLOAD_KNOWN_TEMPLATE - 1
+    expected = known + -(-(200 - known) // overload.OVERLOAD_SAMPLE_EVERY)
+    assert kept == {"t1": expected, "t2": expected}
@@ -0,0 +1,81 @@
+import threading
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+import prime_brain
+
+CORPUS = ["status of node cluster alpha beta gamma disk link down", prime_brain.SYSTEM_PROMPT]
+
+@pytest.fixture(scope="module")
+def brain(tmp_path_factory):
+    """
+    PrimeBrain over the tiny random model, decoding greedily and briefly.
+    """
+    path = prime_brain.build_tiny_model(str(tmp_path_factory.mktemp("tiny")), CORPUS)
+    patch = pytest.MonkeyPatch()
+    patch.setattr(prime_brain, "SAMPLING", {"do_sample": False})
+    patch.setitem(prime_brain.MAX_NEW_TOKENS, "chat", 6)
+    patch.setitem(prime_brain.MAX_NEW_TOKENS, "summary", 6)
+    yield prime_brain.PrimeBrain(path, quantize=False, batch_max=8, batch_wait_ms=200)
+    patch.undo()
+
+def test_prefix_cache_rows_are_left_padded_after_the_system_prompt(brain):
+    assert brain._prefix is not None
+    prefix = brain._prefix["ids"]
+    prompts = [brain.format_prompt("status"), brain.format_prompt("status of node cluster alpha")]
+    kwargs, columns = brain._inputs(prompts)
+    suffixes = [brain._encode(p)[len(prefix):] for p in prompts]
+    width = max(len(s) for s in suffixes)
+    assert columns == len(prefix) + width
+    pad = brain.tokenizer.pad_token_id
+    for row, mask, suffix in zip(kwargs["input_ids"].tolist(), kwargs["attention_mask"].tolist(), suffixes):
+        gap = width - len(suffix)
+        assert row == prefix + [pad] * gap + suffix
+        # The gap is masked out; the cached prefix is not
+        assert mask == [1] * len(prefix) + [0] * gap + [1] * len(suffix)
+    assert kwargs["past_key_values"].get_seq_length() == len(prefix)
+
+def test_batched_prefix_decoding_matches_one_prompt_at_a_time(brain, monkeypatch):
+    prompts = [brain.format_prompt(p) for p in ("status", "status of node cluster alpha", "disk link down")]
+    batched = brain._generate_batch("chat", prompts)
+    alone = [brain._generate_batch("chat", [p])[0] for p in prompts]
+    # And without the prefix cache, through the tokenizer's own padding
+    monkeypatch.setattr(brain, "_prefix", None)
+    plain = brain._generate_batch("chat", prompts)
+    assert batched == alone == plain
+    assert all(batched) and len(set(batched)) > 1
+
+def test_concurrent_prompts_share_generate_calls(brain):
+    before = brain.get_stats()
+    answers = {}
+    def ask(i):
+        answers[i] = brain.generate_response(f"status of node {i}")
+    threads = [threading.Thread(target=ask, args=(i,)) for i in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    after = brain.get_stats()
+    assert len(answers) == 6
+    assert after["prompts_generated"] - before["prompts_generated"] == 6
+    assert after["generate_calls"] - before["generate_calls"] < 6
+
+def test_repeated_prompts_are_answered_from_the_memo(brain):
+    first = brain.generate_response("status of cluster beta")
+    calls = brain.get_stats()["generate_calls"]
+    assert brain.generate_response("status of cluster beta") == first
+    # Same prompt, other use case: not the same memo entry
+    brain.summarize_anomalies(["status of cluster beta"])
+    stats = brain.get_stats()
+    assert stats["cache_hits"] >= 1
+    assert stats["generate_calls"] == calls + 1
+
+def test_stats_report_ttft_and_throughput(brain):
+    brain.generate_response("gamma disk")
+    stats = brain.get_stats()
+    assert stats["tokens_generated"] > 0 and stats["tokens_per_sec"] > 0
+    assert 0 < stats["ttft_ms_last"] and 0 < stats["ttft_ms_avg"] <= stats["generate_seconds_total"] * 1000
+    assert stats["prefix_cache"] and stats["prefix_cache_hits"] > 0
+    assert stats["mean_batch_size"] == round(stats["prompts_generated"] / stats["generate_calls"], 2)
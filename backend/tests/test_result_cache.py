@@ -0,0 +1,77 @@
+import io
+
+from werkzeug.datastructures import FileStorage
+
+from result_cache import ResultCache
+
+def lookup(cache, data, version="v1", settings="s"):
+    return cache.lookup(io.BytesIO(data), len(data), version, settings)
+
+def test_identical_uploads_hit_and_appends_resume(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=1 << 20, head_bytes=16)
+    first = b"line one\nline two\n"
+    miss = lookup(cache, first)
+    assert miss.part is None and not miss.hit
+    cache.store(miss, {"lines": 2})
+
+    hit = lookup(cache, first)
+    assert hit.hit and hit.part == {"lines": 2}
+    resumed = lookup(cache, first + b"line three\n")
+    assert not resumed.hit and resumed.offset == len(first) and resumed.part == {"lines": 2}
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["resumes"], stats["misses"]) == (1, 1, 1)
+
+def test_changed_prefix_and_other_settings_miss(tmp_path):
+    cache = ResultCache(str(tmp_path), head_bytes=4)
+    data = b"abcdefgh\n"
+    cache.store(lookup(cache, data), {"n": 1})
+    assert lookup(cache, b"abcdXfgh\nmore\n").part is None
+    assert lookup(cache, data, settings="other").part is None
+
+def test_uploads_without_a_final_newline_are_not_resumed(tmp_path):
+    cache = ResultCache(str(tmp_path), head_bytes=4)
+    partial = b"line one\nline tw"
+    cache.store(lookup(cache, partial), {"n": 1})
+    assert lookup(cache, partial).hit
+    # The last line may continue in the appended bytes
+    assert lookup(cache, partial + b"o\n").part is None
+
+def test_a_new_model_version_drops_old_entries(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    data = b"x\n"
+    cache.store(lookup(cache, data, "v1"), {"n": 1})
+    assert lookup(cache, data, "v2").part is None
+    assert cache.get_stats()["invalidations"] == 1
+    assert lookup(cache, data, "v1").part is None
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=300)
+    uploads = [f"upload {i}\n".encode() for i in range(3)]
+    cache.store(lookup(cache, uploads[0]), {"pad": "a" * 100})
+    cache.store(lookup(cache, uploads[1]), {"pad": "b" * 100})
+    assert lookup(cache, uploads[0]).hit
+    cache.store(lookup(cache, uploads[2]), {"pad": "c" * 100})
+    assert cache.get_stats()["evictions"] >= 1
+    assert lookup(cache, uploads[0]).hit and lookup(cache, uploads[1]).part is None
+
+def test_entries_survive_a_restart(tmp_path):
+    data = b"persisted\n"
+    first = ResultCache(str(tmp_path))
+    first.store(lookup(first, data), {"n": 1})
+    assert lookup(ResultCache(str(tmp_path)), data).part == {"n": 1}
+
+def test_online_intent_updates_keep_cached_results(app_module, monkeypatch):
+    current = app_module.get_lite_brain()
+    monkeypatch.setattr(app_module, "lite_brain", current)
+    monkeypatch.setattr(app_module, "model_source", current.source)
+    data = b"".join(b"WARN disk usage %d%% on /dev/sda\n" % (70 + i % 30) for i in range(3000))
+
+    def upload():
+        return app_module.analyze_upload(FileStorage(io.BytesIO(data), "app.log"), "app.log")["cache"]["status"]
+
+    app_module._publish_online_model(current.model, current.vectorizer, {"updates": 1})
+    version = app_module.analysis_version()
+    assert upload() == "miss"
+    app_module._publish_online_model(current.model, current.vectorizer, {"updates": 2})
+    assert app_module.analysis_version() == version
+    assert upload() == "hit"
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+from sklearn.naive_bayes import MultinomialNB
+
+import train_model
+from ai.bundle import _vault_lines
+
+def reference_counts(texts):
+    analyzer = train_model._vectorizer().build_analyzer()
+    term_counts, doc_counts = {}, {}
+    for text in texts:
+        tokens = analyzer(text)
+        for token in tokens:
+            term_counts[token] = term_counts.get(token, 0) + 1
+        for token in set(tokens):
+            doc_counts[token] = doc_counts.get(token, 0) + 1
+    return term_counts, doc_counts
+
+TEXTS = ["failed password for root from 10.0.0.1 port 22 ssh2",
+         "", "a b c", "the and of",
+         "kernel: eth0 link down, eth0 link up (retry_count=3)",
+         "über-größe café naïve straße", "doc docs document\tdoc",
+         "session opened for user root by (uid=0)"]
+
+def test_chunk_counts_match_the_vectorizer_analyzer():
+    term_counts, doc_counts = {}, {}
+    train_model.count_terms(TEXTS, term_counts, doc_counts)
+    assert (term_counts, doc_counts) == reference_counts(TEXTS)
+
+def test_counts_accumulate_across_chunks():
+    term_counts, doc_counts = {}, {}
+    for chunk in (TEXTS[:3], TEXTS[3:], [], ["the"]):
+        train_model.count_terms(chunk, term_counts, doc_counts)
+    assert (term_counts, doc_counts) == reference_counts(TEXTS)
+
+def test_streamed_statistics_give_the_single_fit_model():
+    texts = [line.lower() for line in _vault_lines(train_model.uploads_dir)[::3]]
+    if not texts:
+        pytest.skip("training vault not available")
+    labels = train_model.label_intents(texts)
+    term_counts, doc_counts = {}, {}
+    for start in range(0, len(texts), 1000):
+        train_model.count_terms(texts[start:start + 1000], term_counts, doc_counts)
+    vocabulary, idf = train_model.select_vocabulary(term_counts, doc_counts, len(texts))
+
+    fitted = train_model._vectorizer().fit(texts)
+    assert vocabulary == fitted.vocabulary_
+    assert np.allclose(idf, fitted.idf_, rtol=0, atol=1e-12)
+
+    classes = np.array(sorted(set(labels)))
+    class_index = {c: i for i, c in enumerate(classes)}
+    feature_counts = np.zeros((len(classes), len(vocabulary)))
+    class_counts = np.zeros(len(classes))
+    vectorizer = train_model.fixed_vectorizer(vocabulary, idf)
+    for start in range(0, len(texts), 1000):
+        train_model.accumulate(vectorizer, texts[start:start + 1000], labels[start:start + 1000], class_index,
+                               feature_counts, class_counts)
+    streamed = train_model.intent_model_from_counts(feature_counts, class_counts, classes)
+    single = MultinomialNB(alpha=0.1).fit(fitted.transform(texts), labels)
+    assert np.allclose(streamed.feature_log_prob_, single.feature_log_prob_, rtol=0, atol=1e-9)
+    assert np.allclose(streamed.class_log_prior_, single.class_log_prior_, rtol=0, atol=1e-12)
+
+def test_an_unreadable_dataset_is_skipped(tmp_path, monkeypatch, capfd):
+    good = tmp_path / "Good_2k.log_structured.csv"
+    good.write_text("LineId,Content\n" + "".join(f"{i},session opened for user u{i % 5}\n" for i in range(50))
+                    + "".join(f"{i},failed password for root port {i}\n" for i in range(50, 60)))
+    corrupt = tmp_path / "Corrupt_2k.log_structured.csv"
+    corrupt.write_bytes(b"LineId,Content\n1,\"unterminated\n\xff\xfe\x00\x00garbage")
+    monkeypatch.setattr(train_model, "dataset_paths", lambda: [("Good", str(good)), ("Corrupt", str(corrupt))])
+    exported = []
+    monkeypatch.setattr(train_model, "export_bundle",
+                        lambda vectorizer, intent, forest: exported.append((vectorizer, intent, forest)) or "bundle")
+
+    result = train_model.train(workers=2)
+    assert "Skipping Corrupt" in capfd.readouterr().out
+    assert result["skipped_datasets"] == ["Corrupt"]
+    assert result["intent_patterns"] == len(train_model.data) + 60
+    assert exported and "session" in exported[0][0].vocabulary_
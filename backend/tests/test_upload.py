@@ -0,0 +1,85 @@
+import io
+import random
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+import analysis_engine
+from analysis_engine import IssueRecord, TopIssues
+
+def make_log(n, seed=7, tag="svc"):
+    rng = random.Random(seed)
+    shapes = [
+        lambda i: f"INFO {tag} heartbeat ok id={i}",
+        lambda i: f"WARN {tag} disk usage {rng.randint(70, 99)}% on /dev/sda{i % 3}",
+        lambda i: f"ERROR {tag} connection timeout to db-{i % 5} after {rng.randint(1, 900)} ms",
+        lambda i: f"ERROR Failed password for root from 10.0.{i % 7}.{rng.randint(1, 250)} port 22",
+        lambda i: f"CRITICAL {tag} kernel panic on node{i % 4}",
+    ]
+    return "".join(shapes[rng.randrange(len(shapes))](i) + "\n" for i in range(n)).encode()
+
+def broadcasts(app_module, monkeypatch):
+    sent = []
+    monkeypatch.setattr(app_module, "send_log_to_clients", sent.append)
+    return sent
+
+def as_broadcast(issue):
+    return (issue["device"], issue["severity"], issue["message"][:100], issue["isAnomaly"], issue["status"])
+
+def test_top_issues_match_a_full_sort():
+    rng = random.Random(3)
+    records = [IssueRecord(i, "d", "WARN", f"m{i}", "", rng.randint(0, 20), False, "") for i in range(500)]
+    top = TopIssues(25)
+    top.extend(records)
+    expected = sorted(records, key=lambda r: (-r.risk, r.line))[:25]
+    assert [r.line for r in top.ranked()] == [r.line for r in expected]
+    assert top.count == 500
+
+def test_both_engines_return_and_broadcast_the_same_riskiest_issues(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "upload_cache", None)
+    data = make_log(4000)
+    sent = broadcasts(app_module, monkeypatch)
+    sequential = app_module.analyze_upload(FileStorage(io.BytesIO(data), "node.log"), "node.log")
+    from_sequential = [(e["source"], e["severity"], e["message"], e["is_anomaly"], e["status"]) for e in sent]
+
+    monkeypatch.setattr(analysis_engine, "ANALYSIS_WORKERS", 2)
+    monkeypatch.setattr(analysis_engine, "PARALLEL_MIN_BYTES", 1)
+    del sent[:]
+    parallel = app_module.analyze_upload(FileStorage(io.BytesIO(data), "node.log"), "node.log")
+    from_parallel = [(e["source"], e["severity"], e["message"], e["is_anomaly"], e["status"]) for e in sent]
+
+    assert len(sequential["issues"]) == app_module.MAX_RETURNED_ISSUES
+    assert [as_broadcast(i) for i in parallel["issues"]] == [as_broadcast(i) for i in sequential["issues"]]
+    assert from_sequential == from_parallel == [as_broadcast(i) for i in sequential["issues"]]
+    assert len(parallel["part"]["issues"]) == app_module.MAX_RETURNED_ISSUES
+
+def test_streamed_uploads_broadcast_the_riskiest_not_the_first(app_module, monkeypatch):
+    data = make_log(3000, seed=11)
+    sent = broadcasts(app_module, monkeypatch)
+    streamed = [payload for kind, payload in app_module.analyze_log_stream(io.BytesIO(data), "node.log")
+                if kind == "issue"]
+    top = app_module.analyze_log_upload(io.BytesIO(data), "node.log")
+    # Both runs broadcast the same riskiest issues
+    half = len(sent) // 2
+    assert sent[:half] == sent[half:]
+    assert [(e["message"], e["severity"]) for e in sent[:half]] == \
+        [(i["message"][:100], i["severity"]) for i in top["issues"]]
+    assert len(streamed) == top["issue_count"] > half
+
+def test_a_resumed_upload_only_broadcasts_its_new_lines(app_module, monkeypatch):
+    if app_module.upload_cache is None:
+        pytest.skip("result cache disabled")
+    head = "".join(f"WARN old disk usage {70 + i % 30}% on /dev/sda\n" for i in range(2000)).encode()
+    # Riskier than anything in the head, so all of it ranks
+    tail = "".join(f"CRITICAL new kernel panic after Failed password for root from 10.1.0.{i} port 22\n"
+                   for i in range(50)).encode()
+    sent = broadcasts(app_module, monkeypatch)
+    app_module.analyze_upload(FileStorage(io.BytesIO(head), "app.log"), "app.log")
+    del sent[:]
+    result = app_module.analyze_upload(FileStorage(io.BytesIO(head + tail), "app.log"), "app.log")
+    resumed = list(sent)
+    assert result["cache"]["status"] == "resumed"
+    fresh = app_module.analyze_log_upload(io.BytesIO(head + tail), "app.log")
+    assert [i["message"] for i in result["issues"]] == [i["message"] for i in fresh["issues"]]
+    expected = [i["message"] for i in fresh["issues"] if " new " in i["message"]]
+    assert len(expected) == 50 and [e["message"] for e in resumed] == expected